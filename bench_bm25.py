@@ -0,0 +1,93 @@
+"""
+Micro-benchmark: BM25Retriever (current per-query rebuild) vs SparseBM25 (CSR engine).
+
+Usage:
+    python bench_bm25.py                      # 10k, 100k and 1M chunks
+    python bench_bm25.py --sizes 10000 100000 --baseline-limit 100000
+"""
+import sys
+import os
+import time
+import random
+import argparse
+
+# Add project root to path
+sys.path.append(os.getcwd())
+
+from langchain_core.documents import Document
+from src.utils.sparse_bm25 import SparseBM25
+
+VOCAB_SIZE = 50000
+WORDS_PER_CHUNK = 150  # ~1000 characters, matching the splitter's chunk_size
+N_SOURCES = 50
+
+def make_corpus(n_chunks: int, seed: int = 42):
+    """Synthetic corpus with a Zipf-like vocabulary distribution."""
+    rng = random.Random(seed)
+    vocab = [f"term{i}" for i in range(VOCAB_SIZE)]
+    weights = [1.0 / (rank + 1) for rank in range(VOCAB_SIZE)]
+    documents = []
+    for i in range(n_chunks):
+        words = rng.choices(vocab, weights=weights, k=WORDS_PER_CHUNK)
+        documents.append(Document(
+            page_content=" ".join(words),
+            metadata={"source": f"doc_{i % N_SOURCES}.pdf"}
+        ))
+    return documents
+
+def make_queries(n_queries: int, seed: int = 7):
+    rng = random.Random(seed)
+    return [" ".join(f"term{rng.randint(0, 2000)}" for _ in range(rng.randint(3, 8))) for _ in range(n_queries)]
+
+def timed(fn):
+    start = time.perf_counter()
+    result = fn()
+    return result, time.perf_counter() - start
+
+def bench_baseline(documents, queries, k):
+    """Current path: BM25Retriever rebuilt from all documents on every search."""
+    from langchain_community.retrievers import BM25Retriever
+
+    retriever, build_s = timed(lambda: BM25Retriever.from_documents(documents, k=k))
+    _, query_s = timed(lambda: [retriever.invoke(q) for q in queries])
+    return build_s, query_s / len(queries)
+
+def bench_sparse(documents, queries, k):
+    """New path: CSR snapshot built once, then one sparse dot product per query."""
+    engine, build_s = timed(lambda: SparseBM25.from_documents(documents))
+    _, query_s = timed(lambda: [engine.search(q, k=k) for q in queries])
+    _, filtered_s = timed(lambda: [engine.search(q, k=k, filters={"source": ["doc_3.pdf"]}) for q in queries])
+    return build_s, query_s / len(queries), filtered_s / len(queries)
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10_000, 100_000, 1_000_000])
+    parser.add_argument("--queries", type=int, default=20)
+    parser.add_argument("--k", type=int, default=20)
+    parser.add_argument("--baseline-limit", type=int, default=1_000_000,
+                        help="Skip the BM25Retriever baseline above this corpus size")
+    args = parser.parse_args()
+
+    queries = make_queries(args.queries)
+
+    print(f"{'chunks':>10} | {'baseline build':>14} | {'baseline query':>14} | {'baseline/search':>15} | "
+          f"{'sparse build':>12} | {'sparse query':>12} | {'sparse filtered':>15}")
+    print("-" * 112)
+
+    for size in args.sizes:
+        documents = make_corpus(size)
+
+        sparse_build, sparse_query, sparse_filtered = bench_sparse(documents, queries, args.k)
+
+        if size <= args.baseline_limit:
+            base_build, base_query = bench_baseline(documents, queries, args.k)
+            # search_regulations used to rebuild BM25 for every call
+            baseline_cols = f"{base_build:>13.2f}s | {base_query * 1000:>12.1f}ms | {base_build + base_query:>14.2f}s"
+        else:
+            baseline_cols = f"{'skipped':>14} | {'skipped':>14} | {'skipped':>15}"
+
+        print(f"{size:>10} | {baseline_cols} | {sparse_build:>11.2f}s | "
+              f"{sparse_query * 1000:>10.2f}ms | {sparse_filtered * 1000:>13.2f}ms")
+
+if __name__ == "__main__":
+    main()
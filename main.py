@@ -25,7 +25,16 @@ st.set_page_config(
     initial_sidebar_state="expanded"
 )
 
+@st.cache_resource
+def start_ingest_service():
+    """Start background ingestion of ./data and ./knowledge_base once per process."""
+    from src.utils.ingest_service import get_ingest_service
+    return get_ingest_service().start()
+
 def main():
+    # Keep the Knowledge Base indexed in the background
+    start_ingest_service()
+    
     # Inject CSS
     inject_custom_css()
     
@@ -1,7 +1,6 @@
 #!/bin/bash
 
-# Run Ingestion (idempotent) using Conda env
-conda run -n turbotp python src/tools/ingest.py
-
 # Run Streamlit App using Conda env
+# Documents in ./data and ./knowledge_base are ingested in the background by the app
+# (one-off ingestion without the app: conda run -n turbotp python -m src.tools.ingest)
 conda run -n turbotp streamlit run main.py
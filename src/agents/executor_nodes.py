@@ -5,7 +5,7 @@ Executes individual steps of research and drafting plans.
 from typing import Tuple
 from langchain_google_genai import ChatGoogleGenerativeAI
 from .state import AgentState
-from .tools import search_regulations, web_search, youtube_search
+from .tools import search_regulations, search_regulations_batch, web_search, youtube_search
 from src.utils.file_processor import (
     process_uploaded_file,
     process_multiple_files,
@@ -54,14 +54,15 @@ def research_executor_node(state: AgentState):
     """
     Executes one step of the research plan using appropriate tools.
     
-    Reads: plan, current_step
-    Executes: the current step
-    Updates: step_results, current_step
+    Reads: plan, current_step, prefetched_results, jurisdiction, regulatory_area
+    Executes: the current step (regulatory searches for the rest of the plan are batched)
+    Updates: step_results, current_step, prefetched_results
     """
     plan = state.get("plan", [])
     current_step = state.get("current_step", 0)
     step_results = state.get("step_results", [])
     web_sources = state.get("web_sources", {})
+    prefetched = state.get("prefetched_results") or {}
     
     if current_step >= len(plan):
         return state  # Plan complete, no update
@@ -74,7 +75,20 @@ def research_executor_node(state: AgentState):
     # Execute with appropriate tool
     try:
         if tool_name == "search_regulations":
-            result = search_regulations.invoke(query)
+            if query not in prefetched:
+                # Resolve this and all remaining regulatory steps in one round trip
+                pending = []
+                for remaining_step in plan[current_step:]:
+                    remaining_tool, remaining_query = parse_step_for_tool(remaining_step)
+                    if remaining_tool == "search_regulations" and remaining_query not in prefetched:
+                        pending.append(remaining_query)
+                pending = list(dict.fromkeys(pending))
+                prefetched.update(zip(pending, search_regulations_batch(
+                    pending,
+                    jurisdiction=state.get("jurisdiction"),
+                    reg_area=state.get("regulatory_area")
+                )))
+            result = prefetched[query]
         elif tool_name == "web_search":
             # Get enabled domains
             enabled_domains = []
@@ -111,7 +125,8 @@ def research_executor_node(state: AgentState):
         return {
             "step_results": step_results,
             "current_step": current_step + 1,
-            "needs_replan": False
+            "needs_replan": False,
+            "prefetched_results": prefetched
         }
         
     except Exception as e:
@@ -164,20 +179,9 @@ def composer_executor_node(state: AgentState):
                         from src.utils.rag_manager import KNOWLEDGE_BASE_DIR
                         file_path = os.path.join(KNOWLEDGE_BASE_DIR, source)
                         
-                        # Use appropriate extractor based on extension
-                        if source.lower().endswith('.pdf'):
-                            from src.utils.file_processor import extract_text_from_pdf
-                            text = extract_text_from_pdf(file_path)
-                        elif source.lower().endswith('.docx'):
-                            from src.utils.file_processor import extract_text_from_docx
-                            text = extract_text_from_docx(file_path)
-                        else:
-                            # Fallback for text files
-                            try:
-                                with open(file_path, 'r') as f:
-                                    text = f.read()
-                            except Exception as e:
-                                text = f"Error reading file: {str(e)}"
+                        # Extractor is picked by extension; results are cached by content hash
+                        from src.utils.file_processor import extract_text_from_file
+                        text = extract_text_from_file(file_path)
                     else:
                         # It's a Streamlit UploadedFile
                         text = process_uploaded_file(source)
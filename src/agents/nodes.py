@@ -14,11 +14,18 @@ from src.utils.file_processor import (
     parse_excel_benchmarking,
     parse_csv_benchmarking
 )
+from src.tools.sec_tools import preview
 
 
 # Model Configuration
 MODEL_NAME = "gemini-2.5-flash-preview-09-2025"
 
+# Only the opening pages of a 10-K feed the drafting preview
+TEN_K_PREVIEW_PAGES = range(0, 10)
+
+# Per-section excerpt of each competitor 10-K in the Industry Analysis context
+COMPETITOR_SECTION_CHARS = 1500
+
 def get_llm():
     return ChatGoogleGenerativeAI(model=MODEL_NAME, temperature=0)
 
@@ -216,7 +223,7 @@ def prepare_drafting_context(section: str, data_sources: dict) -> str:
     if section == "Company Analysis":
         # Handle 10-K file upload
         if "10k_file" in data_sources:
-            text = process_uploaded_file(data_sources["10k_file"])
+            text = process_uploaded_file(data_sources["10k_file"], pages=TEN_K_PREVIEW_PAGES)
             context_parts.append(f"## 10-K Filing\n{text[:3000]}...")
     
     elif section == "Functional, Risk, Assets":
@@ -251,12 +258,31 @@ def prepare_drafting_context(section: str, data_sources: dict) -> str:
             competitors = ", ".join(data_sources["competitors"])
             context_parts.append(f"## Competitors to Analyze\n{competitors}")
         
+        if "competitor_filings" in data_sources:
+            filings_text = format_competitor_filings(data_sources["competitor_filings"])
+            if filings_text:
+                context_parts.append(f"## Competitor 10-K Filings\n{filings_text}")
+        
         if "industry_reports" in data_sources:
             reports_text = process_multiple_files(data_sources["industry_reports"])
             context_parts.append(f"## Industry Reports\n{reports_text[:2000]}...")
     
     return "\n\n".join(context_parts) if context_parts else "No additional context provided."
 
+def format_competitor_filings(filings: list) -> str:
+    """Business and Risk Factors excerpts from each fetched competitor 10-K."""
+    parts = []
+    for filing in filings:
+        if "error" in filing:
+            continue
+        sections = filing.get("sections", {})
+        parts.append(
+            f"### {filing['name']} ({filing['ticker']}) — 10-K filed {filing['filing_date']}\n"
+            f"**Business:** {preview(sections.get('Business', 'Not found'), COMPETITOR_SECTION_CHARS)}\n\n"
+            f"**Risk Factors:** {preview(sections.get('Risk Factors', 'Not found'), COMPETITOR_SECTION_CHARS)}"
+        )
+    return "\n\n".join(parts)
+
 def build_section_prompt(section: str, framework: str, context: str) -> str:
     """
     Build section-specific drafting prompt with guideline framework awareness.
@@ -38,12 +38,13 @@ def research_planner_node(state: AgentState):
     """
     Creates a step-by-step research plan.
     
-    Input: research_topic, jurisdiction, web_sources
+    Input: research_topic, jurisdiction, regulatory_area, web_sources
     Output: plan (list of steps), current_step (0)
     """
     llm = get_llm()
     topic = state.get("research_topic")
     jurisdiction = state.get("jurisdiction", "General")
+    regulatory_area = state.get("regulatory_area") or "Any"
     web_sources = state.get("web_sources", {})
     
     # Build list of available tools
@@ -66,6 +67,7 @@ Create a 3-5 step research plan for the following request:
 
 **Topic:** {topic}
 **Jurisdiction:** {jurisdiction}
+**Regulatory Area:** {regulatory_area}
 
 **Available Tools:**
 {chr(10).join(f'- {tool}' for tool in tools_available)}
@@ -11,6 +11,7 @@ class AgentState(TypedDict):
     document_type: Optional[str]
     draft_content: Optional[str]
     jurisdiction: Optional[str]
+    regulatory_area: Optional[str]  # Research Center area label, used to pre-filter searches
     web_sources: Optional[dict]  # Enabled web sources for research
     # Composer-specific fields
     guideline_framework: Optional[str]  # 'OECD Guidelines' or 'US Regulations (IRC §482)'
@@ -22,3 +23,4 @@ class AgentState(TypedDict):
     current_step: Optional[int]  # Which step is executing (0-indexed)
     step_results: Optional[List[dict]]  # Results from completed steps
     needs_replan: Optional[bool]  # Whether to trigger replanning
+    prefetched_results: Optional[dict]  # search_regulations results resolved in batch (query -> result)
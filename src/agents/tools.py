@@ -1,25 +1,32 @@
 import os
 from langchain.tools import tool
-from langchain_community.vectorstores import Chroma
-from langchain_google_genai import GoogleGenerativeAIEmbeddings
 from langchain_community.tools import GoogleSearchRun
 from langchain_community.utilities import GoogleSearchAPIWrapper
 from googleapiclient.discovery import build
-from typing import List, Optional
+from typing import Dict, List, Optional
 
 # Retriever imports
-from src.utils.retrievers import EnsembleRetriever
-from langchain_community.retrievers import BM25Retriever
 from langchain_core.documents import Document
+from src.utils.retrievers import EnsembleRetriever, SparseBM25Retriever, CitationRetriever, reciprocal_rank_fusion
+from src.utils.keyword_index import get_keyword_index
+from src.utils.sparse_bm25 import get_sparse_bm25
+from src.utils.search_cache import get_search_cache
+from src.utils.result_packing import pack_results
+from src.utils.metadata_tags import area_keys_for_label, GENERAL_JURISDICTION
 
-# Initialize Vector Store (Lazy loading to avoid issues during import if not ready)
+from src.utils.vectorstore_registry import get_registry
+
+# Fusion weights shared by the single and batch searches: Semantic, Keyword, Citations
+HYBRID_WEIGHTS = [0.5, 0.5, 0.5]
+
+# Vector Store is created lazily and shared process-wide through the registry
 def get_vectorstore():
-    embeddings = GoogleGenerativeAIEmbeddings(model="models/text-embedding-004")
-    return Chroma(persist_directory="./chroma_db", embedding_function=embeddings)
+    return get_registry().get_vectorstore()
 
 
 @tool
-def search_regulations(query: str, filter_source: Optional[str] = None):
+def search_regulations(query: str, filter_source: Optional[str] = None,
+                       jurisdiction: Optional[str] = None, reg_area: Optional[str] = None):
     """
     Searches the Transfer Pricing regulatory knowledge base (IRC 482, OECD Guidelines) AND user-uploaded internal documents.
     Uses Hybrid Search (Semantic + Keyword) for better accuracy.
@@ -27,61 +34,225 @@ def search_regulations(query: str, filter_source: Optional[str] = None):
     Args:
         query: The search query.
         filter_source: Optional filename to restrict search to (e.g., "MockCompanyData.docx"). Use this if the user asks to check a specific file.
+        jurisdiction: Optional jurisdiction to restrict search to ("US" or "OECD").
+        reg_area: Optional regulatory area label (e.g., "Treasury Reg §1.482-9: Services", "Chapter VI: Intangibles").
     """
     try:
         vectorstore = get_vectorstore()
         
-        # 1. Configure Semantic Retriever (Chroma)
-        chroma_search_kwargs = {"k": 20}
-        if filter_source:
-            chroma_search_kwargs["filter"] = {"source": filter_source}
-        chroma_retriever = vectorstore.as_retriever(search_kwargs=chroma_search_kwargs)
-        
-        # 2. Configure Keyword Retriever (BM25)
-        # Fetch documents to build BM25 index
-        # If filtering, only fetch relevant docs to speed up and improve precision
-        get_kwargs = {}
-        if filter_source:
-            get_kwargs["where"] = {"source": filter_source}
-            
-        # Get all docs (or filtered subset) from Chroma to build in-memory BM25
-        # Note: For very large DBs, this might be slow. Consider caching or persistent BM25.
-        collection_data = vectorstore.get(**get_kwargs)
+        keyword_index = get_keyword_index()
+        keyword_index.sync_from_vectorstore(vectorstore)
+        keyword_index.retag_from_vectorstore(vectorstore)
         
-        documents = []
-        if collection_data['documents']:
-            for i, text in enumerate(collection_data['documents']):
-                metadata = collection_data['metadatas'][i] if collection_data['metadatas'] else {}
-                documents.append(Document(page_content=text, metadata=metadata))
-        
-        if not documents:
+        if keyword_index.count() == 0:
             return "No documents found to search."
-
-        bm25_retriever = BM25Retriever.from_documents(documents)
-        bm25_retriever.k = 20  # Match k with Chroma
         
-        # 3. Create Ensemble Retriever
-        # Weight: 0.5 Semantic, 0.5 Keyword
-        ensemble_retriever = EnsembleRetriever(
-            retrievers=[chroma_retriever, bm25_retriever],
-            weights=[0.5, 0.5]
-        )
+        # 0. Serve repeat searches from the result cache
+        # The key includes the corpus generation, which every KB change bumps
+        search_cache = get_search_cache()
+        generation = keyword_index.generation
+        cache_key = search_cache.make_key(query, (filter_source, jurisdiction, reg_area), generation)
+        cached = search_cache.get(cache_key)
+        if cached is not None:
+            return cached
         
-        docs = ensemble_retriever.invoke(query)
+        # Pre-filters are relaxed step by step if the narrower slice has no matches
+        docs = []
+        for filters in search_filter_chain(filter_source, jurisdiction, reg_area):
+            docs = search_filtered(vectorstore, keyword_index, query, filters)
+            if docs:
+                break
         
         if not docs:
             return "No relevant documents found."
             
-        # Format output with sources
-        results = []
-        for d in docs:
-            source = d.metadata.get("source", "Unknown")
-            results.append(f"Source: {source}\nContent: {d.page_content}")
-            
-        return "\n\n---\n\n".join(results)
+        output = format_search_results(docs)
+        if bm25_is_current(keyword_index, generation):
+            search_cache.put(cache_key, output)
+        return output
     except Exception as e:
         return f"Error searching regulations: {str(e)}"
 
+def search_filtered(vectorstore, keyword_index, query: str, filters: Dict[str, List[str]]) -> List[Document]:
+    """Run one hybrid search restricted to `filters` and pack the results."""
+    # 1. Exact citation lookups (e.g. "Treas. Reg. §1.482-9") skip vector search entirely
+    citation_docs, is_direct_lookup = keyword_index.lookup_citation_query(query, filters=filters)
+    if is_direct_lookup and citation_docs:
+        return pack_results(citation_docs)
+    
+    # 2. Configure Semantic Retriever (Chroma)
+    chroma_search_kwargs = {"k": 20}
+    where = chroma_where(filters)
+    if where:
+        chroma_search_kwargs["filter"] = where
+    chroma_retriever = vectorstore.as_retriever(search_kwargs=chroma_search_kwargs)
+    
+    # 3. Configure Keyword Retriever (BM25)
+    # Uses a sparse-matrix snapshot of the persistent keyword index
+    # (maintained at ingestion time); filters are applied as masks
+    bm25_retriever = SparseBM25Retriever(
+        engine=get_sparse_bm25(keyword_index),
+        k=20,  # Match k with Chroma
+        filters=filters
+    )
+    
+    # 4. Create Ensemble Retriever
+    # Weight: 0.5 Semantic, 0.5 Keyword (and 0.5 Citations, below)
+    retrievers = [chroma_retriever, bm25_retriever]
+    if citation_docs:
+        # Topical queries that also cite something ("§1.482-9 services cost method"):
+        # chunks citing it join the fusion as one more ranked list
+        retrievers.append(CitationRetriever(documents=citation_docs))
+    ensemble_retriever = EnsembleRetriever(retrievers=retrievers, weights=HYBRID_WEIGHTS[:len(retrievers)])
+    
+    # 5. Pack into the token budget (dedupe, merge overlaps, per-source quotas)
+    return pack_results(ensemble_retriever.invoke(query))
+
+def bm25_is_current(keyword_index, generation: int) -> bool:
+    """
+    Results are only cached once the BM25 snapshot (rebuilt in the background after
+    KB changes) has caught up with the index, so a stale ranking isn't pinned to the new generation.
+    """
+    return get_sparse_bm25(keyword_index).generation == generation
+
+def search_filter_chain(filter_source: Optional[str] = None, jurisdiction: Optional[str] = None,
+                        reg_area: Optional[str] = None) -> List[Dict[str, List[str]]]:
+    """
+    Metadata filters to try, narrowest first: jurisdiction + regulatory area,
+    then jurisdiction only, then no metadata filter. filter_source always applies.
+    """
+    base = {"source": [filter_source]} if filter_source else {}
+    scoped = dict(base)
+    if jurisdiction:
+        # Chunks without any jurisdiction signal match every jurisdiction
+        scoped["jurisdiction"] = [jurisdiction, GENERAL_JURISDICTION]
+    
+    chain = []
+    areas = area_keys_for_label(reg_area)
+    if areas:
+        chain.append({**scoped, "reg_area": areas})
+    if jurisdiction:
+        chain.append(scoped)
+    chain.append(base)
+    return chain
+
+def chroma_where(filters: Dict[str, List[str]]) -> Optional[dict]:
+    """Translate {field: allowed values} into a Chroma `where` clause."""
+    conditions = [
+        {field: values[0]} if len(values) == 1 else {field: {"$in": values}}
+        for field, values in filters.items()
+    ]
+    if not conditions:
+        return None
+    return conditions[0] if len(conditions) == 1 else {"$and": conditions}
+
+def format_search_results(docs: List[Document]) -> str:
+    """Format retrieved chunks with their sources for the LLM."""
+    results = []
+    for d in docs:
+        source = d.metadata.get("source", "Unknown")
+        # Loaders store 0-based page indexes; cite 1-based page numbers
+        if isinstance(d.metadata.get("page"), int):
+            source = f"{source}, p. {d.metadata['page'] + 1}"
+        results.append(f"Source: {source}\nContent: {d.page_content}")
+    return "\n\n---\n\n".join(results)
+
+def search_regulations_batch(queries: List[str], filter_source: Optional[str] = None,
+                             jurisdiction: Optional[str] = None, reg_area: Optional[str] = None) -> List[str]:
+    """
+    Batch variant of search_regulations for multi-step research plans.
+    Embeds all queries in one request, runs the Chroma queries together and scores
+    BM25 for every query in one matrix product. Returns one result string per query.
+    """
+    try:
+        vectorstore = get_vectorstore()
+        
+        keyword_index = get_keyword_index()
+        keyword_index.sync_from_vectorstore(vectorstore)
+        keyword_index.retag_from_vectorstore(vectorstore)
+        
+        if keyword_index.count() == 0:
+            return ["No documents found to search."] * len(queries)
+        
+        # 0. Only compute queries that aren't already cached
+        search_cache = get_search_cache()
+        generation = keyword_index.generation
+        cache_filters = (filter_source, jurisdiction, reg_area)
+        outputs: List[Optional[str]] = []
+        for query in queries:
+            outputs.append(search_cache.get(search_cache.make_key(query, cache_filters, generation)))
+        
+        pending = [i for i, output in enumerate(outputs) if output is None]
+        if not pending:
+            return outputs
+        query_vectors = {}
+        
+        # Pre-filters are relaxed step by step for queries whose narrower slice has no matches
+        for filters in search_filter_chain(filter_source, jurisdiction, reg_area):
+            # 0b. Pure citation lookups are answered from the citation index; other
+            # queries citing something keep the hits for fusion
+            citation_hits = {}
+            for i in list(pending):
+                citation_docs, is_direct_lookup = keyword_index.lookup_citation_query(queries[i], filters=filters)
+                if is_direct_lookup and citation_docs:
+                    outputs[i] = format_search_results(pack_results(citation_docs))
+                    search_cache.put(search_cache.make_key(queries[i], cache_filters, generation), outputs[i])
+                    pending.remove(i)
+                else:
+                    citation_hits[i] = citation_docs
+            if not pending:
+                break
+            pending_queries = [queries[i] for i in pending]
+            
+            # 1. Semantic: one batched embedding request + one multi-query Chroma call
+            missing = [query for query in pending_queries if query not in query_vectors]
+            if missing:
+                query_vectors.update(zip(missing, get_registry().get_embeddings().embed_queries(missing)))
+            chroma_results = vectorstore._collection.query(
+                query_embeddings=[query_vectors[query] for query in pending_queries],
+                n_results=20,
+                where=chroma_where(filters),
+                include=["documents", "metadatas"]
+            )
+            
+            # 2. Keyword: all queries scored in one sparse matrix product
+            bm25_engine = get_sparse_bm25(keyword_index)
+            bm25_results = bm25_engine.search_batch(pending_queries, k=20, filters=filters)
+            
+            # 3. Fuse (0.5 Semantic, 0.5 Keyword, 0.5 Citations when the query cites something),
+            # pack and format per query
+            unresolved = []
+            for n, i in enumerate(pending):
+                semantic_docs = [
+                    Document(id=doc_id, page_content=text, metadata=metadata or {})
+                    for doc_id, text, metadata in zip(
+                        chroma_results["ids"][n], chroma_results["documents"][n], chroma_results["metadatas"][n]
+                    )
+                ]
+                keyword_docs = [doc for doc, score in bm25_results[n]]
+                ranked_lists = [(0, semantic_docs), (1, keyword_docs)]
+                if citation_hits[i]:
+                    ranked_lists.append((2, citation_hits[i]))
+                docs = reciprocal_rank_fusion(ranked_lists, HYBRID_WEIGHTS[:len(ranked_lists)], len(ranked_lists))
+                
+                if not docs:
+                    unresolved.append(i)
+                    continue
+                
+                outputs[i] = format_search_results(pack_results(docs))
+                if bm25_engine.generation == generation:
+                    search_cache.put(search_cache.make_key(queries[i], cache_filters, generation), outputs[i])
+            
+            pending = unresolved
+            if not pending:
+                break
+        
+        for i in pending:
+            outputs[i] = "No relevant documents found."
+        return outputs
+    except Exception as e:
+        return [f"Error searching regulations: {str(e)}"] * len(queries)
+
 @tool
 def web_search(query: str, domains: Optional[List[str]] = None):
     """
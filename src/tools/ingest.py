@@ -1,34 +1,45 @@
 import os
-import json
 import hashlib
 from pathlib import Path
-from langchain_community.document_loaders import PyPDFLoader, TextLoader
-from langchain_community.vectorstores import Chroma
-from langchain_google_genai import GoogleGenerativeAIEmbeddings
-from langchain_text_splitters import RecursiveCharacterTextSplitter
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, List, Optional, Tuple
+from src.utils.ingest_manifest import get_manifest, manifest_key
 
 # Configuration
-PERSIST_DIRECTORY = "./chroma_db"
 DATA_DIRECTORY = "./data"
-TRACKING_FILE = "./chroma_db/ingested_files.json"
+SUPPORTED_EXTENSIONS = {
+    "data": (".pdf", ".txt"),
+    "knowledge_base": (".pdf", ".docx", ".doc", ".txt", ".md"),
+}
+HASH_BLOCK_SIZE = 1024 * 1024  # Bytes read per block while hashing
+HASH_WORKERS = 8               # Files hashed in parallel (hashlib releases the GIL)
+REMOVE_BATCH_SIZE = 500        # Chunk IDs per vector store delete call
 
 def get_file_hash(file_path: str) -> str:
-    """Generate SHA256 hash of file content for change detection."""
-    with open(file_path, 'rb') as f:
-        return hashlib.sha256(f.read()).hexdigest()
+    """Generate SHA256 hash of file content for change detection (streamed in fixed-size blocks)."""
+    digest = hashlib.sha256()
+    buffer = bytearray(HASH_BLOCK_SIZE)
+    view = memoryview(buffer)
+    with open(file_path, 'rb', buffering=0) as f:
+        while True:
+            n = f.readinto(buffer)
+            if not n:
+                break
+            digest.update(view[:n])
+    return digest.hexdigest()
 
-def load_tracking_data() -> dict:
-    """Load the tracking file that stores which files have been ingested."""
-    if os.path.exists(TRACKING_FILE):
-        with open(TRACKING_FILE, 'r') as f:
-            return json.load(f)
-    return {}
+def is_unchanged(stat: os.stat_result, entry: dict) -> bool:
+    """Fast path: same size, mtime and inode as recorded means the content wasn't touched."""
+    return (
+        entry.get("size") == stat.st_size
+        and entry.get("mtime_ns") == stat.st_mtime_ns
+        and entry.get("inode") == stat.st_ino
+    )
 
-def save_tracking_data(data: dict):
-    """Save the tracking data to disk."""
-    os.makedirs(os.path.dirname(TRACKING_FILE), exist_ok=True)
-    with open(TRACKING_FILE, 'w') as f:
-        json.dump(data, indent=2, fp=f)
+def hash_files(paths: List[str]) -> Dict[str, str]:
+    """Hash files in parallel, returning {path: sha256}."""
+    with ThreadPoolExecutor(max_workers=HASH_WORKERS, thread_name_prefix="hash") as pool:
+        return dict(zip(paths, pool.map(get_file_hash, paths)))
 
 def ingest_documents():
     """
@@ -45,98 +56,166 @@ def ingest_documents():
             f.write("IRC Section 482: Allocation of income and deductions among taxpayers.\n"
                     "In any case of two or more organizations, trades, or businesses (whether or not incorporated, whether or not organized in the United States, and whether or not affiliated) owned or controlled directly or indirectly by the same interests, the Secretary may distribute, apportion, or allocate gross income, deductions, credits, or allowances between or among such organizations, trades, or businesses, if he determines that such distribution, apportionment, or allocation is necessary in order to prevent evasion of taxes or clearly to reflect the income of any of such organizations, trades, or businesses.")
     
-    # Load tracking data
-    tracking_data = load_tracking_data()
+    # Scan for files to ingest
+    files = []
+    for entry in os.scandir(DATA_DIRECTORY):
+        # Skip non-files and unsupported formats
+        if entry.is_file() and is_supported(entry.name, "data"):
+            files.append((entry.name, entry.path))
     
-    # Initialize embeddings
-    embeddings = GoogleGenerativeAIEmbeddings(model="models/text-embedding-004")
+    ingest_files(files, "data")
+
+def is_supported(filename: str, origin: str) -> bool:
+    """Whether a file in the given origin directory is ingested."""
+    return not filename.startswith(".") and filename.lower().endswith(SUPPORTED_EXTENSIONS[origin])
+
+def ingest_files(files: List[Tuple[str, str]], origin: str = "data",
+                 on_file_done: Optional[Callable[[str, bool], None]] = None) -> Optional[dict]:
+    """
+    Ingest (filename, file_path) pairs from one origin ("data" or "knowledge_base")
+    through the incremental pipeline and record them in the manifest under manifest_key(origin, filename).
+    Returns the pipeline report, or None if every file was already up to date.
+    """
+    # Load the ingestion manifest (shared with Knowledge Base uploads)
+    manifest = get_manifest()
+    tracked = manifest.entries(origin)
     
-    # Check if vector store exists
-    vectorstore_exists = os.path.exists(PERSIST_DIRECTORY) and os.path.exists(os.path.join(PERSIST_DIRECTORY, "chroma.sqlite3"))
+    # Skip files whose (size, mtime, inode) match the manifest without reading them
+    candidates: List[Tuple[str, str, os.stat_result]] = []
+    for filename, file_path in files:
+        try:
+            stat = os.stat(file_path)
+        except FileNotFoundError:
+            continue
+        entry = tracked.get(manifest_key(origin, filename))
+        if entry is not None and is_unchanged(stat, entry):
+            if on_file_done:
+                on_file_done(filename, True)
+            continue
+        candidates.append((filename, file_path, stat))
     
-    if vectorstore_exists:
-        # Load existing vector store
-        vectorstore = Chroma(persist_directory=PERSIST_DIRECTORY, embedding_function=embeddings)
-        print("Loaded existing vector store.")
-    else:
-        vectorstore = None
-        print("No existing vector store found. Will create new one.")
+    # Hash the remaining files in parallel
+    hashes = hash_files([file_path for _, file_path, _ in candidates])
     
-    # Scan for files to ingest
-    new_documents = []
     files_to_process = []
-    
-    for filename in os.listdir(DATA_DIRECTORY):
-        file_path = os.path.join(DATA_DIRECTORY, filename)
-        
-        # Skip non-files
-        if not os.path.isfile(file_path):
-            continue
-            
-        # Only process supported formats
-        if not (filename.endswith(".pdf") or filename.endswith(".txt")):
-            continue
-        
-        # Calculate file hash
-        current_hash = get_file_hash(file_path)
+    touched = []
+    for filename, file_path, stat in candidates:
+        current_hash = hashes[file_path]
+        entry = tracked.get(manifest_key(origin, filename))
         
         # Check if file is new or modified
-        if filename not in tracking_data or tracking_data[filename] != current_hash:
+        if entry is None or entry["hash"] != current_hash:
             files_to_process.append((filename, file_path, current_hash))
+        else:
+            # Content unchanged (e.g. copied or touched): remember the new stat for the fast path
+            touched.append((manifest_key(origin, filename), stat.st_size, stat.st_mtime_ns, stat.st_ino))
+            if on_file_done:
+                on_file_done(filename, True)
+    if touched:
+        manifest.update_stat(touched)
     
     if not files_to_process:
         print("No new or modified files to ingest. Vector store is up to date.")
-        return
+        return None
     
-    print(f"Found {len(files_to_process)} new/modified file(s) to ingest.")
+    # Heavy imports (Chroma, embeddings client) are only needed when there is work to do
+    from src.utils.ingest_pipeline import run_ingestion_pipeline, format_report
+    from src.utils.keyword_index import get_keyword_index
+    from src.utils.vectorstore_registry import get_registry, PERSIST_DIRECTORY
     
-    # Load and split new documents
-    for filename, file_path, file_hash in files_to_process:
-        print(f"Processing: {filename}")
-        
-        try:
-            if filename.endswith(".pdf"):
-                loader = PyPDFLoader(file_path)
-            else:  # .txt
-                loader = TextLoader(file_path)
-            
-            docs = loader.load()
-            new_documents.extend(docs)
-            
-            # Update tracking data
-            tracking_data[filename] = file_hash
-            
-        except Exception as e:
-            print(f"Error processing {filename}: {str(e)}")
-            continue
+    # Check if vector store exists
+    vectorstore_exists = os.path.exists(PERSIST_DIRECTORY) and os.path.exists(os.path.join(PERSIST_DIRECTORY, "chroma.sqlite3"))
+    
+    if vectorstore_exists:
+        print("Loaded existing vector store.")
+    else:
+        print("No existing vector store found. Will create new one.")
     
-    if not new_documents:
-        print("No documents were successfully loaded.")
-        return
+    print(f"Found {len(files_to_process)} new/modified file(s) to ingest.")
     
-    # Split documents into chunks
-    text_splitter = RecursiveCharacterTextSplitter(chunk_size=1000, chunk_overlap=200)
-    splits = text_splitter.split_documents(new_documents)
+    # Extract, split, embed and write through the staged pipeline
+    # (the shared handle creates the collection if needed)
+    # Uploaded files are cited by their name; ./data files keep the loader's path as source
+    registry = get_registry()
+    report = run_ingestion_pipeline(
+        [(filename, file_path) for filename, file_path, _ in files_to_process],
+        registry.get_vectorstore(),
+        get_keyword_index(),
+        registry.get_embeddings(),
+        name_as_source=(origin == "knowledge_base"),
+        on_file_done=on_file_done
+    )
     
-    print(f"Split into {len(splits)} chunks.")
+    for filename, error in report["failed"].items():
+        print(f"Failed: {filename} ({error})")
+    print(format_report(report))
+    if report["chunks"]:
+        if vectorstore_exists:
+            print(f"Added {report['chunks']} new chunks to existing vector store.")
+        else:
+            print(f"Created new vector store with {report['chunks']} chunks.")
+        print(f"Keyword index updated ({get_keyword_index().count()} chunks).")
     
-    # Add to vector store
-    if vectorstore is None:
-        # Create new vector store
-        vectorstore = Chroma.from_documents(
-            documents=splits,
-            embedding=embeddings,
-            persist_directory=PERSIST_DIRECTORY
+    # Only fully written files are recorded; failed ones are retried next run
+    # (with the stat taken before hashing, so a file edited mid-run is rehashed next time)
+    files = {filename: (file_path, file_hash) for filename, file_path, file_hash in files_to_process}
+    scan_stats = {filename: stat for filename, _, stat in candidates}
+    for filename in report["ingested"]:
+        file_path, file_hash = files[filename]
+        stat = scan_stats[filename]
+        manifest.record(
+            manifest_key(origin, filename), origin, report["chunk_ids"][filename],
+            path=file_path, file_hash=file_hash, size=stat.st_size, mtime_ns=stat.st_mtime_ns,
+            inode=stat.st_ino, embedding_model=registry.embedding_model
         )
-        print(f"Created new vector store with {len(splits)} chunks.")
+    print("Ingestion complete. Manifest updated.")
+    return report
+
+def remove_ingested_file(filename: str, origin: str = "knowledge_base"):
+    """Delete a file's chunks from the vector store and keyword index and drop it from the manifest."""
+    from src.utils.keyword_index import get_keyword_index
+    from src.utils.vectorstore_registry import get_registry
+    
+    vectorstore = get_registry().get_vectorstore()
+    manifest = get_manifest()
+    key = manifest_key(origin, filename)
+    chunk_ids = manifest.chunk_ids(key)
+    if chunk_ids:
+        # The manifest knows the file's chunks (also for ./data files, whose source is a path)
+        vectorstore._collection.delete(ids=chunk_ids)
+        get_keyword_index().delete_ids(chunk_ids)
     else:
-        # Add to existing vector store
-        vectorstore.add_documents(splits)
-        print(f"Added {len(splits)} new chunks to existing vector store.")
+        # Access the underlying Chroma collection to delete by metadata
+        # Note: vectorstore._collection is the Chroma collection object
+        vectorstore._collection.delete(where={"source": filename})
+        get_keyword_index().delete_source(filename)
+    manifest.remove(key)
+
+def remove_ingested_origin(origin: str):
+    """
+    Delete every chunk one origin's files produced (e.g. all Knowledge Base uploads)
+    from the vector store and keyword index, and drop its manifest rows.
+    Other origins (the ./data regulatory library) are left untouched.
+    """
+    from src.utils.keyword_index import get_keyword_index
+    from src.utils.vectorstore_registry import get_registry
     
-    # Save tracking data
-    save_tracking_data(tracking_data)
-    print("Ingestion complete. Tracking data updated.")
+    vectorstore = get_registry().get_vectorstore()
+    keyword_index = get_keyword_index()
+    manifest = get_manifest()
+    chunk_ids = []
+    for key, file_chunk_ids in manifest.origin_chunk_ids(origin).items():
+        if file_chunk_ids:
+            chunk_ids.extend(file_chunk_ids)
+        else:
+            # Entries imported from the legacy tracking file have no chunk list; uploads are cited by name
+            filename = os.path.basename(key)
+            vectorstore._collection.delete(where={"source": filename})
+            keyword_index.delete_source(filename)
+    for start in range(0, len(chunk_ids), REMOVE_BATCH_SIZE):
+        vectorstore._collection.delete(ids=chunk_ids[start:start + REMOVE_BATCH_SIZE])
+    keyword_index.delete_ids(chunk_ids)
+    manifest.remove_origin(origin)
 
 if __name__ == "__main__":
     from dotenv import load_dotenv
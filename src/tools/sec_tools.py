@@ -1,9 +1,16 @@
 """
 SEC EDGAR tools for fetching and parsing 10-K filings.
 """
-import requests
-from typing import Optional, Dict
-import re
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import Optional, Dict, Iterator, List
+from src.utils.edgar_client import get_edgar_client
+from src.utils.filing_store import get_filing_store
+from src.utils.tenk_sections import tokenize_10k
+from src.utils.ticker_index import get_ticker_index
+
+# Configuration
+SUMMARY_SECTION_CHARS = 3000  # Per-section preview length in summarize_10k
+BATCH_WORKERS = 8             # Concurrent companies in fetch_10k_batch
 
 def fetch_10k(ticker: str) -> Optional[Dict[str, str]]:
     """
@@ -21,88 +28,133 @@ def fetch_10k(ticker: str) -> Optional[Dict[str, str]]:
         if not cik:
             return {"error": f"Could not find CIK for ticker: {ticker}"}
         
-        # Get latest 10-K filing
-        filings_url = f"https://data.sec.gov/submissions/CIK{cik.zfill(10)}.json"
-        headers = {"User-Agent": "TurboTP Research Tool contact@example.com"}
-        
-        response = requests.get(filings_url, headers=headers)
-        response.raise_for_status()
-        
-        data = response.json()
-        filings = data.get("filings", {}).get("recent", {})
-        
-        # Find most recent 10-K
-        for i, form in enumerate(filings.get("form", [])):
-            if form == "10-K":
-                accession_number = filings["accessionNumber"][i].replace("-", "")
-                filing_date = filings["filingDate"][i]
-                primary_document = filings["primaryDocument"][i]
-                
-                # Fetch the actual 10-K document
-                doc_url = f"https://www.sec.gov/Archives/edgar/data/{cik}/{accession_number}/{primary_document}"
-                doc_response = requests.get(doc_url, headers=headers)
-                doc_response.raise_for_status()
-                
-                return {
-                    "ticker": ticker,
-                    "cik": cik,
-                    "filing_date": filing_date,
-                    "accession_number": filings["accessionNumber"][i],
-                    "full_text": doc_response.text
-                }
-        
-        return {"error": f"No 10-K filings found for {ticker}"}
+        return fetch_10k_for_cik(ticker, cik)
         
     except Exception as e:
         return {"error": f"Error fetching 10-K: {str(e)}"}
 
+def fetch_10k_for_cik(ticker: str, cik: str) -> Dict[str, str]:
+    """Latest 10-K for an already-resolved CIK. Raises on EDGAR errors."""
+    # Find the most recent 10-K in the local filing index (refreshed from EDGAR when stale)
+    filing = get_latest_filing(cik, "10-K")
+    if filing is None:
+        return {"error": f"No 10-K filings found for {ticker}"}
+    
+    # Fetch the actual 10-K document (downloaded once per accession number)
+    full_text = get_filing_document(cik, filing["accession_number"], filing["primary_document"])
+    
+    return {
+        "ticker": ticker,
+        "cik": cik,
+        "filing_date": filing["filing_date"],
+        "accession_number": filing["accession_number"],
+        "full_text": full_text
+    }
+
+def fetch_10k_batch(companies: List[str], max_workers: int = BATCH_WORKERS) -> Iterator[Dict]:
+    """
+    Fetch and parse the latest 10-K for several companies concurrently, yielding each
+    result as soon as it is ready (completion order, not input order).
+    
+    Args:
+        companies: Tickers or company names (e.g. a competitor list)
+        max_workers: Concurrent fetches; EDGAR requests still share the client's rate limit
+        
+    Yields:
+        {"query", "ticker", "cik", "name", "filing_date", "accession_number", "sections"}
+        or {"query", "error"} for companies that couldn't be resolved or fetched
+    """
+    queries = list(dict.fromkeys(query.strip() for query in companies if query.strip()))
+    resolved = resolve_companies(queries)
+    
+    def fetch_one(query: str, company: Dict) -> Dict:
+        try:
+            filing = fetch_10k_for_cik(company["ticker"], company["cik"])
+            if "error" in filing:
+                return {"query": query, "error": filing["error"]}
+            filing["sections"] = parse_10k_sections(filing.pop("full_text"))
+            return {"query": query, "name": company["name"], **filing}
+        except Exception as e:
+            return {"query": query, "error": f"Error fetching 10-K: {str(e)}"}
+    
+    for query in queries:
+        if resolved.get(query) is None:
+            yield {"query": query, "error": f"Could not find a SEC registrant matching: {query}"}
+    
+    pending = [(query, company) for query, company in resolved.items() if company is not None]
+    if not pending:
+        return
+    with ThreadPoolExecutor(max_workers=min(max_workers, len(pending))) as executor:
+        futures = [executor.submit(fetch_one, query, company) for query, company in pending]
+        for future in as_completed(futures):
+            yield future.result()
+
+def get_latest_filing(cik: str, form: str = "10-K") -> Optional[Dict]:
+    """
+    Latest filing of a form type from the local filing index. EDGAR's submissions
+    API is only queried when the CIK's index is older than the TTL; if that check
+    fails, the stale index is used.
+    """
+    store = get_filing_store()
+    if not store.is_fresh(cik):
+        try:
+            store.record_submissions(cik, get_edgar_client().get_submissions(cik))
+        except Exception as e:
+            if store.latest_filing(cik, form) is None:
+                raise
+            print(f"Using cached filing index for CIK {cik}: {e}")
+    return store.latest_filing(cik, form)
+
+def get_filing_document(cik: str, accession_number: str, document: str) -> str:
+    """Filing document from the on-disk store, downloading it on first use."""
+    store = get_filing_store()
+    text = store.get_document(cik, accession_number, document)
+    if text is None:
+        text = get_edgar_client().get_filing_document(cik, accession_number, document)
+        store.put_document(cik, accession_number, document, text)
+    return text
+
 def get_cik_from_ticker(ticker: str) -> Optional[str]:
-    """Get CIK number from ticker symbol."""
+    """Get CIK number from ticker symbol (local index; no network once cached)."""
     try:
-        url = "https://www.sec.gov/files/company_tickers.json"
-        headers = {"User-Agent": "TurboTP Research Tool contact@example.com"}
-        
-        response = requests.get(url, headers=headers)
-        response.raise_for_status()
-        
-        companies = response.json()
-        
-        for company in companies.values():
-            if company["ticker"].upper() == ticker.upper():
-                return str(company["cik_str"])
-        
-        return None
+        entry = get_ticker_index().lookup(ticker)
+        return entry["cik"] if entry else None
     except Exception as e:
         print(f"Error getting CIK: {str(e)}")
         return None
 
+def get_ciks_from_tickers(tickers: List[str]) -> Dict[str, Optional[str]]:
+    """Batch version of get_cik_from_ticker."""
+    try:
+        entries = get_ticker_index().lookup_many(tickers)
+        return {ticker: entry["cik"] if entry else None for ticker, entry in entries.items()}
+    except Exception as e:
+        print(f"Error getting CIKs: {str(e)}")
+        return {ticker: None for ticker in tickers}
+
+def resolve_companies(queries: List[str]) -> Dict[str, Optional[Dict]]:
+    """
+    Resolve tickers or company names (e.g. a competitor list) to {"ticker", "cik", "name"}.
+    Exact tickers win; otherwise the closest company name is used. Unresolved entries map to None.
+    """
+    try:
+        return get_ticker_index().resolve_many(queries)
+    except Exception as e:
+        print(f"Error resolving companies: {str(e)}")
+        return {query: None for query in queries}
+
 def parse_10k_sections(filing_text: str) -> Dict[str, str]:
     """
     Parse 10-K filing and extract key sections.
     
-    Returns dictionary with section names as keys and content as values.
+    Returns dictionary with section names as keys and full section content as values.
+    Use tokenize_10k directly for every Item with offsets, or to_documents() for ingestion.
     """
-    sections = {}
-    
-    # Clean HTML if present
-    text = re.sub(r'<[^>]+>', '', filing_text)
-    
-    # Common 10-K sections
-    section_patterns = {
-        "Business": r"Item\s+1[.\s]+Business(.*?)Item\s+1A",
-        "Risk Factors": r"Item\s+1A[.\s]+Risk Factors(.*?)Item\s+1B",
-        "MD&A": r"Item\s+7[.\s]+Management'?s Discussion(.*?)Item\s+7A",
-        "Financial Statements": r"Item\s+8[.\s]+Financial Statements(.*?)Item\s+9"
-    }
-    
-    for section_name, pattern in section_patterns.items():
-        match = re.search(pattern, text, re.IGNORECASE | re.DOTALL)
-        if match:
-            content = match.group(1).strip()
-            # Limit to first 3000 characters to avoid overwhelming the agent
-            sections[section_name] = content[:3000] + ("..." if len(content) > 3000 else "")
-    
-    return sections
+    return tokenize_10k(filing_text).named_sections()
+
+def preview(content: str, limit: int = SUMMARY_SECTION_CHARS) -> str:
+    """First `limit` characters of a section, for prompts that can't take the whole thing."""
+    return content[:limit] + ("..." if len(content) > limit else "")
 
 def summarize_10k(filing_data: Dict[str, str]) -> str:
     """
@@ -120,13 +172,13 @@ def summarize_10k(filing_data: Dict[str, str]) -> str:
 **CIK:** {filing_data.get('cik', 'Unknown')}
 
 ## Business Description
-{sections.get('Business', 'Not found')}
+{preview(sections.get('Business', 'Not found'))}
 
 ## Risk Factors
-{sections.get('Risk Factors', 'Not found')}
+{preview(sections.get('Risk Factors', 'Not found'))}
 
 ## MD&A (Management's Discussion and Analysis)
-{sections.get('MD&A', 'Not found')}
+{preview(sections.get('MD&A', 'Not found'))}
 
 ---
 *Note: This is an automated summary. For complete details, refer to the full 10-K filing.*
@@ -1,7 +1,8 @@
 import streamlit as st
 from langchain_core.messages import HumanMessage, AIMessage
 from src.agents.graph import create_graph
-from src.utils.rag_manager import list_documents, add_document_to_kb, remove_document
+from src.utils.rag_manager import list_documents, add_document_to_kb, remove_document, upload_digest
+from src.utils.ingest_service import get_ingest_service
 
 def render_assistant_view():
     # Initialize chat history first
@@ -15,18 +16,22 @@ def render_assistant_view():
         
         # File Uploader
         uploaded_files = st.file_uploader("Add Documents", type=['pdf', 'docx', 'txt', 'md'], accept_multiple_files=True)
-        if uploaded_files:
-            with st.spinner(f"Processing {len(uploaded_files)} files..."):
-                for uploaded_file in uploaded_files:
-                    # Check if already processed in this session to avoid re-ingestion on every rerun
-                    # (Simple check: if file is in list_documents, skip? No, user might want to update)
-                    # For now, just process. The rag_manager should handle it.
-                    result = add_document_to_kb(uploaded_file)
+        pending = pending_uploads(uploaded_files or [])
+        if pending:
+            with st.spinner(f"Processing {len(pending)} files..."):
+                for upload_key, uploaded_file in pending:
+                    # Content already in the KB is a no-op; changed files are re-ingested incrementally
+                    digest = upload_digest(uploaded_file)
+                    result = add_document_to_kb(uploaded_file, digest)
                     if "Success" in result:
+                        st.session_state.kb_uploads[upload_key] = digest
                         st.toast(f"✅ {uploaded_file.name} added")
                     else:
                         st.error(f"Error {uploaded_file.name}: {result}")
         
+        # Background indexing progress
+        render_ingest_status()
+        
         st.divider()
         
         # List Documents
@@ -128,3 +133,33 @@ def render_assistant_view():
             
             # Add assistant response to chat history
             st.session_state.messages.append({"role": "assistant", "content": response})
+
+def pending_uploads(uploaded_files) -> list:
+    """
+    Uploads not yet handled in this session, as (registry key, file) pairs.
+    The uploader hands back every file on each rerun; the session registry keeps
+    chat turns from re-hashing or re-ingesting them.
+    """
+    registry = st.session_state.setdefault("kb_uploads", {})
+    pending = []
+    for uploaded_file in uploaded_files:
+        upload_key = getattr(uploaded_file, "file_id", None) or (uploaded_file.name, uploaded_file.size)
+        if upload_key not in registry:
+            pending.append((upload_key, uploaded_file))
+    return pending
+
+def render_ingest_status():
+    """Show background indexing progress and queue depth."""
+    status = get_ingest_service().get_status()
+    if status["state"] == "indexing" or status["queue_depth"] > 0:
+        total = len(status["current"]) or 1
+        st.progress(
+            min(status["batch_done"] / total, 1.0),
+            text=f"Indexing... {status['queue_depth']} file(s) queued"
+        )
+        if st.button("Refresh", key="refresh_ingest_status", type="tertiary"):
+            st.rerun()
+    elif status["last_error"]:
+        st.caption(f"⚠️ Last indexing run failed: {status['last_error']}")
+    if status["files_failed"]:
+        st.caption(f"⚠️ {status['files_failed']} file(s) failed to index")
@@ -2,6 +2,7 @@ import streamlit as st
 from langchain_core.messages import HumanMessage
 from src.agents.graph import create_graph
 from src.utils.rag_manager import list_documents
+from src.tools.sec_tools import fetch_10k_batch
 
 # Section configurations
 SECTIONS = {
@@ -258,7 +259,8 @@ def render_industry_analysis_inputs(data_config):
             help="Add competitors to analyze alongside industry trends"
         )
         if competitors:
-            data_config["competitors"] = [c.strip() for c in competitors.split(",")]
+            data_config["competitors"] = [c.strip() for c in competitors.split(",") if c.strip()]
+            render_competitor_filings(data_config)
         
         st.markdown("**Web Research Domains**")
         web_domains = st.text_area(
@@ -289,6 +291,30 @@ def render_industry_analysis_inputs(data_config):
         if prior_year:
             data_config["prior_year"] = prior_year
 
+def render_competitor_filings(data_config):
+    """Fetch the competitors' latest 10-Ks from SEC EDGAR, listing each as it arrives."""
+    competitor_key = tuple(data_config["competitors"])
+    fetched = st.session_state.composer_uploads.get("competitor_filings")
+    if fetched and fetched["key"] == competitor_key:
+        data_config["competitor_filings"] = fetched["results"]
+        found = sum(1 for result in fetched["results"] if "error" not in result)
+        st.caption(f"Using 10-K filings for {found} of {len(fetched['results'])} competitors")
+        return
+    
+    if st.button("Fetch competitor 10-Ks", help="Pull each competitor's latest 10-K from SEC EDGAR"):
+        results = []
+        with st.status("Fetching 10-K filings...", expanded=True) as status:
+            for result in fetch_10k_batch(data_config["competitors"]):
+                results.append(result)
+                if "error" in result:
+                    status.write(f"⚠️ {result['query']}: {result['error']}")
+                else:
+                    status.write(f"✅ {result['name']} ({result['ticker']}) — 10-K filed {result['filing_date']}")
+            found = sum(1 for result in results if "error" not in result)
+            status.update(label=f"Fetched {found} of {len(results)} 10-K filings", state="complete", expanded=False)
+        st.session_state.composer_uploads["competitor_filings"] = {"key": competitor_key, "results": results}
+        data_config["competitor_filings"] = results
+
 def render_economic_analysis_inputs(data_config):
     """Economic Analysis data sources"""
     st.markdown("**Transaction Details**")
@@ -85,6 +85,7 @@ def render_research_view():
                 "current_mode": "research",
                 "research_topic": topic,
                 "jurisdiction": jurisdiction,
+                "regulatory_area": reg_area,
                 "web_sources": st.session_state.get("web_sources", {})
             }
             
@@ -214,6 +215,7 @@ def render_research_view():
                     "current_mode": "research",
                     "research_topic": topic,
                     "jurisdiction": jurisdiction,
+                    "regulatory_area": reg_area,
                     "web_sources": st.session_state.get("web_sources", {}),
                     "research_findings": previous_findings  # Pass findings to trigger correct routing
                 }
@@ -0,0 +1,125 @@
+"""
+Content-addressed storage for uploaded files.
+Each distinct upload is written once, straight from the upload's memoryview, to
+blobs/<sha256[:2]>/<sha256>. Friendly filenames in ./knowledge_base and
+./temp_uploads are hard links to that single copy, so Streamlit reruns and
+repeated uploads don't write the bytes again. Blobs stay writable, since a link
+in ./knowledge_base is a regular file the user may edit; an existing blob is only
+reused if its bytes still match the upload, otherwise it is rewritten.
+"""
+import os
+import stat
+import shutil
+import hashlib
+import tempfile
+from typing import Optional, Tuple
+
+# Configuration
+BLOB_DIRECTORY = "./chroma_db/blobs"
+COMPARE_BLOCK_SIZE = 1024 * 1024  # Bytes compared at a time when verifying an existing blob
+
+def blob_path(digest: str, directory: str = BLOB_DIRECTORY) -> str:
+    return os.path.join(directory, digest[:2], digest)
+
+def put_blob(data: memoryview, digest: Optional[str] = None, directory: str = BLOB_DIRECTORY) -> Tuple[str, str]:
+    """
+    Store bytes under their SHA-256 (no-op if already stored). Returns (digest, blob path).
+    """
+    if digest is None:
+        digest = hashlib.sha256(data).hexdigest()
+    path = blob_path(digest, directory)
+    try:
+        if _blob_matches(path, data):
+            _make_writable(path)
+            return digest, path
+        # Edited in place through one of its links: the blob no longer holds this digest
+    except FileNotFoundError:
+        pass
+
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    # Write to a temp file and rename, so concurrent sessions never see a partial blob
+    fd, temp_path = tempfile.mkstemp(dir=os.path.dirname(path), prefix=".tmp-")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            f.write(data)
+        os.chmod(temp_path, 0o644)
+        os.replace(temp_path, path)
+    except Exception:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+        raise
+    return digest, path
+
+def _blob_matches(path: str, data: memoryview) -> bool:
+    """Whether a stored blob still holds exactly these bytes (compared block by block)."""
+    view = memoryview(data).cast("B")
+    if os.stat(path).st_size != view.nbytes:
+        return False
+    with open(path, "rb") as f:
+        for start in range(0, view.nbytes, COMPARE_BLOCK_SIZE):
+            if f.read(COMPARE_BLOCK_SIZE) != view[start:start + COMPARE_BLOCK_SIZE]:
+                return False
+    return True
+
+def _make_writable(path: str):
+    """Blobs written before they were kept writable were chmod 0444; linked KB files inherited that."""
+    mode = os.stat(path).st_mode
+    if not mode & stat.S_IWUSR:
+        os.chmod(path, mode | stat.S_IWUSR)
+
+def link_blob(path: str, destination: str):
+    """
+    Point a friendly filename at a blob with a hard link (no-op if it already is one).
+    Falls back to a copy where hard links aren't supported (e.g. across filesystems).
+    Raises FileNotFoundError if the blob was pruned in the meantime.
+    """
+    try:
+        if os.path.samefile(path, destination):
+            return
+    except FileNotFoundError:
+        pass
+
+    os.makedirs(os.path.dirname(destination) or ".", exist_ok=True)
+    temp_destination = f"{destination}.tmp-{os.getpid()}"
+    try:
+        os.link(path, temp_destination)
+    except FileNotFoundError:
+        raise
+    except OSError:
+        shutil.copyfile(path, temp_destination)
+    os.replace(temp_destination, destination)
+
+def store_upload(uploaded_file, destination_folder: Optional[str] = None, digest: Optional[str] = None) -> Tuple[str, str]:
+    """
+    Store a Streamlit upload once and optionally link it as destination_folder/<name>.
+    Returns (digest, path), where path is the friendly link or the blob itself.
+    """
+    data = uploaded_file.getbuffer()
+    digest, path = put_blob(data, digest)
+    if destination_folder is None:
+        return digest, path
+    destination = os.path.join(destination_folder, uploaded_file.name)
+    try:
+        link_blob(path, destination)
+    except FileNotFoundError:
+        # remove_unlinked_blobs pruned the blob between put_blob and the link: write it again
+        digest, path = put_blob(data, digest)
+        link_blob(path, destination)
+    return digest, destination
+
+def remove_unlinked_blobs(directory: str = BLOB_DIRECTORY) -> int:
+    """Delete blobs no friendly filename links to any more. Returns the number removed."""
+    removed = 0
+    if not os.path.isdir(directory):
+        return removed
+    for root, _, files in os.walk(directory):
+        for name in files:
+            path = os.path.join(root, name)
+            if name.startswith(".tmp-"):
+                continue
+            if os.stat(path).st_nlink == 1:
+                os.remove(path)
+                removed += 1
+            else:
+                _make_writable(path)
+    return removed
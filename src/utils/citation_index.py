@@ -0,0 +1,87 @@
+"""
+Regulatory citation extraction.
+Normalizes citations (IRC sections, Treasury Regulations, OECD chapters and
+paragraphs, BEPS Actions) into anchors such as "treas_reg:1.482-9" or
+"oecd:chapter:6". The keyword index stores an inverted anchor -> chunk table so
+pure citation lookups are answered without any vector search.
+"""
+import re
+from collections import Counter
+from typing import List, Tuple
+
+ROMAN_NUMERALS = {"I": 1, "II": 2, "III": 3, "IV": 4, "V": 5, "VI": 6, "VII": 7, "VIII": 8, "IX": 9, "X": 10}
+
+# Treas. Reg. §1.482-9, Treasury Reg §1.482-1(b)(2), Reg. 1.6662-6 (the numbering is distinctive on its own)
+TREAS_REG_PATTERN = re.compile(r"(?<![\w.])(1\.\d{3,4}[A-Za-z]?-\d{1,2}[A-Za-z]?)((?:\([a-z0-9]{1,4}\))*)")
+# IRC Section 482, I.R.C. § 482, Code section 6662, Section 482, § 482
+IRC_PATTERN = re.compile(
+    r"(?:\b(?:I\.?R\.?C\.?|Internal Revenue Code|Code)\s*(?:§+|sec(?:tion)?s?\.?)?\s*(\d{1,4}[A-Z]?)"
+    r"|(?:\bsec(?:tion)?s?\.?|§+)\s*(\d{3,4}[A-Z]?))(?![\d.\-])",
+    re.IGNORECASE
+)
+# OECD Guidelines Chapter VI, Ch. VI (OECD chapters are cited with Roman numerals)
+OECD_CHAPTER_PATTERN = re.compile(r"\b(?:Chapter|CHAPTER|Ch\.?)\s+(X|IX|IV|V?I{1,3}|VI{0,3})\b")
+# paragraph 6.32, para. 1.33, paras 2.1, ¶ 6.32
+OECD_PARAGRAPH_PATTERN = re.compile(r"(?:\bparas?(?:graphs?)?\.?|¶+)\s*(\d{1,2}\.\d{1,3})\b", re.IGNORECASE)
+# BEPS Action 13, Actions 8-10, Action 8–10 (ranges), Actions 8 and 13, Actions 5, 6 & 13 (lists)
+BEPS_ACTION_ITEM = r"(\d{1,2})(?:\s*(?:-|–|—|to)\s*(\d{1,2}))?"
+BEPS_ACTION_ITEM_PATTERN = re.compile(BEPS_ACTION_ITEM, re.IGNORECASE)
+BEPS_ACTION_PATTERN = re.compile(
+    rf"\bactions?\s+({BEPS_ACTION_ITEM}(?:\s*(?:,\s*and|,|and|&)\s*{BEPS_ACTION_ITEM})*)\b",
+    re.IGNORECASE
+)
+
+# Words that only describe the citation; a query made of nothing but citations and
+# these is treated as a direct lookup
+CITATION_FILLER = {
+    "irc", "code", "internal", "revenue", "section", "sec", "treas", "treasury", "reg", "regs",
+    "regulation", "regulations", "oecd", "guidelines", "guideline", "tpg", "chapter", "ch",
+    "paragraph", "para", "paras", "beps", "action", "actions", "the", "of", "under", "and", "in"
+}
+
+def extract_citations(text: str) -> Counter:
+    """Return a Counter of citation anchors found in the text."""
+    anchors = Counter()
+
+    for match in TREAS_REG_PATTERN.finditer(text):
+        anchors[f"treas_reg:{match.group(1).lower()}"] += 1
+        if match.group(2):
+            anchors[f"treas_reg:{match.group(1).lower()}{match.group(2).lower()}"] += 1
+
+    for match in IRC_PATTERN.finditer(text):
+        anchors[f"irc:{(match.group(1) or match.group(2)).upper()}"] += 1
+
+    for match in OECD_CHAPTER_PATTERN.finditer(text):
+        anchors[f"oecd:chapter:{ROMAN_NUMERALS[match.group(1)]}"] += 1
+
+    for match in OECD_PARAGRAPH_PATTERN.finditer(text):
+        anchors[f"oecd:para:{match.group(1)}"] += 1
+
+    for match in BEPS_ACTION_PATTERN.finditer(text):
+        # Only dashes and "to" form ranges; commas, "and" and "&" separate a list
+        for item in BEPS_ACTION_ITEM_PATTERN.finditer(match.group(1)):
+            first = int(item.group(1))
+            last = int(item.group(2)) if item.group(2) else first
+            if 1 <= first <= last <= 15:
+                for action in range(first, last + 1):
+                    anchors[f"beps:action:{action}"] += 1
+
+    return anchors
+
+def parse_citation_query(query: str) -> Tuple[List[str], bool]:
+    """
+    Extract anchors from a query and decide whether it is a pure citation lookup
+    (nothing left but citation labels). Queries with topical words as well
+    ("§1.482-9 services cost method") still yield anchors, for the hybrid search to use.
+    Returns (anchors, is_direct_lookup).
+    """
+    anchors = list(extract_citations(query))
+    if not anchors:
+        return [], False
+
+    residual = query
+    for pattern in (TREAS_REG_PATTERN, IRC_PATTERN, OECD_CHAPTER_PATTERN, OECD_PARAGRAPH_PATTERN, BEPS_ACTION_PATTERN):
+        residual = pattern.sub(" ", residual)
+    words = [w for w in re.findall(r"[A-Za-z]{2,}", residual.lower()) if w not in CITATION_FILLER]
+
+    return anchors, not words
@@ -0,0 +1,139 @@
+"""
+Shared HTTP client for SEC EDGAR.
+One pooled requests.Session (keep-alive, gzip) behind a token-bucket limiter
+that holds every thread in the process to SEC's 10 requests/second fair-access
+limit. 429s and 5xx responses are retried with jittered exponential backoff
+(honouring Retry-After), so throttling slows a bulk pull down instead of failing
+it. Base URLs are configurable so the client can be pointed at a mock server.
+"""
+import os
+import time
+import random
+import threading
+import requests
+from requests.adapters import HTTPAdapter
+from typing import Optional
+
+# Configuration
+SEC_USER_AGENT = os.getenv("SEC_USER_AGENT", "TurboTP Research Tool contact@example.com")
+EDGAR_DATA_URL = os.getenv("EDGAR_DATA_URL", "https://data.sec.gov")        # submissions API
+EDGAR_ARCHIVES_URL = os.getenv("EDGAR_ARCHIVES_URL", "https://www.sec.gov")  # filing archives, ticker file
+RATE_LIMIT_PER_SECOND = 9.0   # Headroom under the SEC fair-access limit of 10 requests/second
+RATE_LIMIT_BURST = 1          # No bursting above the limit
+POOL_SIZE = 16                # Keep-alive connections per host
+REQUEST_TIMEOUT = 30
+MAX_RETRIES = 5
+BACKOFF_BASE = 0.5            # Seconds; doubled per attempt, with full jitter
+BACKOFF_MAX = 30.0
+RETRY_STATUS = {429, 500, 502, 503, 504}
+
+class EdgarError(Exception):
+    """A request that still failed after all retries."""
+
+class TokenBucket:
+    """Thread-safe token bucket: acquire() blocks until a request may be sent."""
+
+    def __init__(self, rate: float = RATE_LIMIT_PER_SECOND, burst: int = RATE_LIMIT_BURST):
+        self.rate = rate
+        self.burst = burst
+        self._tokens = float(burst)
+        self._updated = time.monotonic()
+        self._paused_until = 0.0
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+                self._updated = now
+                if now >= self._paused_until and self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                wait = max(self._paused_until - now, (1 - self._tokens) / self.rate)
+            time.sleep(wait)
+
+    def pause(self, seconds: float):
+        """Hold every caller back, e.g. after SEC answers 429."""
+        with self._lock:
+            self._paused_until = max(self._paused_until, time.monotonic() + seconds)
+            self._tokens = 0.0
+
+def backoff_delay(attempt: int, retry_after: Optional[str] = None) -> float:
+    """Retry-After if the server sent one, else full-jitter exponential backoff."""
+    if retry_after:
+        try:
+            return min(float(retry_after), BACKOFF_MAX)
+        except ValueError:
+            pass
+    return random.uniform(0, min(BACKOFF_MAX, BACKOFF_BASE * (2 ** attempt)))
+
+class EdgarClient:
+    """Pooled, rate-limited GETs against EDGAR."""
+
+    def __init__(self, data_url: str = EDGAR_DATA_URL, archives_url: str = EDGAR_ARCHIVES_URL,
+                 user_agent: str = SEC_USER_AGENT, limiter: Optional[TokenBucket] = None):
+        self.data_url = data_url.rstrip("/")
+        self.archives_url = archives_url.rstrip("/")
+        self.limiter = limiter or TokenBucket()
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=POOL_SIZE, pool_maxsize=POOL_SIZE)
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+        self.session.headers.update({"User-Agent": user_agent, "Accept-Encoding": "gzip, deflate"})
+
+    def get(self, url: str, headers: Optional[dict] = None) -> requests.Response:
+        """
+        Rate-limited GET with retries on 429/5xx and connection errors.
+        Raises EdgarError once retries are exhausted, or requests.HTTPError for other 4xx.
+        """
+        for attempt in range(MAX_RETRIES + 1):
+            self.limiter.acquire()
+            try:
+                response = self.session.get(url, headers=headers, timeout=REQUEST_TIMEOUT)
+            except (requests.ConnectionError, requests.Timeout) as e:
+                if attempt == MAX_RETRIES:
+                    raise EdgarError(f"{url}: {e}") from e
+                time.sleep(backoff_delay(attempt))
+                continue
+
+            if response.status_code not in RETRY_STATUS:
+                response.raise_for_status()
+                return response
+            if attempt == MAX_RETRIES:
+                raise EdgarError(f"{url}: HTTP {response.status_code} after {MAX_RETRIES} retries")
+
+            delay = backoff_delay(attempt, response.headers.get("Retry-After"))
+            if response.status_code == 429:
+                # Throttled: slow down every thread, not just this one
+                self.limiter.pause(delay)
+            print(f"EDGAR returned {response.status_code} for {url}; retrying in {delay:.1f}s")
+            time.sleep(delay)
+
+    # --- EDGAR endpoints ---
+
+    def get_submissions(self, cik: str) -> dict:
+        """Filing history for a company (data.sec.gov submissions API)."""
+        return self.get(f"{self.data_url}/submissions/CIK{cik.zfill(10)}.json").json()
+
+    def get_filing_document(self, cik: str, accession_number: str, document: str) -> str:
+        """A document from a filing's archive folder."""
+        accession = accession_number.replace("-", "")
+        return self.get(f"{self.archives_url}/Archives/edgar/data/{int(cik)}/{accession}/{document}").text
+
+    def get_company_tickers(self, etag: Optional[str] = None) -> requests.Response:
+        """company_tickers.json; pass the stored ETag to get a 304 when it hasn't changed."""
+        headers = {"If-None-Match": etag} if etag else None
+        return self.get(f"{self.archives_url}/files/company_tickers.json", headers=headers)
+
+_client: Optional[EdgarClient] = None
+_client_lock = threading.Lock()
+
+def get_edgar_client() -> EdgarClient:
+    """Return the process-wide EDGAR client (shared session and rate limit)."""
+    global _client
+    if _client is None:
+        with _client_lock:
+            if _client is None:
+                _client = EdgarClient()
+    return _client
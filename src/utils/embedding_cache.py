@@ -0,0 +1,155 @@
+"""
+Two-tier cache for query embeddings.
+A bounded in-memory LRU sits in front of a persistent SQLite tier keyed by
+(model, normalized text), so repeated and follow-up searches skip the remote
+embedding call entirely.
+"""
+import os
+import re
+import sqlite3
+import threading
+import numpy as np
+from collections import OrderedDict
+from typing import List, Optional, Tuple
+from langchain_core.embeddings import Embeddings
+
+# Configuration
+EMBEDDING_CACHE_PATH = "./chroma_db/embedding_cache.sqlite3"
+MEMORY_CACHE_SIZE = 2048  # Entries kept in the in-memory LRU
+
+_WHITESPACE = re.compile(r"\s+")
+
+def normalize_text(text: str) -> str:
+    """Cache key normalization: collapse whitespace and lowercase."""
+    return _WHITESPACE.sub(" ", text).strip().lower()
+
+class CachedEmbeddings(Embeddings):
+    """
+    Embeddings wrapper with an LRU memory tier and a SQLite disk tier.
+
+    Only query embeddings are cached: document embeddings are written once at
+    ingestion and never requested again.
+    """
+
+    def __init__(self, embeddings: Embeddings, model: str,
+                 path: str = EMBEDDING_CACHE_PATH, memory_size: int = MEMORY_CACHE_SIZE):
+        self.embeddings = embeddings
+        self.model = model
+        self.memory_size = memory_size
+        self._memory: "OrderedDict[Tuple[str, str], List[float]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.stats = {"memory_hits": 0, "disk_hits": 0, "misses": 0}
+
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS embeddings ("
+            "model TEXT NOT NULL, text TEXT NOT NULL, vector BLOB NOT NULL, "
+            "PRIMARY KEY (model, text)) WITHOUT ROWID"
+        )
+        self._conn.commit()
+
+    # --- Tiers ---
+
+    def _memory_get(self, key):
+        vector = self._memory.get(key)
+        if vector is not None:
+            self._memory.move_to_end(key)
+        return vector
+
+    def _memory_put(self, key, vector: List[float]):
+        self._memory[key] = vector
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.memory_size:
+            self._memory.popitem(last=False)
+
+    def _disk_get(self, key) -> Optional[List[float]]:
+        row = self._conn.execute(
+            "SELECT vector FROM embeddings WHERE model = ? AND text = ?", key
+        ).fetchone()
+        if row is None:
+            return None
+        return np.frombuffer(row[0], dtype=np.float32).tolist()
+
+    def _disk_put(self, key, vector: List[float]):
+        self._conn.execute(
+            "INSERT OR REPLACE INTO embeddings (model, text, vector) VALUES (?, ?, ?)",
+            (*key, np.asarray(vector, dtype=np.float32).tobytes())
+        )
+        self._conn.commit()
+
+    # --- Embeddings interface ---
+
+    def embed_query(self, text: str) -> List[float]:
+        key = (self.model, normalize_text(text))
+
+        with self._lock:
+            vector = self._memory_get(key)
+            if vector is not None:
+                self.stats["memory_hits"] += 1
+                return vector
+
+            vector = self._disk_get(key)
+            if vector is not None:
+                self.stats["disk_hits"] += 1
+                self._memory_put(key, vector)
+                return vector
+
+            self.stats["misses"] += 1
+
+        # Remote call happens outside the lock so concurrent sessions aren't serialized
+        vector = self.embeddings.embed_query(text)
+
+        with self._lock:
+            self._memory_put(key, vector)
+            self._disk_put(key, vector)
+        return vector
+
+    def embed_queries(self, texts: List[str]) -> List[List[float]]:
+        """
+        Embed several queries, sending all cache misses in one batched request.
+        """
+        keys = [(self.model, normalize_text(text)) for text in texts]
+        vectors: List[Optional[List[float]]] = [None] * len(texts)
+
+        with self._lock:
+            for i, key in enumerate(keys):
+                vector = self._memory_get(key)
+                if vector is not None:
+                    self.stats["memory_hits"] += 1
+                else:
+                    vector = self._disk_get(key)
+                    if vector is not None:
+                        self.stats["disk_hits"] += 1
+                        self._memory_put(key, vector)
+                vectors[i] = vector
+
+        missing = [i for i, vector in enumerate(vectors) if vector is None]
+        if missing:
+            missing_texts = [texts[i] for i in missing]
+            try:
+                # Google embeddings accept a task type for batched query embedding
+                embedded = self.embeddings.embed_documents(missing_texts, task_type="RETRIEVAL_QUERY")
+            except TypeError:
+                embedded = [self.embeddings.embed_query(text) for text in missing_texts]
+
+            with self._lock:
+                self.stats["misses"] += len(missing)
+                for i, vector in zip(missing, embedded):
+                    vectors[i] = vector
+                    self._memory_put(keys[i], vector)
+                    self._disk_put(keys[i], vector)
+
+        return vectors
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        return self.embeddings.embed_documents(texts)
+
+    def get_stats(self) -> dict:
+        """Hit/miss counters plus the current hit rate."""
+        with self._lock:
+            stats = dict(self.stats)
+        total = stats["memory_hits"] + stats["disk_hits"] + stats["misses"]
+        stats["hit_rate"] = (stats["memory_hits"] + stats["disk_hits"]) / total if total else 0.0
+        return stats
@@ -0,0 +1,99 @@
+"""
+Content-addressed cache for extracted document text.
+Keyed by (content hash, extractor, extractor version): the same upload is parsed
+at most once across composer steps, Streamlit reruns and sessions, and bumping
+an extractor's version invalidates only that extractor's entries.
+"""
+import os
+import zlib
+import sqlite3
+import threading
+from collections import OrderedDict
+from typing import Optional, Tuple
+
+# Configuration
+EXTRACTION_CACHE_PATH = "./chroma_db/extraction_cache.sqlite3"
+MEMORY_CACHE_BYTES = 64 * 1024 * 1024  # Cap on extracted text held in the in-memory tier
+
+CacheKey = Tuple[str, str, int]  # (content sha256, extractor, version)
+
+class ExtractionCache:
+    """Size-bounded LRU memory tier over a SQLite disk tier of zlib-compressed text."""
+
+    def __init__(self, path: str = EXTRACTION_CACHE_PATH, memory_bytes: int = MEMORY_CACHE_BYTES):
+        self.memory_bytes = memory_bytes
+        self._memory: "OrderedDict[CacheKey, str]" = OrderedDict()
+        self._memory_size = 0
+        self._lock = threading.Lock()
+        self.stats = {"memory_hits": 0, "disk_hits": 0, "misses": 0}
+
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS extractions ("
+            "content_hash TEXT NOT NULL, extractor TEXT NOT NULL, version INTEGER NOT NULL, text BLOB NOT NULL, "
+            "PRIMARY KEY (content_hash, extractor, version)) WITHOUT ROWID"
+        )
+        self._conn.commit()
+
+    def _memory_put(self, key: CacheKey, text: str):
+        previous = self._memory.pop(key, None)
+        if previous is not None:
+            self._memory_size -= len(previous)
+        if len(text) > self.memory_bytes:
+            return
+        self._memory[key] = text
+        self._memory_size += len(text)
+        while self._memory_size > self.memory_bytes:
+            _, evicted = self._memory.popitem(last=False)
+            self._memory_size -= len(evicted)
+
+    def get(self, key: CacheKey) -> Optional[str]:
+        with self._lock:
+            text = self._memory.get(key)
+            if text is not None:
+                self._memory.move_to_end(key)
+                self.stats["memory_hits"] += 1
+                return text
+
+            row = self._conn.execute(
+                "SELECT text FROM extractions WHERE content_hash = ? AND extractor = ? AND version = ?", key
+            ).fetchone()
+            if row is None:
+                self.stats["misses"] += 1
+                return None
+            text = zlib.decompress(row[0]).decode("utf-8")
+            self.stats["disk_hits"] += 1
+            self._memory_put(key, text)
+            return text
+
+    def put(self, key: CacheKey, text: str):
+        with self._lock:
+            self._memory_put(key, text)
+            self._conn.execute(
+                "INSERT OR REPLACE INTO extractions (content_hash, extractor, version, text) VALUES (?, ?, ?, ?)",
+                (*key, zlib.compress(text.encode("utf-8")))
+            )
+            self._conn.commit()
+
+    def get_stats(self) -> dict:
+        """Hit/miss counters plus the current hit rate."""
+        with self._lock:
+            stats = dict(self.stats)
+            stats["memory_bytes"] = self._memory_size
+        total = stats["memory_hits"] + stats["disk_hits"] + stats["misses"]
+        stats["hit_rate"] = (stats["memory_hits"] + stats["disk_hits"]) / total if total else 0.0
+        return stats
+
+_cache: Optional[ExtractionCache] = None
+_cache_lock = threading.Lock()
+
+def get_extraction_cache() -> ExtractionCache:
+    """Return the process-wide extraction cache."""
+    global _cache
+    if _cache is None:
+        with _cache_lock:
+            if _cache is None:
+                _cache = ExtractionCache()
+    return _cache
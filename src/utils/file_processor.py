@@ -3,32 +3,82 @@ File processing utilities for Document Composer.
 Handles uploaded files and extracts processable content.
 """
 import os
-from typing import Optional, List
+import hashlib
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from typing import Optional, List, Iterator, Tuple
 import PyPDF2
 from docx import Document
+from src.utils.blob_store import store_upload
+from src.utils.extraction_cache import get_extraction_cache
+
+# Extractor per file extension, with a version to bump whenever its output changes
+EXTRACTORS = {
+    ".pdf": ("pdf", 1),
+    ".docx": ("docx", 1),
+    ".doc": ("docx", 1),
+    ".txt": ("txt", 1),
+    ".md": ("txt", 1),
+}
+
+# Large PDFs are split into page ranges across a process pool
+PARALLEL_PDF_MIN_PAGES = 200
+PAGES_PER_TASK = 50
+PDF_WORKERS = max(1, (os.cpu_count() or 2) - 1)
 
 def save_uploaded_file(uploaded_file, destination_folder: str = "./temp_uploads") -> str:
     """
     Save Streamlit uploaded file to temporary location.
+    The bytes are stored once in the blob store; the file path is a hard link to that copy.
     Returns the file path.
     """
-    os.makedirs(destination_folder, exist_ok=True)
-    file_path = os.path.join(destination_folder, uploaded_file.name)
-    
-    with open(file_path, "wb") as f:
-        f.write(uploaded_file.getbuffer())
-    
+    _, file_path = store_upload(uploaded_file, destination_folder)
     return file_path
 
-def extract_text_from_pdf(file_path: str) -> str:
-    """Extract text content from PDF file."""
+def _clip_pages(pages: Optional[range], page_count: int) -> range:
+    if pages is None:
+        return range(page_count)
+    return range(max(pages.start, 0), min(pages.stop, page_count))
+
+def iter_pdf_pages(file_path: str, pages: Optional[range] = None) -> Iterator[Tuple[int, str]]:
+    """
+    Lazily yield (page_number, text) for a PDF, 1-based page numbers.
+    `pages` is a 0-based range of page indexes; pages outside it are never parsed.
+    """
+    with open(file_path, 'rb') as file:
+        reader = PyPDF2.PdfReader(file)
+        for index in _clip_pages(pages, len(reader.pages)):
+            yield index + 1, reader.pages[index].extract_text() or ""
+
+def _extract_page_range(task: Tuple[str, int, int]) -> List[Tuple[int, str]]:
+    file_path, start, stop = task
+    return list(iter_pdf_pages(file_path, range(start, stop)))
+
+def extract_pdf_pages(file_path: str, pages: Optional[range] = None, parallel: bool = True) -> Iterator[Tuple[int, str]]:
+    """
+    Yield (page_number, text) in page order. Ranges of at least PARALLEL_PDF_MIN_PAGES
+    are extracted in PAGES_PER_TASK slices on a process pool.
+    """
+    with open(file_path, 'rb') as file:
+        page_range = _clip_pages(pages, len(PyPDF2.PdfReader(file).pages))
+    
+    if not parallel or PDF_WORKERS == 1 or len(page_range) < PARALLEL_PDF_MIN_PAGES:
+        yield from iter_pdf_pages(file_path, page_range)
+        return
+    
+    tasks = [
+        (file_path, start, min(start + PAGES_PER_TASK, page_range.stop))
+        for start in range(page_range.start, page_range.stop, PAGES_PER_TASK)
+    ]
+    # Spawned workers: this runs inside Streamlit's threads, where forking is unsafe
+    with ProcessPoolExecutor(max_workers=PDF_WORKERS, mp_context=multiprocessing.get_context("spawn")) as pool:
+        for page_batch in pool.map(_extract_page_range, tasks):
+            yield from page_batch
+
+def extract_text_from_pdf(file_path: str, pages: Optional[range] = None) -> str:
+    """Extract text content from PDF file (optionally only a 0-based range of pages)."""
     try:
-        with open(file_path, 'rb') as file:
-            reader = PyPDF2.PdfReader(file)
-            text = ""
-            for page in reader.pages:
-                text += page.extract_text() + "\n"
-            return text.strip()
+        return "\n".join(text for _, text in extract_pdf_pages(file_path, pages)).strip()
     except Exception as e:
         return f"Error extracting PDF: {str(e)}"
 
@@ -49,23 +99,67 @@ def extract_text_from_txt(file_path: str) -> str:
     except Exception as e:
         return f"Error extracting TXT: {str(e)}"
 
-def process_uploaded_file(uploaded_file) -> str:
+def _extract(file_path: str, extractor: str, pages: Optional[range] = None) -> str:
+    if extractor == "pdf":
+        return extract_text_from_pdf(file_path, pages)
+    elif extractor == "docx":
+        return extract_text_from_docx(file_path)
+    return extract_text_from_txt(file_path)
+
+def _is_error(text: str) -> bool:
+    return text.startswith("Error") or text.startswith("Unsupported")
+
+def process_uploaded_file(uploaded_file, pages: Optional[range] = None) -> str:
     """
     Process uploaded file and extract text content.
-    Returns extracted text.
+    `pages` limits PDFs to a 0-based page range (other formats are always read whole).
+    Returns extracted text (served from the extraction cache when this content was seen before).
     """
-    file_path = save_uploaded_file(uploaded_file)
-    
     file_ext = os.path.splitext(uploaded_file.name)[1].lower()
-    
-    if file_ext == '.pdf':
-        return extract_text_from_pdf(file_path)
-    elif file_ext in ['.docx', '.doc']:
-        return extract_text_from_docx(file_path)
-    elif file_ext in ['.txt', '.md']:
-        return extract_text_from_txt(file_path)
-    else:
+    if file_ext not in EXTRACTORS:
         return f"Unsupported file type: {file_ext}"
+    
+    # Content-addressed lookup: no save or parse for content that was already extracted
+    extractor, version = EXTRACTORS[file_ext]
+    if extractor != "pdf":
+        pages = None
+    cache_extractor = extractor if pages is None else f"{extractor}:{pages.start}-{pages.stop}"
+    digest = hashlib.sha256(uploaded_file.getbuffer()).hexdigest()
+    key = (digest, cache_extractor, version)
+    cache = get_extraction_cache()
+    text = cache.get(key)
+    if text is not None:
+        return text
+    
+    # Extract from the single stored copy (extractors don't depend on the file name)
+    _, file_path = store_upload(uploaded_file, digest=digest)
+    text = _extract(file_path, extractor, pages)
+    if not _is_error(text):
+        cache.put(key, text)
+    return text
+
+def extract_text_from_file(file_path: str) -> str:
+    """
+    Extract text from a file on disk (e.g. a Knowledge Base document), cached by content hash.
+    Unknown extensions are read as plain text.
+    """
+    from src.tools.ingest import get_file_hash
+    
+    extractor, version = EXTRACTORS.get(os.path.splitext(file_path)[1].lower(), ("txt", 1))
+    try:
+        key = (get_file_hash(file_path), extractor, version)
+    except OSError as e:
+        return f"Error reading file: {str(e)}"
+    
+    cache = get_extraction_cache()
+    text = cache.get(key)
+    if text is not None:
+        return text
+    
+    text = _extract(file_path, extractor)
+    if not _is_error(text):
+        cache.put(key, text)
+    return text
 
 def process_multiple_files(uploaded_files: List) -> str:
     """
@@ -0,0 +1,131 @@
+"""
+On-disk store for SEC filings.
+Filings are immutable once they have an accession number, so each document is
+downloaded once and kept gzip-compressed under filings/<cik>/<accession>/.
+A SQLite index of form, filing date and primary document per CIK (refreshed from
+the submissions API at most every SUBMISSIONS_TTL_SECONDS) answers "latest 10-K"
+without touching EDGAR, so only genuinely new filings are fetched.
+"""
+import os
+import gzip
+import time
+import sqlite3
+import threading
+from typing import Dict, List, Optional
+from src.utils.ticker_index import SEC_CACHE_DIRECTORY
+
+# Configuration
+FILING_STORE_DIRECTORY = os.path.join(SEC_CACHE_DIRECTORY, "filings")
+FILING_INDEX_PATH = os.path.join(SEC_CACHE_DIRECTORY, "filings.sqlite3")
+SUBMISSIONS_TTL_SECONDS = 12 * 60 * 60  # How long a CIK's filing list is trusted before re-checking EDGAR
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS filings (
+    cik TEXT NOT NULL,
+    accession_number TEXT NOT NULL,
+    form TEXT NOT NULL,
+    filing_date TEXT,
+    primary_document TEXT,
+    PRIMARY KEY (cik, accession_number)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS idx_filings_form ON filings(cik, form, filing_date);
+CREATE TABLE IF NOT EXISTS companies (
+    cik TEXT PRIMARY KEY,
+    checked_at REAL NOT NULL
+);
+"""
+
+FILING_COLUMNS = ("cik", "accession_number", "form", "filing_date", "primary_document")
+
+class FilingStore:
+    """Per-CIK filing index in SQLite plus gzip-compressed documents on disk."""
+
+    def __init__(self, directory: str = FILING_STORE_DIRECTORY, index_path: str = FILING_INDEX_PATH,
+                 ttl: float = SUBMISSIONS_TTL_SECONDS):
+        self.directory = directory
+        self.ttl = ttl
+        self._lock = threading.Lock()
+
+        os.makedirs(directory, exist_ok=True)
+        self._conn = sqlite3.connect(index_path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.executescript(SCHEMA)
+        self._conn.commit()
+
+    # --- Filing index ---
+
+    def is_fresh(self, cik: str) -> bool:
+        """True if the CIK's filing list was checked against EDGAR within the TTL."""
+        with self._lock:
+            row = self._conn.execute("SELECT checked_at FROM companies WHERE cik = ?", (cik,)).fetchone()
+        return row is not None and time.time() - row[0] < self.ttl
+
+    def record_submissions(self, cik: str, submissions: dict):
+        """Index the recent filings from a submissions API response."""
+        recent = submissions.get("filings", {}).get("recent", {})
+        rows = [
+            (cik, accession, form, filing_date, document)
+            for accession, form, filing_date, document in zip(
+                recent.get("accessionNumber", []), recent.get("form", []),
+                recent.get("filingDate", []), recent.get("primaryDocument", [])
+            )
+        ]
+        with self._lock:
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO filings (cik, accession_number, form, filing_date, primary_document) "
+                "VALUES (?, ?, ?, ?, ?)", rows
+            )
+            self._conn.execute(
+                "INSERT OR REPLACE INTO companies (cik, checked_at) VALUES (?, ?)", (cik, time.time())
+            )
+            self._conn.commit()
+
+    def filings(self, cik: str, form: Optional[str] = None) -> List[Dict]:
+        """Indexed filings for a CIK (optionally one form type), newest first."""
+        sql = f"SELECT {', '.join(FILING_COLUMNS)} FROM filings WHERE cik = ?"
+        params = [cik]
+        if form is not None:
+            sql += " AND form = ?"
+            params.append(form)
+        with self._lock:
+            rows = self._conn.execute(sql + " ORDER BY filing_date DESC", params).fetchall()
+        return [dict(zip(FILING_COLUMNS, row)) for row in rows]
+
+    def latest_filing(self, cik: str, form: str = "10-K") -> Optional[Dict]:
+        filings = self.filings(cik, form)
+        return filings[0] if filings else None
+
+    # --- Documents ---
+
+    def document_path(self, cik: str, accession_number: str, document: str) -> str:
+        accession = accession_number.replace("-", "")
+        return os.path.join(self.directory, cik, accession, os.path.basename(document) + ".gz")
+
+    def get_document(self, cik: str, accession_number: str, document: str) -> Optional[str]:
+        """A stored filing document, or None if it hasn't been downloaded."""
+        path = self.document_path(cik, accession_number, document)
+        if not os.path.exists(path):
+            return None
+        with gzip.open(path, "rt", encoding="utf-8") as f:
+            return f.read()
+
+    def put_document(self, cik: str, accession_number: str, document: str, text: str):
+        path = self.document_path(cik, accession_number, document)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        # Write then rename, so a concurrent reader never sees a truncated file
+        temp_path = f"{path}.tmp-{os.getpid()}-{threading.get_ident()}"
+        with gzip.open(temp_path, "wt", encoding="utf-8", compresslevel=6) as f:
+            f.write(text)
+        os.replace(temp_path, path)
+
+_store: Optional[FilingStore] = None
+_store_lock = threading.Lock()
+
+def get_filing_store() -> FilingStore:
+    """Return the process-wide filing store."""
+    global _store
+    if _store is None:
+        with _store_lock:
+            if _store is None:
+                _store = FilingStore()
+    return _store
@@ -0,0 +1,234 @@
+"""
+Ingestion manifest for the Knowledge Base.
+One SQLite table of ingested files (hash, size, mtime, embedding model, ingest
+time) plus the chunk IDs each file produced, shared by the batch ingestion script
+and the upload path. WAL mode lets the app read while an ingest run writes.
+Files are keyed by their path relative to the app root ("data/x.pdf",
+"knowledge_base/x.pdf"), so the same file name in both folders doesn't collide.
+"""
+import os
+import json
+import time
+import sqlite3
+import threading
+from typing import Dict, List, Optional
+
+# Configuration
+MANIFEST_PATH = "./chroma_db/manifest.sqlite3"
+LEGACY_TRACKING_FILE = "./chroma_db/ingested_files.json"
+BUSY_TIMEOUT_MS = 30000  # Wait this long for the other process's write to finish
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS files (
+    name TEXT PRIMARY KEY,
+    origin TEXT NOT NULL,
+    path TEXT,
+    hash TEXT,
+    size INTEGER,
+    mtime_ns INTEGER,
+    inode INTEGER,
+    chunk_count INTEGER NOT NULL DEFAULT 0,
+    embedding_model TEXT,
+    ingested_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_files_origin ON files(origin, name);
+CREATE TABLE IF NOT EXISTS file_chunks (
+    name TEXT NOT NULL,
+    chunk_id TEXT NOT NULL,
+    PRIMARY KEY (name, chunk_id)
+) WITHOUT ROWID;
+"""
+
+FILE_COLUMNS = ("name", "origin", "path", "hash", "size", "mtime_ns", "inode", "chunk_count", "embedding_model", "ingested_at")
+
+def manifest_key(origin: str, filename: str) -> str:
+    """Manifest key of a file: its path relative to the app root (each origin has its own folder)."""
+    return f"{origin}/{filename}"
+
+class IngestManifest:
+    """
+    Transactional record of ingested files.
+    Writes take SQLite's write lock (single writer across processes); reads never block on them.
+    """
+
+    def __init__(self, path: str = MANIFEST_PATH):
+        self.path = path
+        self._lock = threading.RLock()
+
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        # isolation_level=None: transactions are managed explicitly below
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(f"PRAGMA busy_timeout={BUSY_TIMEOUT_MS}")
+        self._conn.executescript(SCHEMA)
+        self._migrate_columns()
+        self._import_legacy_tracking()
+        self._migrate_keys()
+
+    def _write(self, statements):
+        """Run (sql, params) statements in one write transaction."""
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                for sql, params in statements:
+                    if isinstance(params, list):
+                        self._conn.executemany(sql, params)
+                    else:
+                        self._conn.execute(sql, params or ())
+                self._conn.execute("COMMIT")
+            except Exception:
+                self._conn.execute("ROLLBACK")
+                raise
+
+    def _migrate_columns(self):
+        """Add columns introduced after a manifest was created."""
+        existing = {row[1] for row in self._conn.execute("PRAGMA table_info(files)")}
+        if "inode" not in existing:
+            self._write([("ALTER TABLE files ADD COLUMN inode INTEGER", None)])
+
+    def _migrate_keys(self):
+        """Re-key entries recorded by bare file name to manifest_key(origin, name)."""
+        if self._conn.execute("SELECT 1 FROM files WHERE instr(name, '/') = 0 LIMIT 1").fetchone() is None:
+            return
+        self._write([
+            ("DELETE FROM file_chunks WHERE instr(name, '/') = 0 AND name NOT IN (SELECT name FROM files)", None),
+            ("UPDATE file_chunks SET name = (SELECT f.origin || '/' || f.name FROM files f "
+             "WHERE f.name = file_chunks.name) WHERE instr(name, '/') = 0", None),
+            ("UPDATE files SET name = origin || '/' || name WHERE instr(name, '/') = 0", None),
+        ])
+
+    def _import_legacy_tracking(self):
+        """
+        One-time import of ingested_files.json, which held {filename: hash} from the
+        ingest script or {filename: {"chunks": n}} from uploads.
+        """
+        if not os.path.exists(LEGACY_TRACKING_FILE):
+            return
+        try:
+            with open(LEGACY_TRACKING_FILE, "r") as f:
+                tracked = json.load(f)
+        except Exception:
+            tracked = {}
+
+        now = time.time()
+        rows = []
+        for name, value in tracked.items():
+            if isinstance(value, dict):
+                rows.append((name, "knowledge_base", None, value.get("chunks", 0), now))
+            else:
+                rows.append((name, "data", value, 0, now))
+        if rows:
+            self._write([(
+                "INSERT OR IGNORE INTO files (name, origin, hash, chunk_count, ingested_at) VALUES (?, ?, ?, ?, ?)",
+                rows
+            )])
+        os.replace(LEGACY_TRACKING_FILE, LEGACY_TRACKING_FILE + ".migrated")
+
+    # --- Reads ---
+
+    def get(self, name: str) -> Optional[Dict]:
+        """Manifest entry for a file (by manifest_key), or None if it was never ingested."""
+        with self._lock:
+            row = self._conn.execute(
+                f"SELECT {', '.join(FILE_COLUMNS)} FROM files WHERE name = ?", (name,)
+            ).fetchone()
+        return dict(zip(FILE_COLUMNS, row)) if row else None
+
+    def entries(self, origin: Optional[str] = None) -> Dict[str, Dict]:
+        """All manifest entries (optionally for one origin), keyed by manifest_key."""
+        sql = f"SELECT {', '.join(FILE_COLUMNS)} FROM files"
+        params = ()
+        if origin is not None:
+            sql += " WHERE origin = ?"
+            params = (origin,)
+        with self._lock:
+            rows = self._conn.execute(sql + " ORDER BY name", params).fetchall()
+        return {row[0]: dict(zip(FILE_COLUMNS, row)) for row in rows}
+
+    def list_names(self, origin: Optional[str] = None) -> List[str]:
+        """Manifest keys of ingested files, sorted (served from the primary key / origin index)."""
+        with self._lock:
+            if origin is None:
+                rows = self._conn.execute("SELECT name FROM files ORDER BY name").fetchall()
+            else:
+                rows = self._conn.execute(
+                    "SELECT name FROM files WHERE origin = ? ORDER BY name", (origin,)
+                ).fetchall()
+        return [row[0] for row in rows]
+
+    def chunk_ids(self, name: str) -> List[str]:
+        """Chunk IDs the file produced at its last ingest."""
+        with self._lock:
+            rows = self._conn.execute("SELECT chunk_id FROM file_chunks WHERE name = ?", (name,)).fetchall()
+        return [row[0] for row in rows]
+
+    def origin_chunk_ids(self, origin: str) -> Dict[str, List[str]]:
+        """Chunk IDs per file for one origin ({manifest_key: [chunk_id, ...]}, empty lists included)."""
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT f.name, c.chunk_id FROM files f LEFT JOIN file_chunks c ON c.name = f.name "
+                "WHERE f.origin = ? ORDER BY f.name", (origin,)
+            ).fetchall()
+        chunk_ids: Dict[str, List[str]] = {}
+        for name, chunk_id in rows:
+            chunk_ids.setdefault(name, [])
+            if chunk_id is not None:
+                chunk_ids[name].append(chunk_id)
+        return chunk_ids
+
+    # --- Writes ---
+
+    def record(self, name: str, origin: str, chunk_ids: List[str], path: Optional[str] = None,
+               file_hash: Optional[str] = None, size: Optional[int] = None, mtime_ns: Optional[int] = None,
+               inode: Optional[int] = None, embedding_model: Optional[str] = None):
+        """Insert or replace a file's entry and its chunk IDs atomically."""
+        self._write([
+            ("INSERT OR REPLACE INTO files (name, origin, path, hash, size, mtime_ns, inode, chunk_count, "
+             "embedding_model, ingested_at) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+             (name, origin, path, file_hash, size, mtime_ns, inode, len(chunk_ids), embedding_model, time.time())),
+            ("DELETE FROM file_chunks WHERE name = ?", (name,)),
+            ("INSERT OR IGNORE INTO file_chunks (name, chunk_id) VALUES (?, ?)",
+             [(name, chunk_id) for chunk_id in chunk_ids]),
+        ])
+
+    def update_stat(self, rows: List[tuple]):
+        """
+        Refresh (size, mtime_ns, inode) for files whose content hash was unchanged,
+        so the next scan can skip them without hashing. Rows are (name, size, mtime_ns, inode).
+        """
+        self._write([(
+            "UPDATE files SET size = ?, mtime_ns = ?, inode = ? WHERE name = ?",
+            [(size, mtime_ns, inode, name) for name, size, mtime_ns, inode in rows]
+        )])
+
+    def remove(self, name: str):
+        self._write([
+            ("DELETE FROM files WHERE name = ?", (name,)),
+            ("DELETE FROM file_chunks WHERE name = ?", (name,)),
+        ])
+
+    def remove_origin(self, origin: str):
+        """Drop every entry of one origin (e.g. when the Knowledge Base is cleared), keeping the others."""
+        self._write([
+            ("DELETE FROM file_chunks WHERE name IN (SELECT name FROM files WHERE origin = ?)", (origin,)),
+            ("DELETE FROM files WHERE origin = ?", (origin,)),
+        ])
+
+    def clear(self):
+        self._write([
+            ("DELETE FROM files", None),
+            ("DELETE FROM file_chunks", None),
+        ])
+
+_manifest: Optional[IngestManifest] = None
+_manifest_lock = threading.Lock()
+
+def get_manifest() -> IngestManifest:
+    """Return the shared ingestion manifest for this process."""
+    global _manifest
+    if _manifest is None:
+        with _manifest_lock:
+            if _manifest is None:
+                _manifest = IngestManifest()
+    return _manifest
@@ -0,0 +1,338 @@
+"""
+Staged, incremental ingestion pipeline for the regulatory library.
+Files are extracted in a process pool, split and tagged as each file completes,
+and diffed chunk by chunk against the collection. Only new text is embedded, in
+fixed-size batches on a bounded thread pool (with backoff on rate limits); writes
+to Chroma and the keyword index are bulk, and stale chunks are deleted.
+"""
+import os
+import time
+import multiprocessing
+import random
+import hashlib
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, FIRST_COMPLETED, as_completed, wait
+from typing import Callable, Dict, List, Optional, Tuple
+from langchain_core.documents import Document
+from langchain_text_splitters import RecursiveCharacterTextSplitter
+from src.utils.metadata_tags import tag_chunks
+
+# Configuration
+EXTRACT_WORKERS = max(1, (os.cpu_count() or 2) - 1)  # Processes for PDF/text extraction
+EMBED_BATCH_SIZE = 100                                # Texts per embedding request (API maximum)
+EMBED_CONCURRENCY = 4                                 # Embedding requests in flight
+WRITE_BATCH_SIZE = 2000                               # Chunks per Chroma / keyword index write
+MAX_RETRIES = 6
+BACKOFF_BASE = 1.0                                    # Seconds, doubled per attempt
+BACKOFF_MAX = 60.0
+CHUNK_SIZE = 1000
+CHUNK_OVERLAP = 200
+
+# Error fragments that mean "try again later" (quota, rate limit, transient outage)
+RETRYABLE_ERRORS = ("429", "resource exhausted", "resourceexhausted", "rate limit", "quota",
+                    "503", "unavailable", "deadline exceeded", "timed out")
+
+def load_file(file_path: str) -> List[Document]:
+    """Extract one file into page Documents (runs in a worker process)."""
+    from langchain_community.document_loaders import PyPDFLoader, TextLoader
+    extension = os.path.splitext(file_path)[1].lower()
+    if extension == ".pdf":
+        loader = PyPDFLoader(file_path)
+    elif extension in (".docx", ".doc"):
+        from src.utils.file_processor import extract_text_from_docx
+        text = extract_text_from_docx(file_path)
+        if text.startswith("Error"):
+            raise ValueError(text)
+        return [Document(page_content=text, metadata={"source": file_path})]
+    else:  # .txt / .md
+        loader = TextLoader(file_path)
+    return loader.load()
+
+def is_retryable(error: Exception) -> bool:
+    message = f"{type(error).__name__} {error}".lower()
+    return any(fragment in message for fragment in RETRYABLE_ERRORS)
+
+def embed_with_retry(embeddings, texts: List[str]) -> List[List[float]]:
+    """Embed one batch, backing off exponentially (with jitter) on rate limits."""
+    for attempt in range(MAX_RETRIES + 1):
+        try:
+            return embeddings.embed_documents(texts)
+        except Exception as e:
+            if attempt == MAX_RETRIES or not is_retryable(e):
+                raise
+            delay = min(BACKOFF_MAX, BACKOFF_BASE * 2 ** attempt) * random.uniform(0.5, 1.0)
+            print(f"Embedding rate limited ({e}); retrying in {delay:.1f}s")
+            time.sleep(delay)
+
+def assign_chunk_ids(chunks: List[Document]) -> List[str]:
+    """
+    Store a content hash on each chunk and return stable chunk IDs.
+
+    IDs are derived from (source, position, content hash), where position is the
+    occurrence of that content within the source. Identical text in one file gets
+    distinct IDs, while inserting a page doesn't renumber every chunk after it.
+    """
+    occurrences = Counter()
+    ids = []
+    for chunk in chunks:
+        source = chunk.metadata.get("source", "")
+        content_hash = hashlib.sha1(chunk.page_content.encode("utf-8")).hexdigest()
+        chunk.metadata["content_hash"] = content_hash
+        position = occurrences[(source, content_hash)]
+        occurrences[(source, content_hash)] += 1
+        ids.append(hashlib.sha1(f"{source}\x00{position}\x00{content_hash}".encode("utf-8")).hexdigest())
+    return ids
+
+def plan_incremental(vectorstore, chunks: List[Document], ids: List[str]) -> Dict:
+    """
+    Diff freshly split chunks of one source against what the collection holds.
+
+    Returns:
+        unchanged: number of chunks already stored with identical metadata
+        reuse: [(chunk, id, vector)] whose embedding is already known by content hash
+        embed: [(chunk, id)] that need a new embedding
+        orphans: stored IDs of this source that no longer exist
+        existing: all stored IDs of this source (never rolled back on failure)
+    """
+    collection = vectorstore._collection
+    source = chunks[0].metadata.get("source", "")
+    stored = collection.get(where={"source": source}, include=["metadatas", "embeddings"])
+    stored_metadata = dict(zip(stored["ids"], stored["metadatas"]))
+    vectors_by_hash = {}
+    for metadata, vector in zip(stored["metadatas"], _embeddings(stored)):
+        if metadata and metadata.get("content_hash"):
+            vectors_by_hash[metadata["content_hash"]] = vector
+
+    # Chunks copied from other sources (e.g. a renamed file) reuse their embeddings too
+    unknown_hashes = list({chunk.metadata["content_hash"] for chunk in chunks} - vectors_by_hash.keys())
+    for batch_start in range(0, len(unknown_hashes), WRITE_BATCH_SIZE):
+        found = collection.get(
+            where={"content_hash": {"$in": unknown_hashes[batch_start:batch_start + WRITE_BATCH_SIZE]}},
+            include=["metadatas", "embeddings"]
+        )
+        for metadata, vector in zip(found["metadatas"], _embeddings(found)):
+            vectors_by_hash[metadata["content_hash"]] = vector
+
+    plan = {"unchanged": 0, "reuse": [], "embed": [], "existing": set(stored_metadata)}
+    for chunk, chunk_id in zip(chunks, ids):
+        content_hash = chunk.metadata["content_hash"]
+        if stored_metadata.get(chunk_id) == chunk.metadata:
+            plan["unchanged"] += 1
+        elif content_hash in vectors_by_hash:
+            plan["reuse"].append((chunk, chunk_id, list(vectors_by_hash[content_hash])))
+        else:
+            plan["embed"].append((chunk, chunk_id))
+    plan["orphans"] = list(plan["existing"] - set(ids))
+    return plan
+
+def _embeddings(result: dict) -> list:
+    # Chroma returns None (or a NumPy array) depending on the version and result size
+    embeddings = result.get("embeddings")
+    return [] if embeddings is None else embeddings
+
+def write_chunks(vectorstore, keyword_index, chunks: List[Document], ids: List[str], vectors: List[List[float]]):
+    """Bulk write embedded chunks to the Chroma collection and the keyword index."""
+    vectorstore._collection.upsert(
+        ids=ids,
+        embeddings=vectors,
+        documents=[chunk.page_content for chunk in chunks],
+        metadatas=[chunk.metadata for chunk in chunks]
+    )
+    keyword_index.add_documents(chunks, ids)
+
+def delete_chunks(vectorstore, keyword_index, ids: List[str]):
+    """Delete chunks from the Chroma collection and the keyword index."""
+    for batch_start in range(0, len(ids), WRITE_BATCH_SIZE):
+        vectorstore._collection.delete(ids=ids[batch_start:batch_start + WRITE_BATCH_SIZE])
+    keyword_index.delete_ids(ids)
+
+def run_ingestion_pipeline(files: List[Tuple[str, str]], vectorstore, keyword_index, embeddings,
+                           name_as_source: bool = False,
+                           on_file_done: Optional[Callable[[str, bool], None]] = None) -> Dict:
+    """
+    Ingest (filename, file_path) pairs incrementally.
+
+    Only new or changed chunks are embedded; chunks whose text is already stored
+    reuse their embedding, and chunk IDs a file no longer produces are deleted once
+    its new chunks are written. Returns a report with the files that were fully
+    written (`ingested`) and their chunk IDs (`chunk_ids`), the ones that failed
+    (`failed`), chunk counts and throughput in files/sec and chunks/sec.
+
+    name_as_source stores the file name instead of the loader's path as chunk
+    source; on_file_done(filename, ok) is called as each file finishes.
+    """
+    start = time.perf_counter()
+    splitter = RecursiveCharacterTextSplitter(chunk_size=CHUNK_SIZE, chunk_overlap=CHUNK_OVERLAP)
+
+    remaining_chunks: Dict[str, int] = {}  # filename -> chunks not yet written
+    orphans: Dict[str, List[str]] = {}     # filename -> stale IDs to delete once it's complete
+    existing_ids: Dict[str, set] = {}      # filename -> IDs stored before this run
+    written_ids: Dict[str, List[str]] = {}  # filename -> chunk IDs written by this run
+    file_ids: Dict[str, List[str]] = {}     # filename -> all chunk IDs of its current version
+    failed: Dict[str, str] = {}
+    ingested: List[str] = []
+    stats = {"chunks": 0, "embedded": 0, "reused": 0, "unchanged": 0, "deleted": 0}
+
+    in_flight = {}       # embedding future -> (chunks, ids, owner per chunk)
+    pending_write = []   # (chunks, ids, vectors, owner per chunk) waiting for the next bulk write
+    batch: List[Document] = []
+    batch_ids: List[str] = []
+    batch_owners: List[str] = []
+
+    def complete(filename: str):
+        if orphans.get(filename):
+            delete_chunks(vectorstore, keyword_index, orphans[filename])
+            stats["deleted"] += len(orphans[filename])
+        ingested.append(filename)
+        if on_file_done:
+            on_file_done(filename, True)
+
+    def fail(filename: str, error: str):
+        if filename not in failed and on_file_done:
+            on_file_done(filename, False)
+        failed[filename] = error
+
+    def finish_chunks(owners: List[str]):
+        for filename in owners:
+            remaining_chunks[filename] -= 1
+            if remaining_chunks[filename] == 0 and filename not in failed:
+                complete(filename)
+
+    def flush_writes():
+        if not pending_write:
+            return
+        chunks, ids, vectors = [], [], []
+        for entry_chunks, entry_ids, entry_vectors, _ in pending_write:
+            chunks += entry_chunks
+            ids += entry_ids
+            vectors += entry_vectors
+        write_chunks(vectorstore, keyword_index, chunks, ids, vectors)
+        stats["chunks"] += len(chunks)
+
+        for _, entry_ids, _, owners in pending_write:
+            for chunk_id, filename in zip(entry_ids, owners):
+                written_ids.setdefault(filename, []).append(chunk_id)
+        owners = [filename for entry in pending_write for filename in entry[3]]
+        pending_write.clear()
+        finish_chunks(owners)
+
+    def queue_write(chunks, ids, vectors, owners):
+        pending_write.append((chunks, ids, vectors, owners))
+        if sum(len(entry[0]) for entry in pending_write) >= WRITE_BATCH_SIZE:
+            flush_writes()
+
+    def collect(done):
+        for future in done:
+            chunks, ids, owners = in_flight.pop(future)
+            try:
+                vectors = future.result()
+            except Exception as e:
+                for filename in set(owners):
+                    fail(filename, f"embedding failed: {e}")
+                finish_chunks(owners)
+                continue
+            stats["embedded"] += len(chunks)
+            queue_write(chunks, ids, vectors, owners)
+
+    def submit_batch():
+        nonlocal batch, batch_ids, batch_owners
+        if not batch:
+            return
+        # Bounded concurrency: wait for a free slot before submitting more work
+        while len(in_flight) >= EMBED_CONCURRENCY:
+            done, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+            collect(done)
+        future = embed_pool.submit(embed_with_retry, embeddings, [chunk.page_content for chunk in batch])
+        in_flight[future] = (batch, batch_ids, batch_owners)
+        batch, batch_ids, batch_owners = [], [], []
+
+    # Spawned workers: the pipeline also runs on the app's background ingestion thread,
+    # and forking a multi-threaded process is unsafe
+    with ProcessPoolExecutor(max_workers=EXTRACT_WORKERS, mp_context=multiprocessing.get_context("spawn")) as extract_pool, \
+            ThreadPoolExecutor(max_workers=EMBED_CONCURRENCY, thread_name_prefix="embed") as embed_pool:
+        # 1. Extraction in parallel; each file is chunked as soon as it's loaded
+        futures = {extract_pool.submit(load_file, file_path): filename for filename, file_path in files}
+        for future in as_completed(futures):
+            filename = futures[future]
+            try:
+                documents = future.result()
+            except Exception as e:
+                print(f"Error processing {filename}: {str(e)}")
+                fail(filename, str(e))
+                continue
+
+            if name_as_source:
+                for document in documents:
+                    document.metadata["source"] = filename
+            chunks = tag_chunks(splitter.split_documents(documents))
+            if not chunks:
+                file_ids[filename] = []
+                complete(filename)
+                continue
+
+            # 2. Diff against the stored chunks of this file
+            ids = assign_chunk_ids(chunks)
+            file_ids[filename] = ids
+            plan = plan_incremental(vectorstore, chunks, ids)
+            orphans[filename] = plan["orphans"]
+            existing_ids[filename] = plan["existing"]
+            stats["unchanged"] += plan["unchanged"]
+            stats["reused"] += len(plan["reuse"])
+            print(f"Processed: {filename} ({len(chunks)} chunks: {len(plan['embed'])} to embed, "
+                  f"{len(plan['reuse'])} reused, {plan['unchanged']} unchanged, {len(plan['orphans'])} stale)")
+
+            remaining_chunks[filename] = len(plan["reuse"]) + len(plan["embed"])
+            if remaining_chunks[filename] == 0:
+                complete(filename)
+                continue
+            if plan["reuse"]:
+                reuse_chunks, reuse_ids, reuse_vectors = map(list, zip(*plan["reuse"]))
+                queue_write(reuse_chunks, reuse_ids, reuse_vectors, [filename] * len(reuse_chunks))
+
+            # 3. Stream the rest into fixed-size embedding batches
+            for chunk, chunk_id in plan["embed"]:
+                batch.append(chunk)
+                batch_ids.append(chunk_id)
+                batch_owners.append(filename)
+                if len(batch) >= EMBED_BATCH_SIZE:
+                    submit_batch()
+
+        # 4. Drain: last partial batch, outstanding embeddings, final bulk write
+        submit_batch()
+        while in_flight:
+            done, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+            collect(done)
+        flush_writes()
+
+    # 5. Roll back chunks that partially written files added, so the next run retries them cleanly
+    # (chunks stored before this run are kept: the previous version of the file stays searchable)
+    for filename in failed:
+        added = [chunk_id for chunk_id in written_ids.pop(filename, []) if chunk_id not in existing_ids.get(filename, ())]
+        if added:
+            delete_chunks(vectorstore, keyword_index, added)
+            stats["chunks"] -= len(added)
+
+    elapsed = time.perf_counter() - start
+    return {
+        "ingested": ingested,
+        "failed": failed,
+        "chunk_ids": {filename: file_ids[filename] for filename in ingested},
+        "files": len(files),
+        "chunks": stats["chunks"],
+        "embedded": stats["embedded"],
+        "reused": stats["reused"],
+        "unchanged": stats["unchanged"],
+        "deleted": stats["deleted"],
+        "seconds": elapsed,
+        "files_per_sec": len(ingested) / elapsed if elapsed else 0.0,
+        "chunks_per_sec": stats["chunks"] / elapsed if elapsed else 0.0,
+    }
+
+def format_report(report: Dict) -> str:
+    """One-line throughput summary for the console."""
+    return (
+        f"Ingested {len(report['ingested'])}/{report['files']} file(s), {report['chunks']} chunks "
+        f"in {report['seconds']:.1f}s ({report['files_per_sec']:.2f} files/sec, "
+        f"{report['chunks_per_sec']:.1f} chunks/sec); {report['embedded']} embedded, "
+        f"{report['reused']} reused, {report['unchanged']} unchanged, {report['deleted']} stale deleted"
+    )
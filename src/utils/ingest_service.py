@@ -0,0 +1,195 @@
+"""
+Background ingestion service.
+Watches ./data and ./knowledge_base with watchdog, debounces file events and
+feeds settled files through the incremental ingestion pipeline on a single worker
+thread, so the app starts immediately and stays responsive while a large library
+indexes. Progress and queue depth are exposed for the UI.
+"""
+import os
+import time
+import threading
+from typing import Dict, List, Optional, Tuple
+from watchdog.events import FileSystemEventHandler
+from watchdog.observers import Observer
+from src.tools.ingest import DATA_DIRECTORY, ingest_files, is_supported, remove_ingested_file
+from src.utils.ingest_manifest import get_manifest, manifest_key
+
+# Configuration
+KNOWLEDGE_BASE_DIRECTORY = "./knowledge_base"
+WATCH_DIRECTORIES = {DATA_DIRECTORY: "data", KNOWLEDGE_BASE_DIRECTORY: "knowledge_base"}
+DEBOUNCE_SECONDS = 2.0  # A file must be quiet this long before it's ingested
+POLL_SECONDS = 0.5
+MAX_BATCH_FILES = 64    # Files handed to the pipeline per run
+
+class _EventHandler(FileSystemEventHandler):
+    def __init__(self, service: "IngestService", origin: str):
+        self.service = service
+        self.origin = origin
+
+    # Only changes are queued: "opened"/"closed_no_write" events come from plain reads,
+    # including the worker's own hashing and extraction
+    def on_created(self, event):
+        self._enqueue(event.src_path, event)
+
+    def on_modified(self, event):
+        self._enqueue(event.src_path, event)
+
+    def on_deleted(self, event):
+        self._enqueue(event.src_path, event)
+
+    def on_moved(self, event):
+        self._enqueue(event.src_path, event)
+        self._enqueue(event.dest_path, event)
+
+    def _enqueue(self, path, event):
+        if not event.is_directory and path:
+            self.service.enqueue(path, self.origin)
+
+class IngestService:
+    """
+    Debounced watch-folder ingestion on one background thread.
+    Events for the same file are coalesced; a file is ingested (or removed, if
+    it no longer exists) once no event has touched it for DEBOUNCE_SECONDS.
+    """
+
+    def __init__(self, directories: Dict[str, str] = WATCH_DIRECTORIES, debounce: float = DEBOUNCE_SECONDS):
+        self.directories = directories
+        self.debounce = debounce
+        self._lock = threading.Lock()
+        self._pending: Dict[str, Tuple[str, float]] = {}  # path -> (origin, last event time)
+        self._observer = None
+        self._worker = None
+        self._stop = threading.Event()
+        self.status = {
+            "state": "stopped",   # stopped | idle | indexing
+            "current": [],        # files in the batch being ingested
+            "batch_done": 0,
+            "files_done": 0,
+            "files_failed": 0,
+            "last_report": None,
+            "last_error": None,
+        }
+
+    # --- Queue ---
+
+    def enqueue(self, path: str, origin: str):
+        """Schedule a file for (re-)ingestion or removal after the debounce window."""
+        filename = os.path.basename(path)
+        if not is_supported(filename, origin):
+            return
+        with self._lock:
+            self._pending[os.path.normpath(path)] = (origin, time.monotonic())
+
+    def _take_ready(self) -> List[Tuple[str, str]]:
+        now = time.monotonic()
+        with self._lock:
+            ready = [
+                (path, origin) for path, (origin, last_event) in self._pending.items()
+                if now - last_event >= self.debounce
+            ][:MAX_BATCH_FILES]
+            for path, _ in ready:
+                del self._pending[path]
+        return ready
+
+    def get_status(self) -> dict:
+        """Snapshot of progress for the UI, including queue depth."""
+        with self._lock:
+            status = dict(self.status)
+            status["current"] = list(self.status["current"])
+            status["queue_depth"] = len(self._pending) + len(status["current"]) - status["batch_done"]
+        return status
+
+    def _set_status(self, **updates):
+        with self._lock:
+            self.status.update(updates)
+
+    # --- Lifecycle ---
+
+    @property
+    def is_running(self) -> bool:
+        return self._worker is not None and self._worker.is_alive()
+
+    def start(self) -> "IngestService":
+        """Start watching (idempotent). Existing files are queued once so changes made while stopped are picked up."""
+        with self._lock:
+            if self._worker is not None:
+                return self
+            self.status["state"] = "idle"
+
+        self._observer = Observer()
+        for directory, origin in self.directories.items():
+            os.makedirs(directory, exist_ok=True)
+            self._observer.schedule(_EventHandler(self, origin), directory, recursive=False)
+            for entry in os.scandir(directory):
+                if entry.is_file():
+                    self.enqueue(entry.path, origin)
+        self._observer.start()
+
+        self._worker = threading.Thread(target=self._run, name="ingest-service", daemon=True)
+        self._worker.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+        if self._observer is not None:
+            self._observer.stop()
+            self._observer.join()
+        if self._worker is not None:
+            self._worker.join()
+        self._set_status(state="stopped")
+
+    # --- Worker ---
+
+    def _run(self):
+        while not self._stop.is_set():
+            ready = self._take_ready()
+            if not ready:
+                self._stop.wait(POLL_SECONDS)
+                continue
+            try:
+                self._process(ready)
+            except Exception as e:
+                # Keep the service alive; the files are retried on their next event or restart
+                print(f"Background ingestion failed: {e}")
+                self._set_status(last_error=str(e))
+            finally:
+                self._set_status(state="idle", current=[], batch_done=0)
+
+    def _process(self, ready: List[Tuple[str, str]]):
+        self._set_status(state="indexing", current=[os.path.basename(path) for path, _ in ready], batch_done=0)
+
+        by_origin: Dict[str, List[Tuple[str, str]]] = {}
+        manifest = get_manifest()
+        for path, origin in ready:
+            filename = os.path.basename(path)
+            if os.path.exists(path):
+                by_origin.setdefault(origin, []).append((filename, path))
+                continue
+            # Deleted (or moved away): drop its chunks if this folder's copy was ingested
+            if manifest.get(manifest_key(origin, filename)) is not None:
+                remove_ingested_file(filename, origin)
+                print(f"Removed from index: {filename}")
+            self._file_done(filename, True)
+
+        for origin, files in by_origin.items():
+            report = ingest_files(files, origin, on_file_done=self._file_done)
+            if report is not None:
+                self._set_status(last_report={key: value for key, value in report.items() if key != "chunk_ids"})
+        self._set_status(last_error=None)
+
+    def _file_done(self, filename: str, ok: bool):
+        with self._lock:
+            self.status["batch_done"] += 1
+            self.status["files_done" if ok else "files_failed"] += 1
+
+_service: Optional[IngestService] = None
+_service_lock = threading.Lock()
+
+def get_ingest_service() -> IngestService:
+    """Return the ingestion service for this process (not started until start() is called)."""
+    global _service
+    if _service is None:
+        with _service_lock:
+            if _service is None:
+                _service = IngestService()
+    return _service
@@ -0,0 +1,502 @@
+"""
+Persistent keyword index for the Knowledge Base.
+Stores postings, document lengths and document frequencies (for IDF) in SQLite,
+maintained incrementally at ingestion time. BM25 scoring runs on sparse-matrix
+snapshots built from these tables (see sparse_bm25.py) instead of rebuilding an
+in-memory index from the whole Chroma collection on every search.
+Also holds the inverted citation anchor -> chunk table used for direct lookups.
+"""
+import os
+import re
+import json
+import sqlite3
+import threading
+from collections import Counter
+from typing import List, Dict, Optional, Tuple, Iterable
+from langchain_core.documents import Document
+from src.utils.citation_index import extract_citations, parse_citation_query
+from src.utils.metadata_tags import tag_chunks, TAG_FIELDS, TAGGER_VERSION
+
+# Configuration
+KEYWORD_INDEX_PATH = "./chroma_db/keyword_index.sqlite3"
+MMAP_SIZE = 1024 * 1024 * 1024  # Let SQLite memory-map up to 1 GB of the index
+RETAG_BATCH_SIZE = 500          # Chroma metadata updates per call when retagging
+
+# BM25 parameters
+BM25_K1 = 1.5
+BM25_B = 0.75
+
+TOKEN_PATTERN = re.compile(r"\w+")
+
+# Chunk metadata fields stored as indexed columns for pre-filtering
+FILTER_FIELDS = ("source", "jurisdiction", "doc_type", "reg_area")
+
+# AUTOINCREMENT: doc_nos are never reused, so a stale BM25 snapshot (served while
+# the next one builds) can't map a deleted chunk's doc_no to a different chunk
+CHUNKS_TABLE = """
+CREATE TABLE IF NOT EXISTS chunks (
+    doc_no INTEGER PRIMARY KEY AUTOINCREMENT,
+    chunk_id TEXT UNIQUE NOT NULL,
+    source TEXT,
+    jurisdiction TEXT,
+    doc_type TEXT,
+    reg_area TEXT,
+    length INTEGER NOT NULL,
+    content TEXT NOT NULL,
+    metadata TEXT NOT NULL
+);
+"""
+
+SCHEMA = CHUNKS_TABLE + """
+CREATE TABLE IF NOT EXISTS postings (
+    term TEXT NOT NULL,
+    doc_no INTEGER NOT NULL,
+    tf INTEGER NOT NULL,
+    PRIMARY KEY (term, doc_no)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS idx_postings_doc ON postings(doc_no);
+CREATE TABLE IF NOT EXISTS terms (
+    term TEXT PRIMARY KEY,
+    df INTEGER NOT NULL
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS citations (
+    anchor TEXT NOT NULL,
+    doc_no INTEGER NOT NULL,
+    count INTEGER NOT NULL,
+    PRIMARY KEY (anchor, doc_no)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS idx_citations_doc ON citations(doc_no);
+CREATE TABLE IF NOT EXISTS stats (
+    key TEXT PRIMARY KEY,
+    value INTEGER NOT NULL
+);
+INSERT OR IGNORE INTO stats (key, value) VALUES ('n_docs', 0), ('total_length', 0), ('generation', 0);
+-- Indexes created before the citations table existed get a one-time backfill
+INSERT OR IGNORE INTO stats (key, value) SELECT 'citations_indexed', COUNT(*) = 0 FROM chunks;
+-- Tagger version the stored chunks were tagged with (0: before tagging existed)
+INSERT OR IGNORE INTO stats (key, value) VALUES ('tagger_version', 0);
+-- Oldest generation whose persisted snapshots may be served (raised when doc_nos were renumbered or reusable)
+INSERT OR IGNORE INTO stats (key, value) VALUES ('min_snapshot_generation', 0);
+"""
+
+def tokenize(text: str) -> List[str]:
+    """Lowercase word tokenizer shared by indexing and querying."""
+    return TOKEN_PATTERN.findall(text.lower())
+
+class KeywordIndex:
+    """
+    On-disk inverted index with incremental add/delete.
+
+    A single connection is opened per process and memory-mapped; all access is
+    serialized through a lock so the index can be shared across Streamlit sessions.
+    """
+
+    def __init__(self, path: str = KEYWORD_INDEX_PATH):
+        self.path = path
+        self._lock = threading.RLock()
+
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        # isolation_level=None: transactions are managed explicitly below
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(f"PRAGMA mmap_size={MMAP_SIZE}")
+        self._conn.executescript(SCHEMA)
+        self._migrate_filter_columns()
+        self._migrate_doc_no_autoincrement()
+        self._backfill_citations()
+
+    # --- Stats ---
+
+    def _stat(self, key: str) -> int:
+        row = self._conn.execute("SELECT value FROM stats WHERE key = ?", (key,)).fetchone()
+        return row[0] if row else 0
+
+    def count(self) -> int:
+        """Number of chunks in the index."""
+        with self._lock:
+            return self._stat("n_docs")
+
+    @property
+    def generation(self) -> int:
+        """Monotonic counter bumped on every change to the index."""
+        with self._lock:
+            return self._stat("generation")
+
+    @property
+    def min_snapshot_generation(self) -> int:
+        """Persisted BM25 snapshots older than this may map doc_nos to the wrong chunks."""
+        with self._lock:
+            return self._stat("min_snapshot_generation")
+
+    # --- Updates ---
+
+    def add_documents(self, documents: List[Document], ids: List[str]):
+        """
+        Add (or replace) chunks in the index.
+        IDs must match the IDs used in the vector store.
+        """
+        if not documents:
+            return
+
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                # Replace semantics: drop any existing rows for these IDs first
+                self._delete_doc_nos(self._doc_nos_for_ids(ids))
+
+                added_length = 0
+                for doc, chunk_id in zip(documents, ids):
+                    counts = Counter(tokenize(doc.page_content))
+                    length = sum(counts.values())
+                    added_length += length
+
+                    cursor = self._conn.execute(
+                        f"INSERT INTO chunks (chunk_id, {', '.join(FILTER_FIELDS)}, length, content, metadata) "
+                        f"VALUES (?, {', '.join('?' * len(FILTER_FIELDS))}, ?, ?, ?)",
+                        (chunk_id, *(doc.metadata.get(field) for field in FILTER_FIELDS),
+                         length, doc.page_content, json.dumps(doc.metadata))
+                    )
+                    doc_no = cursor.lastrowid
+
+                    self._conn.executemany(
+                        "INSERT INTO postings (term, doc_no, tf) VALUES (?, ?, ?)",
+                        [(term, doc_no, tf) for term, tf in counts.items()]
+                    )
+                    self._conn.executemany(
+                        "INSERT INTO terms (term, df) VALUES (?, 1) ON CONFLICT(term) DO UPDATE SET df = df + 1",
+                        [(term,) for term in counts]
+                    )
+                    self._insert_citations(doc_no, doc.page_content)
+
+                self._bump_stats(len(documents), added_length)
+                self._conn.execute("COMMIT")
+            except Exception:
+                self._conn.execute("ROLLBACK")
+                raise
+
+    def delete_ids(self, ids: List[str]):
+        """Remove chunks by vector store ID."""
+        if not ids:
+            return
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                self._delete_doc_nos(self._doc_nos_for_ids(ids))
+                self._conn.execute("COMMIT")
+            except Exception:
+                self._conn.execute("ROLLBACK")
+                raise
+
+    def delete_source(self, source: str):
+        """Remove every chunk that came from the given source file."""
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                rows = self._conn.execute("SELECT doc_no FROM chunks WHERE source = ?", (source,)).fetchall()
+                self._delete_doc_nos([row[0] for row in rows])
+                if not rows:
+                    # The vector store may still have changed, so invalidate cached results anyway
+                    self._conn.execute("UPDATE stats SET value = value + 1 WHERE key = 'generation'")
+                self._conn.execute("COMMIT")
+            except Exception:
+                self._conn.execute("ROLLBACK")
+                raise
+
+    def clear(self):
+        """Remove everything from the index."""
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                self._conn.execute("DELETE FROM postings")
+                self._conn.execute("DELETE FROM citations")
+                self._conn.execute("DELETE FROM terms")
+                self._conn.execute("DELETE FROM chunks")
+                self._conn.execute("UPDATE stats SET value = 0 WHERE key IN ('n_docs', 'total_length')")
+                self._conn.execute("UPDATE stats SET value = value + 1 WHERE key = 'generation'")
+                self._conn.execute("COMMIT")
+            except Exception:
+                self._conn.execute("ROLLBACK")
+                raise
+
+    def _doc_nos_for_ids(self, ids: List[str]) -> List[int]:
+        doc_nos = []
+        for batch in _batched(ids, 500):
+            placeholders = ",".join("?" * len(batch))
+            rows = self._conn.execute(
+                f"SELECT doc_no FROM chunks WHERE chunk_id IN ({placeholders})", batch
+            ).fetchall()
+            doc_nos.extend(row[0] for row in rows)
+        return doc_nos
+
+    def _delete_doc_nos(self, doc_nos: List[int]):
+        """Delete chunks and their postings, keeping document frequencies in sync."""
+        if not doc_nos:
+            return
+
+        removed_length = 0
+        for batch in _batched(doc_nos, 500):
+            placeholders = ",".join("?" * len(batch))
+
+            # Decrement df for every term these chunks contained
+            term_counts = self._conn.execute(
+                f"SELECT term, COUNT(*) FROM postings WHERE doc_no IN ({placeholders}) GROUP BY term", batch
+            ).fetchall()
+            self._conn.executemany(
+                "UPDATE terms SET df = df - ? WHERE term = ?",
+                [(n, term) for term, n in term_counts]
+            )
+
+            removed_length += self._conn.execute(
+                f"SELECT COALESCE(SUM(length), 0) FROM chunks WHERE doc_no IN ({placeholders})", batch
+            ).fetchone()[0]
+
+            self._conn.execute(f"DELETE FROM postings WHERE doc_no IN ({placeholders})", batch)
+            self._conn.execute(f"DELETE FROM citations WHERE doc_no IN ({placeholders})", batch)
+            self._conn.execute(f"DELETE FROM chunks WHERE doc_no IN ({placeholders})", batch)
+
+        self._conn.execute("DELETE FROM terms WHERE df <= 0")
+        self._bump_stats(-len(doc_nos), -removed_length)
+
+    def _insert_citations(self, doc_no: int, text: str):
+        self._conn.executemany(
+            "INSERT INTO citations (anchor, doc_no, count) VALUES (?, ?, ?)",
+            [(anchor, doc_no, n) for anchor, n in extract_citations(text).items()]
+        )
+
+    def _migrate_filter_columns(self):
+        """Add filter columns to indexes created before they existed, filling them from metadata."""
+        with self._lock:
+            columns = {row[1] for row in self._conn.execute("PRAGMA table_info(chunks)")}
+            missing = [field for field in FILTER_FIELDS if field not in columns]
+            if missing:
+                self._conn.execute("BEGIN IMMEDIATE")
+                try:
+                    for field in missing:
+                        self._conn.execute(f"ALTER TABLE chunks ADD COLUMN {field} TEXT")
+                        self._conn.execute(f"UPDATE chunks SET {field} = json_extract(metadata, '$.{field}')")
+                    self._conn.execute("UPDATE stats SET value = value + 1 WHERE key = 'generation'")
+                    self._conn.execute("COMMIT")
+                except Exception:
+                    self._conn.execute("ROLLBACK")
+                    raise
+            self._create_filter_indexes()
+
+    def _create_filter_indexes(self):
+        for field in FILTER_FIELDS:
+            self._conn.execute(f"CREATE INDEX IF NOT EXISTS idx_chunks_{field} ON chunks({field})")
+
+    def _migrate_doc_no_autoincrement(self):
+        """
+        Rebuild a chunks table created without AUTOINCREMENT (SQLite reused the doc_nos of
+        deleted rows). Existing doc_nos are kept; snapshots persisted before are no longer loaded.
+        """
+        with self._lock:
+            sql = self._conn.execute("SELECT sql FROM sqlite_master WHERE type = 'table' AND name = 'chunks'").fetchone()[0]
+            if "AUTOINCREMENT" in sql.upper():
+                return
+            columns = ", ".join(row[1] for row in self._conn.execute("PRAGMA table_info(chunks)"))
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                self._conn.execute("ALTER TABLE chunks RENAME TO chunks_migrating")
+                for field in FILTER_FIELDS:
+                    self._conn.execute(f"DROP INDEX IF EXISTS idx_chunks_{field}")
+                self._conn.execute(CHUNKS_TABLE)
+                self._conn.execute(f"INSERT INTO chunks ({columns}) SELECT {columns} FROM chunks_migrating")
+                self._conn.execute("DROP TABLE chunks_migrating")
+                self._create_filter_indexes()
+                self._conn.execute("UPDATE stats SET value = value + 1 WHERE key = 'generation'")
+                self._conn.execute(
+                    "UPDATE stats SET value = (SELECT value FROM stats WHERE key = 'generation') "
+                    "WHERE key = 'min_snapshot_generation'"
+                )
+                self._conn.execute("COMMIT")
+            except Exception:
+                self._conn.execute("ROLLBACK")
+                raise
+
+    def _backfill_citations(self):
+        """Index citations for chunks added before the citation table existed (runs once)."""
+        with self._lock:
+            if self._stat("citations_indexed"):
+                return
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                for doc_no, content in self._conn.execute("SELECT doc_no, content FROM chunks").fetchall():
+                    self._insert_citations(doc_no, content)
+                self._conn.execute("UPDATE stats SET value = 1 WHERE key = 'citations_indexed'")
+                self._conn.execute("UPDATE stats SET value = value + 1 WHERE key = 'generation'")
+                self._conn.execute("COMMIT")
+            except Exception:
+                self._conn.execute("ROLLBACK")
+                raise
+
+    def _bump_stats(self, docs_delta: int, length_delta: int):
+        self._conn.execute("UPDATE stats SET value = value + ? WHERE key = 'n_docs'", (docs_delta,))
+        self._conn.execute("UPDATE stats SET value = value + ? WHERE key = 'total_length'", (length_delta,))
+        self._conn.execute("UPDATE stats SET value = value + 1 WHERE key = 'generation'")
+
+    def sync_from_vectorstore(self, vectorstore):
+        """
+        One-time bootstrap for vector stores created before the keyword index existed.
+        Only runs when the index is empty.
+        """
+        if self.count() > 0:
+            return
+
+        collection_data = vectorstore.get()
+        if not collection_data["documents"]:
+            return
+
+        documents = []
+        for i, text in enumerate(collection_data["documents"]):
+            metadata = collection_data["metadatas"][i] if collection_data["metadatas"] else {}
+            documents.append(Document(page_content=text, metadata=metadata or {}))
+
+        self.add_documents(documents, collection_data["ids"])
+        print(f"Built keyword index from vector store ({len(documents)} chunks).")
+
+    def retag_from_vectorstore(self, vectorstore):
+        """
+        Bring the metadata tags of every stored chunk up to TAGGER_VERSION, in Chroma
+        and in this index. Chunks ingested before tagging existed (or by an older
+        tagger) would otherwise be silently excluded by jurisdiction/area filters.
+        Runs once per tagger version; embeddings are left untouched.
+        """
+        with self._lock:
+            if self._stat("tagger_version") >= TAGGER_VERSION:
+                return
+
+            # 1. Retag whole sources at a time, in page order, like ingestion does
+            collection_data = vectorstore.get(include=["documents", "metadatas"])
+            stored = [
+                Document(id=chunk_id, page_content=text, metadata=dict(metadata or {}))
+                for chunk_id, text, metadata in zip(
+                    collection_data["ids"], collection_data["documents"], collection_data["metadatas"]
+                )
+            ]
+            stored.sort(key=lambda doc: (str(doc.metadata.get("source", "")), _page_number(doc.metadata)))
+            original = {doc.id: {field: doc.metadata.get(field) for field in TAG_FIELDS} for doc in stored}
+            changed = [
+                doc for doc in tag_chunks(stored)
+                if {field: doc.metadata.get(field) for field in TAG_FIELDS} != original[doc.id]
+            ]
+
+            # 2. Chroma metadata (embeddings stay as they are)
+            for batch in _batched(changed, RETAG_BATCH_SIZE):
+                vectorstore._collection.update(
+                    ids=[doc.id for doc in batch], metadatas=[doc.metadata for doc in batch]
+                )
+
+            # 3. Filter columns and stored metadata here
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                self._conn.executemany(
+                    f"UPDATE chunks SET {', '.join(f'{field} = ?' for field in TAG_FIELDS)}, metadata = ? "
+                    "WHERE chunk_id = ?",
+                    [(*(doc.metadata.get(field) for field in TAG_FIELDS), json.dumps(doc.metadata), doc.id)
+                     for doc in changed]
+                )
+                self._conn.execute("UPDATE stats SET value = ? WHERE key = 'tagger_version'", (TAGGER_VERSION,))
+                if changed:
+                    self._conn.execute("UPDATE stats SET value = value + 1 WHERE key = 'generation'")
+                self._conn.execute("COMMIT")
+            except Exception:
+                self._conn.execute("ROLLBACK")
+                raise
+            if changed:
+                print(f"Retagged {len(changed)} of {len(stored)} chunks (tagger version {TAGGER_VERSION}).")
+
+    # --- Queries ---
+
+    def lookup_citations(self, anchors: List[str], k: int = 20,
+                         filters: Optional[Dict[str, List[str]]] = None) -> List[Document]:
+        """
+        Direct citation lookup through the inverted anchor index.
+        Chunks matching more of the anchors (then citing them more often) rank first.
+        """
+        if not anchors:
+            return []
+        placeholders = ",".join("?" * len(anchors))
+        filter_sql, filter_params = filter_clause(filters)
+        sql = (
+            "SELECT ci.doc_no FROM citations ci JOIN chunks c ON c.doc_no = ci.doc_no "
+            f"WHERE ci.anchor IN ({placeholders}){filter_sql} "
+            "GROUP BY ci.doc_no ORDER BY COUNT(*) DESC, SUM(ci.count) DESC, ci.doc_no LIMIT ?"
+        )
+        params = [*anchors, *filter_params, k]
+        with self._lock:
+            doc_nos = [row[0] for row in self._conn.execute(sql, params)]
+            return [doc for doc in map(self._load_document, doc_nos) if doc is not None]
+
+    def lookup_citation_query(self, query: str, k: int = 20,
+                              filters: Optional[Dict[str, List[str]]] = None) -> Tuple[List[Document], bool]:
+        """
+        Chunks citing the query's anchors, and whether the query is a pure citation lookup
+        (nothing but citation labels) that these chunks answer alone. Shared by the single
+        and batch searches, so both rank a query the same way. ([], False) if nothing is cited.
+        """
+        anchors, is_direct_lookup = parse_citation_query(query)
+        if not anchors:
+            return [], False
+        return self.lookup_citations(anchors, k=k, filters=filters), is_direct_lookup
+
+    def get_documents(self, doc_nos: List[int]) -> List[Optional[Document]]:
+        """
+        Load chunks by doc_no, preserving the requested order.
+        Chunks deleted in the meantime (e.g. after a BM25 snapshot was built) come back as None.
+        """
+        with self._lock:
+            return [self._load_document(doc_no) for doc_no in doc_nos]
+
+    def _load_document(self, doc_no: int) -> Optional[Document]:
+        row = self._conn.execute(
+            "SELECT chunk_id, content, metadata FROM chunks WHERE doc_no = ?", (doc_no,)
+        ).fetchone()
+        if row is None:
+            return None
+        chunk_id, content, metadata = row
+        return Document(id=chunk_id, page_content=content, metadata=json.loads(metadata))
+
+    def open_reader(self) -> sqlite3.Connection:
+        """
+        A separate connection for long read-only scans (BM25 snapshot builds).
+        Under WAL it reads a consistent snapshot without blocking this handle's writers.
+        """
+        conn = sqlite3.connect(self.path, check_same_thread=False, isolation_level=None)
+        conn.execute(f"PRAGMA mmap_size={MMAP_SIZE}")
+        return conn
+
+def filter_clause(filters: Optional[Dict[str, List[str]]]) -> Tuple[str, list]:
+    """
+    SQL fragment (" AND c.field IN (...)") for {field: allowed values} filters
+    on the chunks table aliased as c.
+    """
+    sql, params = "", []
+    for field, values in (filters or {}).items():
+        if field not in FILTER_FIELDS:
+            raise ValueError(f"Unsupported filter field: {field}")
+        sql += f" AND c.{field} IN ({','.join('?' * len(values))})"
+        params.extend(values)
+    return sql, params
+
+def _page_number(metadata: Dict) -> int:
+    page = metadata.get("page")
+    return page if isinstance(page, int) else 0
+
+def _batched(items: List, size: int) -> Iterable[List]:
+    for start in range(0, len(items), size):
+        yield list(items[start:start + size])
+
+# Process-wide handle: open and memory-map the index once
+_index: Optional[KeywordIndex] = None
+_index_lock = threading.Lock()
+
+def get_keyword_index() -> KeywordIndex:
+    """Return the shared keyword index for this process."""
+    global _index
+    if _index is None:
+        with _index_lock:
+            if _index is None:
+                _index = KeywordIndex()
+    return _index
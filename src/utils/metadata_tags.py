@@ -0,0 +1,118 @@
+"""
+Chunk metadata tagging for filtered retrieval.
+Tags every chunk at ingestion with a jurisdiction, document type and regulatory
+area so searches from the Research Center can be pushed down to the matching
+slice of the Chroma collection and the keyword index.
+"""
+import re
+from collections import Counter
+from typing import Dict, List, Optional
+from langchain_core.documents import Document
+from src.utils.citation_index import extract_citations, parse_citation_query
+
+# Configuration
+TAGGER_VERSION = 1  # Bump when tagging changes; stored chunks are retagged in place (KeywordIndex.retag_from_vectorstore)
+GENERAL_JURISDICTION = "General"  # Chunks with no jurisdiction signal; matched by every jurisdiction filter
+DOC_TYPES = ("regulation", "guideline", "10-K", "internal")
+
+JURISDICTION_KEYWORDS = {
+    "US": re.compile(r"\b(?:IRS|Internal Revenue|Treasury|United States)\b"),
+    "OECD": re.compile(r"\b(?:OECD|BEPS|MNE group|tax administrations)\b"),
+}
+# Regulatory areas that have no citation form of their own
+KEYWORD_AREAS = {
+    "irs:audit_roadmap": re.compile(r"\baudit roadmap\b", re.IGNORECASE),
+    "irs:interquartile_range": re.compile(r"\binterquartile range\b", re.IGNORECASE),
+}
+TEN_K_PATTERN = re.compile(r"\bform\s+10-?k\b|(?:^|[\W_])10-?k(?:[\W_]|$)", re.IGNORECASE)
+TAG_FIELDS = ("jurisdiction", "doc_type", "reg_area")
+
+def area_for_anchor(anchor: str) -> str:
+    """Collapse a citation anchor to its regulatory area (e.g. 'oecd:para:6.32' -> 'oecd:chapter:6')."""
+    if anchor.startswith("treas_reg:"):
+        return anchor.split("(", 1)[0]
+    if anchor.startswith("oecd:para:"):
+        return f"oecd:chapter:{anchor.rsplit(':', 1)[1].split('.')[0]}"
+    return anchor
+
+def area_keys_for_label(label: Optional[str]) -> List[str]:
+    """Map a Research Center regulatory area label to the reg_area values it covers."""
+    if not label:
+        return []
+    anchors, _ = parse_citation_query(label)
+    areas = list(dict.fromkeys(area_for_anchor(anchor) for anchor in anchors))
+    if not areas:
+        areas = [area for area, pattern in KEYWORD_AREAS.items() if pattern.search(label)]
+    return areas
+
+def _jurisdiction_votes(text: str, anchors: Counter) -> Counter:
+    votes = Counter()
+    for anchor, count in anchors.items():
+        if anchor.startswith(("treas_reg:", "irc:")):
+            votes["US"] += count
+        elif anchor.startswith(("oecd:", "beps:")):
+            votes["OECD"] += count
+    for jurisdiction, pattern in JURISDICTION_KEYWORDS.items():
+        votes[jurisdiction] += len(pattern.findall(text))
+    return votes
+
+def _chunk_area(text: str, anchors: Counter) -> Optional[str]:
+    areas = Counter()
+    for anchor, count in anchors.items():
+        if anchor.startswith("treas_reg:") and "(" in anchor:
+            continue  # Subsection anchors are already counted under their base section
+        areas[area_for_anchor(anchor)] += count
+    for area, pattern in KEYWORD_AREAS.items():
+        areas[area] += len(pattern.findall(text))
+    areas = +areas
+    return areas.most_common(1)[0][0] if areas else None
+
+def _doc_type(source: str, votes: Counter, text_sample: str) -> str:
+    if TEN_K_PATTERN.search(source) or TEN_K_PATTERN.search(text_sample):
+        return "10-K"
+    name = source.lower()
+    if "guideline" in name or "oecd" in name:
+        return "guideline"
+    if "reg" in name or "482" in name:
+        return "regulation"
+    if votes["OECD"] > votes["US"]:
+        return "guideline"
+    if votes["US"]:
+        return "regulation"
+    return "internal"
+
+def tag_chunks(chunks: List[Document], doc_type: Optional[str] = None) -> List[Document]:
+    """
+    Add jurisdiction, doc_type and reg_area metadata to split chunks (in place).
+
+    Chunks are grouped by source and processed in order: a chunk without its own
+    jurisdiction signal inherits the document's, and a chunk without a citation
+    carries forward the regulatory area of the chunk before it (section headings
+    are usually cited once at the top). `doc_type` overrides the inferred type.
+    """
+    by_source: Dict[str, List[Document]] = {}
+    for chunk in chunks:
+        by_source.setdefault(chunk.metadata.get("source", ""), []).append(chunk)
+
+    for source, group in by_source.items():
+        # 1. Per-chunk signals
+        anchors = [extract_citations(chunk.page_content) for chunk in group]
+        votes = [_jurisdiction_votes(chunk.page_content, a) for chunk, a in zip(group, anchors)]
+
+        # 2. Document-level jurisdiction and type
+        document_votes = sum(votes, Counter())
+        document_jurisdiction = document_votes.most_common(1)[0][0] if +document_votes else GENERAL_JURISDICTION
+        group_type = doc_type or _doc_type(source, document_votes, group[0].page_content[:2000])
+
+        # 3. Tag each chunk
+        area = None
+        for chunk, chunk_anchors, chunk_votes in zip(group, anchors, votes):
+            chunk.metadata.pop("reg_area", None)  # Retagged chunks may no longer have an area
+            chunk_votes = +chunk_votes
+            chunk.metadata["jurisdiction"] = chunk_votes.most_common(1)[0][0] if chunk_votes else document_jurisdiction
+            chunk.metadata["doc_type"] = group_type
+            area = _chunk_area(chunk.page_content, chunk_anchors) or area
+            if area:
+                chunk.metadata["reg_area"] = area
+
+    return chunks
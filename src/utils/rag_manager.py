@@ -1,82 +1,77 @@
 """
 RAG Manager for Knowledge Base.
-Handles document ingestion, splitting, and adding to Vector Store.
+Handles document uploads and removal; ingestion runs through the shared pipeline.
 """
 import os
 import shutil
-from typing import List
-from langchain_text_splitters import RecursiveCharacterTextSplitter
-from src.agents.tools import get_vectorstore
-from src.utils.file_processor import process_uploaded_file
+import hashlib
+from typing import List, Optional
+from src.tools.ingest import ingest_files, remove_ingested_file, remove_ingested_origin
+from src.utils.blob_store import store_upload, remove_unlinked_blobs
+from src.utils.ingest_manifest import get_manifest, manifest_key
+from src.utils.ingest_service import get_ingest_service, KNOWLEDGE_BASE_DIRECTORY
 
-KNOWLEDGE_BASE_DIR = "./knowledge_base"
+KNOWLEDGE_BASE_DIR = KNOWLEDGE_BASE_DIRECTORY
 
 def initialize_kb():
     """Ensure knowledge base directory exists."""
     os.makedirs(KNOWLEDGE_BASE_DIR, exist_ok=True)
 
-import json
-
 def list_documents() -> List[str]:
-    """List all documents in the knowledge base (checking Vector Store tracking first)."""
+    """List all documents in the knowledge base (checking the ingestion manifest first)."""
     initialize_kb()
     
-    # Check for tracking file in ChromaDB directory
-    tracking_file = "./chroma_db/ingested_files.json"
-    if os.path.exists(tracking_file):
-        try:
-            with open(tracking_file, "r") as f:
-                ingested_files = json.load(f)
-            return list(ingested_files.keys())
-        except Exception:
-            pass
+    # Indexed query on the manifest shared with the ingest script
+    # (./data files are managed by the ingest script, not from the Knowledge Base)
+    names = [os.path.basename(key) for key in get_manifest().list_names("knowledge_base")]
+    if names:
+        return names
             
     # Fallback to directory listing
     return [f for f in os.listdir(KNOWLEDGE_BASE_DIR) if os.path.isfile(os.path.join(KNOWLEDGE_BASE_DIR, f)) and not f.startswith('.')]
 
-def add_document_to_kb(uploaded_file) -> str:
+def upload_digest(uploaded_file) -> str:
+    """SHA-256 of an upload's bytes (the same hash the ingestion manifest records)."""
+    return hashlib.sha256(uploaded_file.getbuffer()).hexdigest()
+
+def is_document_current(filename: str, digest: str) -> bool:
+    """True if the Knowledge Base already holds exactly this content under this name."""
+    entry = get_manifest().get(manifest_key("knowledge_base", filename))
+    return (
+        entry is not None
+        and entry["hash"] == digest
+        and os.path.exists(os.path.join(KNOWLEDGE_BASE_DIR, filename))
+    )
+
+def add_document_to_kb(uploaded_file, digest: Optional[str] = None) -> str:
     """
-    Process uploaded file and add to Knowledge Base (Vector Store).
-    Returns success message or error.
+    Save an uploaded file to the Knowledge Base and index it.
+    Re-uploading identical content is a no-op; changed content is re-ingested
+    incrementally. When the background ingestion service is running the file is
+    queued there, so the UI doesn't wait for embedding. Returns success message or error.
     """
     initialize_kb()
     
     try:
-        # 1. Save file to knowledge base directory
-        file_path = os.path.join(KNOWLEDGE_BASE_DIR, uploaded_file.name)
-        with open(file_path, "wb") as f:
-            f.write(uploaded_file.getbuffer())
-            
-        # 2. Extract text
-        text = process_uploaded_file(uploaded_file)
-        if text.startswith("Error") or text.startswith("Unsupported"):
-            return f"Failed to process file: {text}"
-            
-        # 3. Split text
-        text_splitter = RecursiveCharacterTextSplitter(
-            chunk_size=1000,
-            chunk_overlap=200,
-            separators=["\n\n", "\n", " ", ""]
-        )
-        texts = text_splitter.create_documents([text], metadatas=[{"source": uploaded_file.name}])
+        # 1. Skip content that is already ingested under this name
+        if digest is None:
+            digest = upload_digest(uploaded_file)
+        if is_document_current(uploaded_file.name, digest):
+            return f"Successfully added **{uploaded_file.name}** to Knowledge Base (already up to date)."
         
-        # 4. Add to Vector Store
-        vectorstore = get_vectorstore()
-        vectorstore.add_documents(texts)
+        # 2. Store the bytes once and link them into the knowledge base directory
+        _, file_path = store_upload(uploaded_file, KNOWLEDGE_BASE_DIR, digest)
         
-        # 5. Update Tracking File
-        tracking_file = "./chroma_db/ingested_files.json"
-        ingested_files = {}
-        if os.path.exists(tracking_file):
-            try:
-                with open(tracking_file, "r") as f:
-                    ingested_files = json.load(f)
-            except:
-                pass
+        # 3. Hand off to the background service (incremental pipeline)
+        service = get_ingest_service()
+        if service.is_running:
+            service.enqueue(file_path, "knowledge_base")
+            return f"Successfully added **{uploaded_file.name}** to Knowledge Base (indexing in the background)."
         
-        ingested_files[uploaded_file.name] = {"chunks": len(texts)}
-        with open(tracking_file, "w") as f:
-            json.dump(ingested_files, f)
+        # 4. No service in this process: extract, split, embed and record inline
+        report = ingest_files([(uploaded_file.name, file_path)], "knowledge_base")
+        if report is not None and uploaded_file.name in report["failed"]:
+            return f"Failed to process file: {report['failed'][uploaded_file.name]}"
         
         return f"Successfully added **{uploaded_file.name}** to Knowledge Base."
         
@@ -88,31 +83,14 @@ def remove_document(filename: str) -> str:
     Remove a document from the Knowledge Base (Vector Store and File System).
     """
     try:
-        # 1. Remove from Vector Store
-        vectorstore = get_vectorstore()
-        # Access the underlying Chroma collection to delete by metadata
-        # Note: vectorstore._collection is the Chroma collection object
-        vectorstore._collection.delete(where={"source": filename})
+        # 1. Remove from Vector Store, Keyword Index and manifest
+        remove_ingested_file(filename)
         
         # 2. Remove from File System
         file_path = os.path.join(KNOWLEDGE_BASE_DIR, filename)
         if os.path.exists(file_path):
             os.remove(file_path)
-            
-        # 3. Update Tracking File
-        tracking_file = "./chroma_db/ingested_files.json"
-        if os.path.exists(tracking_file):
-            try:
-                with open(tracking_file, "r") as f:
-                    ingested_files = json.load(f)
-                
-                if filename in ingested_files:
-                    del ingested_files[filename]
-                    
-                with open(tracking_file, "w") as f:
-                    json.dump(ingested_files, f)
-            except:
-                pass
+        remove_unlinked_blobs()
                 
         return f"Successfully removed **{filename}**."
         
@@ -120,19 +98,19 @@ def remove_document(filename: str) -> str:
         return f"Error removing document: {str(e)}"
 
 def clear_knowledge_base():
-    """Clear all documents from knowledge base and vector store."""
+    """Clear all uploaded documents from the knowledge base, vector store and keyword index (./data is kept)."""
     try:
-        # Clear directory
-        if os.path.exists(KNOWLEDGE_BASE_DIR):
-            shutil.rmtree(KNOWLEDGE_BASE_DIR)
-        os.makedirs(KNOWLEDGE_BASE_DIR)
+        # Empty the directory but keep it: the ingestion service's watch is on this inode
+        initialize_kb()
+        for entry in os.scandir(KNOWLEDGE_BASE_DIR):
+            if entry.is_dir(follow_symlinks=False):
+                shutil.rmtree(entry.path)
+            else:
+                os.remove(entry.path)
         
-        # Clear vector store (delete persistence directory)
-        # Note: This is a hard reset. For now, we might just want to keep it simple.
-        # A better way for Chroma is vectorstore.delete_collection() but that requires re-init.
-        # For this MVP, we'll just clear the file directory.
-        # The vector store might still have data, but the UI list will be empty.
-        # TODO: Implement proper vector store clearing if needed.
+        # Remove the uploads' chunks from the vector store and keyword index, and their manifest rows
+        remove_ingested_origin("knowledge_base")
+        remove_unlinked_blobs()
         return "Knowledge Base cleared."
     except Exception as e:
         return f"Error clearing KB: {str(e)}"
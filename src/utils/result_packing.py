@@ -0,0 +1,123 @@
+"""
+Token-budgeted packing of retrieval results.
+Trims the fused hybrid-search output before it is pasted into ReAct loops and
+drafting prompts: low-scoring tail cut-off, duplicate removal, per-source quotas,
+merging of adjacent overlapping chunks and a hard token budget.
+"""
+import re
+import hashlib
+from typing import List, Optional, Set
+from langchain_core.documents import Document
+
+# Configuration
+SEARCH_TOKEN_BUDGET = 6000       # Max tokens of packed context per search
+MAX_CHUNKS_PER_SOURCE = 6        # Per-source quota (after merging)
+MIN_RELATIVE_SCORE = 0.35        # Drop chunks scoring below this fraction of the best RRF score
+NEAR_DUPLICATE_THRESHOLD = 0.85  # Shingle Jaccard similarity treated as a duplicate
+MIN_MERGE_OVERLAP = 50           # Chars of shared suffix/prefix needed to merge neighbours
+CHARS_PER_TOKEN = 4              # Rough estimate for English regulatory text
+
+_WORD = re.compile(r"\w+")
+
+def estimate_tokens(text: str) -> int:
+    """Cheap token estimate (no tokenizer round trip)."""
+    return len(text) // CHARS_PER_TOKEN + 1
+
+def _shingles(text: str, size: int = 5) -> Set[int]:
+    words = _WORD.findall(text.lower())
+    if len(words) <= size:
+        return {hash(" ".join(words))}
+    return {hash(" ".join(words[i:i + size])) for i in range(len(words) - size + 1)}
+
+def _jaccard(a: Set[int], b: Set[int]) -> float:
+    if not a or not b:
+        return 0.0
+    return len(a & b) / len(a | b)
+
+def merge_overlapping(first: str, second: str, min_overlap: int = MIN_MERGE_OVERLAP) -> Optional[str]:
+    """
+    Merge two chunks if the end of `first` repeats the start of `second`
+    (the splitter's chunk_overlap). Returns None if they don't overlap.
+    """
+    if len(first) < min_overlap or len(second) < min_overlap:
+        return None
+    probe = second[:min_overlap]
+    pos = first.rfind(probe)
+    while pos != -1:
+        tail = first[pos:]
+        if second.startswith(tail):
+            return first[:pos] + second
+        if tail.startswith(second):
+            return first
+        pos = first.rfind(probe, 0, pos)
+    return None
+
+def pack_results(
+    docs: List[Document],
+    token_budget: int = SEARCH_TOKEN_BUDGET,
+    max_per_source: int = MAX_CHUNKS_PER_SOURCE,
+    min_relative_score: float = MIN_RELATIVE_SCORE
+) -> List[Document]:
+    """
+    Pack fused results (best first) into a token budget.
+    Uses `rrf_score` metadata for the cut-off when present.
+    """
+    # 1. Score cut-off relative to the best result
+    best_score = docs[0].metadata.get("rrf_score") if docs else None
+    candidates = []
+    for doc in docs:
+        score = doc.metadata.get("rrf_score")
+        if best_score and score is not None and score < best_score * min_relative_score:
+            break
+        candidates.append(doc)
+
+    # 2. Drop exact and near duplicates (keeping the higher-ranked copy)
+    unique: List[Document] = []
+    seen_hashes = set()
+    kept_shingles: List[Set[int]] = []
+    for doc in candidates:
+        digest = hashlib.sha1(" ".join(doc.page_content.split()).encode("utf-8")).hexdigest()
+        if digest in seen_hashes:
+            continue
+        shingles = _shingles(doc.page_content)
+        if any(_jaccard(shingles, other) >= NEAR_DUPLICATE_THRESHOLD for other in kept_shingles):
+            continue
+        seen_hashes.add(digest)
+        kept_shingles.append(shingles)
+        unique.append(doc)
+
+    # 3. Merge adjacent overlapping chunks from the same source into the higher-ranked one
+    merged: List[Document] = []
+    for doc in unique:
+        source = doc.metadata.get("source")
+        for i, kept in enumerate(merged):
+            if kept.metadata.get("source") != source:
+                continue
+            text = merge_overlapping(kept.page_content, doc.page_content) or \
+                merge_overlapping(doc.page_content, kept.page_content)
+            if text is not None:
+                merged[i] = Document(id=kept.id, page_content=text, metadata=kept.metadata)
+                break
+        else:
+            merged.append(doc)
+
+    # 4. Per-source quota and token budget
+    packed: List[Document] = []
+    per_source = {}
+    used_tokens = 0
+    for doc in merged:
+        source = doc.metadata.get("source")
+        if per_source.get(source, 0) >= max_per_source:
+            continue
+        tokens = estimate_tokens(doc.page_content)
+        if used_tokens + tokens > token_budget:
+            if packed:
+                continue  # A smaller, lower-ranked chunk may still fit
+            # Always return at least the best result, truncated to the budget
+            doc = Document(id=doc.id, page_content=doc.page_content[:token_budget * CHARS_PER_TOKEN], metadata=doc.metadata)
+            tokens = token_budget
+        packed.append(doc)
+        per_source[source] = per_source.get(source, 0) + 1
+        used_tokens += tokens
+
+    return packed
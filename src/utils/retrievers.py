@@ -1,17 +1,38 @@
-from typing import List, Dict, Any
+import time
+import asyncio
+import hashlib
+import logging
+import numpy as np
+from concurrent.futures import TimeoutError as FutureTimeoutError
+from typing import List, Dict, Any, Optional, Tuple
 from langchain_core.retrievers import BaseRetriever
-from langchain_core.callbacks import CallbackManagerForRetrieverRun
+from langchain_core.callbacks import CallbackManagerForRetrieverRun, AsyncCallbackManagerForRetrieverRun
 from langchain_core.documents import Document
+from langchain_core.runnables.config import ContextThreadPoolExecutor
+
+logger = logging.getLogger(__name__)
+
+# Shared pool for retriever fan-out (context-propagating so tracing spans nest correctly)
+_RETRIEVER_POOL = ContextThreadPoolExecutor(max_workers=8, thread_name_prefix="retriever")
 
 class EnsembleRetriever(BaseRetriever):
     """
     Retriever that ensembles results from multiple retrievers.
     
     It uses Reciprocal Rank Fusion (RRF) to combine the results.
+    Retrievers run concurrently; a retriever that fails or exceeds its timeout
+    is skipped and the results of the others are fused.
     """
     retrievers: List[BaseRetriever]
     weights: List[float]
     c: int = 60
+    timeout: Optional[float] = 30.0  # Seconds per retriever (None = wait indefinitely)
+    timeouts: Optional[List[Optional[float]]] = None  # Per-retriever overrides
+
+    def _timeout_for(self, i: int) -> Optional[float]:
+        if self.timeouts and i < len(self.timeouts):
+            return self.timeouts[i]
+        return self.timeout
 
     def _get_relevant_documents(
         self, query: str, *, run_manager: CallbackManagerForRetrieverRun
@@ -19,31 +40,160 @@ class EnsembleRetriever(BaseRetriever):
         """
         Get relevant documents for a given query.
         """
-        # Get results from all retrievers
-        results = []
-        for retriever in self.retrievers:
-            results.append(retriever.invoke(query, config={"callbacks": run_manager.get_child()}))
-            
-        # RRF Fusion
-        rrf_score: Dict[str, float] = {}
-        doc_map: Dict[str, Document] = {}
+        # Fan out to all retrievers at once
+        start = time.monotonic()
+        futures = [
+            _RETRIEVER_POOL.submit(retriever.invoke, query, config={"callbacks": run_manager.get_child()})
+            for retriever in self.retrievers
+        ]
+        
+        # Collect whatever finishes within each retriever's deadline
+        results: List[Tuple[int, List[Document]]] = []
+        errors: List[BaseException] = []
+        for i, future in enumerate(futures):
+            timeout = self._timeout_for(i)
+            remaining = None if timeout is None else max(0.0, timeout - (time.monotonic() - start))
+            try:
+                results.append((i, future.result(timeout=remaining)))
+            except FutureTimeoutError as e:
+                logger.warning("Retriever %s timed out after %ss; fusing remaining results", i, timeout)
+                errors.append(e)
+            except Exception as e:
+                logger.warning("Retriever %s failed: %s; fusing remaining results", i, e)
+                errors.append(e)
+        
+        if not results and errors:
+            raise errors[0]
+        return self._fuse(results)
+
+    async def _aget_relevant_documents(
+        self, query: str, *, run_manager: AsyncCallbackManagerForRetrieverRun
+    ) -> List[Document]:
+        """
+        Async variant: runs all retrievers concurrently on the event loop.
+        """
+        start = time.monotonic()
+        tasks = [
+            asyncio.ensure_future(retriever.ainvoke(query, config={"callbacks": run_manager.get_child()}))
+            for retriever in self.retrievers
+        ]
         
-        for i, docs in enumerate(results):
-            weight = self.weights[i] if i < len(self.weights) else 1.0
-            
-            for rank, doc in enumerate(docs):
-                # Use content as unique key (or metadata source if available + content hash)
-                # Simple approach: content string
-                doc_key = doc.page_content
-                if doc_key not in doc_map:
-                    doc_map[doc_key] = doc
-                    
-                if doc_key not in rrf_score:
-                    rrf_score[doc_key] = 0.0
-                    
-                rrf_score[doc_key] += weight / (rank + self.c)
-                
-        # Sort by score
-        sorted_docs = sorted(rrf_score.items(), key=lambda x: x[1], reverse=True)
+        results: List[Tuple[int, List[Document]]] = []
+        errors: List[BaseException] = []
+        for i, task in enumerate(tasks):
+            timeout = self._timeout_for(i)
+            remaining = None if timeout is None else max(0.0, timeout - (time.monotonic() - start))
+            # asyncio.wait does not block on cancellation of a slow retriever (unlike wait_for)
+            await asyncio.wait([task], timeout=remaining)
+            if not task.done():
+                task.cancel()
+                logger.warning("Retriever %s timed out after %ss; fusing remaining results", i, timeout)
+                errors.append(asyncio.TimeoutError())
+            elif task.exception() is not None:
+                logger.warning("Retriever %s failed: %s; fusing remaining results", i, task.exception())
+                errors.append(task.exception())
+            else:
+                results.append((i, task.result()))
         
-        return [doc_map[key] for key, score in sorted_docs]
+        if not results and errors:
+            raise errors[0]
+        return self._fuse(results)
+
+    def _fuse(self, results: List[Tuple[int, List[Document]]]) -> List[Document]:
+        """
+        Combine (retriever index, ranked documents) pairs with RRF.
+        """
+        return reciprocal_rank_fusion(results, self.weights, len(self.retrievers), self.c)
+
+def reciprocal_rank_fusion(
+    results: List[Tuple[int, List[Document]]],
+    weights: List[float],
+    n_retrievers: int,
+    c: int = 60
+) -> List[Document]:
+    """
+    Weighted RRF over (retriever index, ranked documents) pairs.
+    Scores accumulate in arrays over the candidate set; each result carries its
+    fused score and per-retriever ranks (None where a retriever missed it).
+    """
+    positions: Dict[Tuple[Any, str], int] = {}
+    candidates: List[Document] = []
+    hits = []  # (retriever index, candidate positions) per retriever
+    
+    for i, docs in results:
+        candidate_positions = []
+        for doc in docs:
+            key = chunk_key(doc)
+            position = positions.get(key)
+            if position is None:
+                position = positions[key] = len(candidates)
+                candidates.append(doc)
+            candidate_positions.append(position)
+        hits.append((i, np.asarray(candidate_positions, dtype=np.int64)))
+    
+    scores = np.zeros(len(candidates))
+    ranks = np.full((n_retrievers, len(candidates)), -1, dtype=np.int64)
+    for i, candidate_positions in hits:
+        weight = weights[i] if i < len(weights) else 1.0
+        rank = np.arange(len(candidate_positions))
+        np.add.at(scores, candidate_positions, weight / (rank + c))
+        # Keep the best rank if a retriever returned the same chunk twice
+        ranks[i, candidate_positions[::-1]] = rank[::-1]
+    
+    # Sort by score and attach the fused score/ranks for downstream cut-offs
+    order = np.argsort(-scores, kind="stable")
+    fused = []
+    for position in order:
+        doc = candidates[position]
+        metadata = {
+            **doc.metadata,
+            "rrf_score": float(scores[position]),
+            "retriever_ranks": [int(r) if r >= 0 else None for r in ranks[:, position]]
+        }
+        fused.append(Document(id=doc.id, page_content=doc.page_content, metadata=metadata))
+    return fused
+
+def chunk_key(doc: Document) -> Tuple[Any, str]:
+    """
+    Stable fusion key: (source, content hash).
+    Uses the content_hash stored at ingestion when available, so chunks with the
+    same text from different sources stay distinct and no text is rehashed.
+    """
+    source = doc.metadata.get("source")
+    content_hash = doc.metadata.get("content_hash")
+    if content_hash is None:
+        content_hash = hashlib.sha1(doc.page_content.encode("utf-8")).hexdigest()
+    return (source, content_hash)
+
+class SparseBM25Retriever(BaseRetriever):
+    """
+    Drop-in BM25 retriever backed by a SparseBM25 snapshot.
+
+    Scores a query with one sparse dot product; `filters` ({field: allowed values})
+    restrict results with masks over the snapshot's columns instead of a separate fetch.
+    """
+    engine: Any
+    k: int = 20
+    filters: Optional[Dict[str, List[str]]] = None
+
+    @classmethod
+    def from_documents(cls, documents: List[Document], **kwargs: Any) -> "SparseBM25Retriever":
+        from src.utils.sparse_bm25 import SparseBM25
+        return cls(engine=SparseBM25.from_documents(documents), **kwargs)
+
+    def _get_relevant_documents(
+        self, query: str, *, run_manager: CallbackManagerForRetrieverRun
+    ) -> List[Document]:
+        return [doc for doc, score in self.engine.search(query, k=self.k, filters=self.filters)]
+
+class CitationRetriever(BaseRetriever):
+    """
+    Chunks citing a query's regulatory anchors (from KeywordIndex.lookup_citation_query,
+    run once up front); used as one more ranked list next to semantic and BM25 results.
+    """
+    documents: List[Document]
+
+    def _get_relevant_documents(
+        self, query: str, *, run_manager: CallbackManagerForRetrieverRun
+    ) -> List[Document]:
+        return list(self.documents)
@@ -0,0 +1,80 @@
+"""
+Result cache for search_regulations.
+Entries are keyed by (normalized query, filters, corpus generation). Every change
+to the knowledge base bumps the keyword index generation, so a stale entry can
+never be served: it simply stops matching and ages out of the LRU.
+"""
+import sys
+import threading
+from collections import OrderedDict
+from typing import Optional, Tuple, Hashable
+from src.utils.embedding_cache import normalize_text
+
+# Configuration
+MAX_ENTRIES = 512
+MAX_BYTES = 64 * 1024 * 1024  # Cap on the total size of cached result strings
+
+class SearchResultCache:
+    """Size-bounded LRU of formatted search results with hit/miss counters."""
+
+    def __init__(self, max_entries: int = MAX_ENTRIES, max_bytes: int = MAX_BYTES):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self._entries: "OrderedDict[Tuple, str]" = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self.stats = {"hits": 0, "misses": 0, "evictions": 0}
+
+    @staticmethod
+    def make_key(query: str, filters: Hashable, generation: int) -> Tuple:
+        return (normalize_text(query), filters, generation)
+
+    def get(self, key: Tuple) -> Optional[str]:
+        with self._lock:
+            result = self._entries.get(key)
+            if result is None:
+                self.stats["misses"] += 1
+                return None
+            self._entries.move_to_end(key)
+            self.stats["hits"] += 1
+            return result
+
+    def put(self, key: Tuple, result: str):
+        size = sys.getsizeof(result)
+        if size > self.max_bytes:
+            return
+
+        with self._lock:
+            previous = self._entries.pop(key, None)
+            if previous is not None:
+                self._bytes -= sys.getsizeof(previous)
+
+            self._entries[key] = result
+            self._bytes += size
+
+            while len(self._entries) > self.max_entries or self._bytes > self.max_bytes:
+                _, evicted = self._entries.popitem(last=False)
+                self._bytes -= sys.getsizeof(evicted)
+                self.stats["evictions"] += 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+
+    def get_stats(self) -> dict:
+        """Hit/miss/eviction counters, hit rate and current size."""
+        with self._lock:
+            stats = dict(self.stats)
+            stats["entries"] = len(self._entries)
+            stats["bytes"] = self._bytes
+        lookups = stats["hits"] + stats["misses"]
+        stats["hit_rate"] = stats["hits"] / lookups if lookups else 0.0
+        return stats
+
+# Shared across sessions and the planner/executor loop
+_cache = SearchResultCache()
+
+def get_search_cache() -> SearchResultCache:
+    """Return the process-wide search result cache."""
+    return _cache
@@ -0,0 +1,350 @@
+"""
+Vectorized BM25 scoring over a sparse term-document matrix.
+The BM25 weight of every (term, chunk) pair is precomputed into a CSR matrix,
+so scoring a query (or a batch of queries) is one sparse product and top-k is
+an argpartition.
+"""
+import os
+import json
+import shutil
+import threading
+import numpy as np
+from scipy import sparse
+from typing import List, Optional, Tuple, Callable, Dict
+from langchain_core.documents import Document
+from src.utils.keyword_index import KeywordIndex, tokenize, BM25_K1, BM25_B, FILTER_FIELDS
+
+# Configuration
+SNAPSHOT_DIRECTORY = "./chroma_db/bm25_snapshot"
+
+class SparseBM25:
+    """
+    Immutable BM25 snapshot.
+
+    matrix: CSR of shape (n_terms, n_docs) holding BM25 weights (IDF included)
+    vocab: term -> matrix row
+    field_codes / field_names: per filter field (source, jurisdiction, ...), an integer
+        code per column into that field's value list, used as filter masks
+    fetch_documents: callable that turns column positions into Documents
+        (None for chunks deleted since the snapshot was built)
+    doc_nos: per-column keyword index doc_no (only for snapshots of the index)
+    """
+
+    def __init__(
+        self,
+        matrix: sparse.csr_matrix,
+        vocab: Dict[str, int],
+        field_codes: Dict[str, np.ndarray],
+        field_names: Dict[str, List[Optional[str]]],
+        fetch_documents: Callable[[List[int]], List[Document]],
+        generation: Optional[int] = None,
+        doc_nos: Optional[np.ndarray] = None
+    ):
+        self.matrix = matrix
+        self.vocab = vocab
+        self.field_codes = field_codes
+        self.field_names = field_names
+        self._field_lookup = {
+            field: {name: code for code, name in enumerate(names)} for field, names in field_names.items()
+        }
+        self.fetch_documents = fetch_documents
+        self.generation = generation
+        self.doc_nos = doc_nos
+
+    @property
+    def n_docs(self) -> int:
+        return self.matrix.shape[1]
+
+    # --- Construction ---
+
+    @staticmethod
+    def compute_weights(term_rows: np.ndarray, doc_cols: np.ndarray, tfs: np.ndarray,
+                        doc_lengths: np.ndarray, n_terms: int) -> sparse.csr_matrix:
+        """Turn raw (term, doc, tf) triplets into a CSR matrix of BM25 weights."""
+        n_docs = len(doc_lengths)
+        avgdl = doc_lengths.mean() if n_docs else 0.0
+
+        # Document frequency per term = number of postings per row
+        df = np.bincount(term_rows, minlength=n_terms)
+        idf = np.log((n_docs - df + 0.5) / (df + 0.5) + 1.0)
+
+        tfs = tfs.astype(np.float32)
+        norm = tfs + BM25_K1 * (1 - BM25_B + BM25_B * doc_lengths[doc_cols] / max(avgdl, 1e-9))
+        weights = idf[term_rows] * tfs * (BM25_K1 + 1) / norm
+
+        matrix = sparse.csr_matrix(
+            (weights.astype(np.float32), (term_rows, doc_cols)),
+            shape=(n_terms, n_docs)
+        )
+        matrix.sum_duplicates()
+        return matrix
+
+    @classmethod
+    def from_documents(cls, documents: List[Document]) -> "SparseBM25":
+        """Build an in-memory snapshot directly from Documents."""
+        vocab: Dict[str, int] = {}
+        term_rows, doc_cols, tfs = [], [], []
+        doc_lengths = np.zeros(len(documents), dtype=np.float32)
+
+        for col, doc in enumerate(documents):
+            tokens = tokenize(doc.page_content)
+            doc_lengths[col] = len(tokens)
+            counts: Dict[int, int] = {}
+            for token in tokens:
+                row = vocab.setdefault(token, len(vocab))
+                counts[row] = counts.get(row, 0) + 1
+            term_rows.extend(counts.keys())
+            doc_cols.extend([col] * len(counts))
+            tfs.extend(counts.values())
+
+        matrix = cls.compute_weights(
+            np.asarray(term_rows, dtype=np.int64), np.asarray(doc_cols, dtype=np.int64),
+            np.asarray(tfs, dtype=np.float32), doc_lengths, len(vocab)
+        )
+
+        field_codes, field_names = {}, {}
+        for field in FILTER_FIELDS:
+            field_codes[field], field_names[field] = encode_values([doc.metadata.get(field) for doc in documents])
+
+        return cls(matrix, vocab, field_codes, field_names,
+                   lambda cols: [documents[c] for c in cols])
+
+    @classmethod
+    def from_keyword_index(cls, index: KeywordIndex) -> "SparseBM25":
+        """
+        Build a snapshot from the persistent keyword index.
+        Reads run in one transaction on a separate connection, so the (slow) walk over
+        every posting sees a consistent generation without holding the index lock:
+        searches and ingestion writes carry on meanwhile (WAL).
+        Postings are read in (term, doc_no) order, which is the table's primary key.
+        """
+        conn = index.open_reader()
+        try:
+            conn.execute("BEGIN")
+            generation = conn.execute("SELECT value FROM stats WHERE key = 'generation'").fetchone()[0]
+
+            chunk_rows = conn.execute(
+                f"SELECT doc_no, length, {', '.join(FILTER_FIELDS)} FROM chunks ORDER BY doc_no"
+            ).fetchall()
+            doc_nos = np.fromiter((r[0] for r in chunk_rows), dtype=np.int64, count=len(chunk_rows))
+            doc_lengths = np.fromiter((r[1] for r in chunk_rows), dtype=np.float32, count=len(chunk_rows))
+
+            field_codes, field_names = {}, {}
+            for offset, field in enumerate(FILTER_FIELDS, start=2):
+                field_codes[field], field_names[field] = encode_values([r[offset] for r in chunk_rows])
+
+            vocab: Dict[str, int] = {}
+            term_rows, posting_doc_nos, tfs = [], [], []
+            for term, doc_no, tf in conn.execute("SELECT term, doc_no, tf FROM postings ORDER BY term, doc_no"):
+                term_rows.append(vocab.setdefault(term, len(vocab)))
+                posting_doc_nos.append(doc_no)
+                tfs.append(tf)
+            conn.execute("COMMIT")
+        finally:
+            conn.close()
+
+        doc_cols = np.searchsorted(doc_nos, np.asarray(posting_doc_nos, dtype=np.int64))
+        matrix = cls.compute_weights(
+            np.asarray(term_rows, dtype=np.int64), doc_cols,
+            np.asarray(tfs, dtype=np.float32), doc_lengths, len(vocab)
+        )
+
+        return cls(matrix, vocab, field_codes, field_names,
+                   lambda cols: index.get_documents(doc_nos[cols].tolist()), generation, doc_nos)
+
+    # --- Persistence ---
+
+    def save(self, directory: str):
+        """Persist the snapshot as .npy files that can be memory-mapped on load."""
+        os.makedirs(directory, exist_ok=True)
+        np.save(os.path.join(directory, "data.npy"), self.matrix.data)
+        np.save(os.path.join(directory, "indices.npy"), self.matrix.indices)
+        np.save(os.path.join(directory, "indptr.npy"), self.matrix.indptr)
+        for field, codes in self.field_codes.items():
+            np.save(os.path.join(directory, f"codes_{field}.npy"), codes)
+        np.save(os.path.join(directory, "doc_nos.npy"), self.doc_nos)
+        with open(os.path.join(directory, "meta.json"), "w") as f:
+            json.dump({
+                "generation": self.generation,
+                "shape": list(self.matrix.shape),
+                "field_names": self.field_names,
+                "terms": sorted(self.vocab, key=self.vocab.get)
+            }, f)
+
+    @classmethod
+    def load(cls, directory: str, index: KeywordIndex) -> Optional["SparseBM25"]:
+        """Load a persisted snapshot, or None if it is missing."""
+        meta_path = os.path.join(directory, "meta.json")
+        if not os.path.exists(meta_path):
+            return None
+        with open(meta_path, "r") as f:
+            meta = json.load(f)
+
+        def load_array(name):
+            return np.load(os.path.join(directory, f"{name}.npy"), mmap_mode="r")
+
+        matrix = sparse.csr_matrix(
+            (load_array("data"), load_array("indices"), load_array("indptr")),
+            shape=tuple(meta["shape"])
+        )
+        doc_nos = load_array("doc_nos")
+        vocab = {term: row for row, term in enumerate(meta["terms"])}
+
+        field_codes = {field: load_array(f"codes_{field}") for field in meta["field_names"]}
+        return cls(matrix, vocab, field_codes, meta["field_names"],
+                   lambda cols: index.get_documents(doc_nos[cols].tolist()), meta["generation"], doc_nos)
+
+    # --- Queries ---
+
+    def query_matrix(self, queries: List[str]) -> sparse.csr_matrix:
+        """Sparse (n_queries, n_terms) matrix of query term counts; unknown terms are dropped."""
+        rows, cols, values = [], [], []
+        for i, query in enumerate(queries):
+            counts: Dict[int, int] = {}
+            for token in tokenize(query):
+                term_row = self.vocab.get(token)
+                if term_row is not None:
+                    counts[term_row] = counts.get(term_row, 0) + 1
+            rows.extend([i] * len(counts))
+            cols.extend(counts.keys())
+            values.extend(counts.values())
+        return sparse.csr_matrix(
+            (np.asarray(values, dtype=np.float32), (np.asarray(rows, dtype=np.int64), np.asarray(cols, dtype=np.int64))),
+            shape=(len(queries), self.matrix.shape[0])
+        )
+
+    def top_k(self, scores: sparse.csr_matrix, k: int,
+              filters: Optional[Dict[str, List[str]]] = None) -> List[Tuple[int, float]]:
+        """Select the k best columns from a (1, n_docs) sparse score row."""
+        cols, values = scores.indices, scores.data
+
+        # Mask restriction instead of a separate filtered fetch
+        for field, allowed in (filters or {}).items():
+            lookup = self._field_lookup.get(field, {})
+            codes = [lookup[value] for value in allowed if value in lookup]
+            keep = np.isin(self.field_codes[field][cols], codes) if codes else np.zeros(len(cols), dtype=bool)
+            cols, values = cols[keep], values[keep]
+
+        if len(values) == 0:
+            return []
+        if len(values) > k:
+            best = np.argpartition(-values, k - 1)[:k]
+            cols, values = cols[best], values[best]
+
+        order = np.argsort(-values, kind="stable")
+        return [(int(cols[i]), float(values[i])) for i in order]
+
+    def search(self, query: str, k: int = 20,
+               filters: Optional[Dict[str, List[str]]] = None) -> List[Tuple[Document, float]]:
+        """Score the query against every chunk and return the top-k Documents with scores."""
+        return self.search_batch([query], k, filters)[0]
+
+    def search_batch(self, queries: List[str], k: int = 20,
+                     filters: Optional[Dict[str, List[str]]] = None) -> List[List[Tuple[Document, float]]]:
+        """Score all queries with a single sparse matrix product; one ranked list per query."""
+        if self.n_docs == 0 or not queries:
+            return [[] for _ in queries]
+        scores = (self.query_matrix(queries) @ self.matrix).tocsr()
+
+        results = []
+        for i in range(len(queries)):
+            top = self.top_k(scores[i], k, filters)
+            documents = self.fetch_documents([col for col, _ in top])
+            # A snapshot can outlive chunks deleted after it was built; those come back as None
+            results.append([(doc, score) for doc, (_, score) in zip(documents, top) if doc is not None])
+        return results
+
+def encode_values(values: List[Optional[str]]) -> Tuple[np.ndarray, List[Optional[str]]]:
+    """Dictionary-encode a column of metadata values into (codes, distinct values)."""
+    names = sorted(set(values), key=lambda v: v or "")
+    lookup = {name: code for code, name in enumerate(names)}
+    return np.fromiter((lookup[v] for v in values), dtype=np.int32, count=len(values)), names
+
+# Process-wide snapshot. When the keyword index generation moves on, the previous
+# snapshot keeps serving while a background thread builds the next one.
+_snapshot: Optional[SparseBM25] = None
+_snapshot_lock = threading.Lock()
+_rebuild_thread: Optional[threading.Thread] = None
+
+def get_sparse_bm25(index: KeywordIndex) -> SparseBM25:
+    """
+    Return the current BM25 snapshot for the keyword index.
+    Only the very first call in a process may block: it loads the newest on-disk
+    snapshot (memory-mapped) or, if there is none, builds one. After that a stale
+    snapshot is returned immediately and a rebuild is scheduled in the background.
+    """
+    global _snapshot
+    snapshot = _snapshot
+    if snapshot is None:
+        with _snapshot_lock:
+            if _snapshot is None:
+                _snapshot = _load_latest_snapshot(index) or _build_snapshot(index)
+            snapshot = _snapshot
+
+    if snapshot.generation != index.generation:
+        _schedule_rebuild(index)
+    return snapshot
+
+def _build_snapshot(index: KeywordIndex) -> SparseBM25:
+    snapshot = SparseBM25.from_keyword_index(index)
+    # One directory per generation, so readers never see a half-written snapshot
+    snapshot.save(os.path.join(SNAPSHOT_DIRECTORY, str(snapshot.generation)))
+    _remove_stale_snapshots(snapshot.generation)
+    return snapshot
+
+def _load_latest_snapshot(index: KeywordIndex) -> Optional[SparseBM25]:
+    """
+    Newest persisted snapshot (a stale one is refreshed in the background), skipping
+    generations from before the index last renumbered its doc_nos.
+    """
+    if not os.path.isdir(SNAPSHOT_DIRECTORY):
+        return None
+    generations = sorted((int(name) for name in os.listdir(SNAPSHOT_DIRECTORY) if name.isdigit()), reverse=True)
+    for generation in generations:
+        if generation < index.min_snapshot_generation:
+            break
+        try:
+            snapshot = SparseBM25.load(os.path.join(SNAPSHOT_DIRECTORY, str(generation)), index)
+        except Exception as e:
+            print(f"Ignoring unreadable BM25 snapshot {generation}: {e}")
+            continue
+        if snapshot is not None:
+            return snapshot
+    return None
+
+def _schedule_rebuild(index: KeywordIndex):
+    """Start the background rebuild unless one is already running."""
+    global _rebuild_thread
+    with _snapshot_lock:
+        if _rebuild_thread is not None and _rebuild_thread.is_alive():
+            return
+        _rebuild_thread = threading.Thread(target=_rebuild, args=(index,), name="bm25-rebuild", daemon=True)
+        _rebuild_thread.start()
+
+def _rebuild(index: KeywordIndex):
+    """Rebuild until the snapshot matches the index (writes may land during a build)."""
+    global _snapshot
+    try:
+        built = None
+        while _snapshot is None or _snapshot.generation != index.generation:
+            snapshot = _build_snapshot(index)
+            with _snapshot_lock:
+                _snapshot = snapshot
+            if snapshot.generation == built:
+                break  # Nothing changed since the last pass
+            built = snapshot.generation
+    except Exception as e:
+        # The previous snapshot keeps serving; the next query schedules another attempt
+        print(f"Background BM25 rebuild failed: {e}")
+
+def wait_for_rebuild(timeout: Optional[float] = None):
+    """Block until a running background rebuild finishes (for scripts and tests)."""
+    thread = _rebuild_thread
+    if thread is not None:
+        thread.join(timeout)
+
+def _remove_stale_snapshots(current_generation: int):
+    """Best-effort cleanup of snapshots from older generations."""
+    for name in os.listdir(SNAPSHOT_DIRECTORY):
+        if name != str(current_generation):
+            shutil.rmtree(os.path.join(SNAPSHOT_DIRECTORY, name), ignore_errors=True)
@@ -0,0 +1,197 @@
+"""
+Single-pass 10-K section tokenizer.
+The filing HTML is streamed once through html.parser: script/style and the
+hidden inline-XBRL header are dropped, each block element becomes one
+whitespace-normalized line of text (each physical line, inside <pre> and in
+plain-text filings), and short lines that start with "Item N." are recorded as
+heading candidates. Everything before the body's Item 1 (the first one followed
+by real prose) is the cover page and table of contents, and each Item runs from
+its heading to the next one, as offsets into the extracted text. Sections are
+only sliced out when asked for.
+"""
+import re
+from html.parser import HTMLParser
+from typing import Dict, Iterable, Iterator, List, Optional, Union
+
+# Configuration
+FEED_CHUNK_CHARS = 1024 * 1024  # HTML handed to the parser at a time
+MAX_HEADING_CHARS = 200         # Longer blocks are prose (e.g. "see Item 7"), not headings
+MIN_BODY_CHARS = 300            # An Item 1 followed by less text than this is a table-of-contents entry
+
+ITEM_ORDER = ["1", "1A", "1B", "1C", "2", "3", "4", "5", "6", "7", "7A", "8",
+              "9", "9A", "9B", "9C", "10", "11", "12", "13", "14", "15", "16"]
+ITEM_RANK = {item: rank for rank, item in enumerate(ITEM_ORDER)}
+
+# Section names used by summaries and the Company Analysis workflow
+NAMED_SECTIONS = {
+    "Business": "1",
+    "Risk Factors": "1A",
+    "MD&A": "7",
+    "Financial Statements": "8",
+}
+
+BLOCK_TAGS = {"p", "div", "br", "tr", "li", "h1", "h2", "h3", "h4", "h5", "h6", "table", "section", "hr"}
+CELL_TAGS = {"td", "th"}
+SKIP_TAGS = {"script", "style", "ix:header", "head"}
+
+HEADING_PATTERN = re.compile(r"^item\s*(\d{1,2}[a-c]?)\s*[.:\-–—]?\s*(.*)$", re.IGNORECASE)
+
+class _SectionTokenizer(HTMLParser):
+    """Streams filing HTML into block-per-line text plus Item heading candidates."""
+
+    def __init__(self):
+        super().__init__(convert_charrefs=True)
+        self.lines: List[str] = []
+        self.text_length = 0     # Length of the text emitted so far (HTMLParser owns self.offset)
+        self.headings: List[Dict] = []
+        self._block: List[str] = []
+        self._skip_depth = 0
+        self._pre_depth = 0
+        self._has_blocks = False  # No block tags at all: a plain-text filing
+
+    def handle_starttag(self, tag, attrs):
+        if tag in SKIP_TAGS:
+            self._skip_depth += 1
+        elif tag == "pre":
+            self._flush()
+            self._pre_depth += 1
+        elif tag in BLOCK_TAGS:
+            self._has_blocks = True
+            self._flush()
+
+    def handle_startendtag(self, tag, attrs):
+        if tag in BLOCK_TAGS:
+            self._flush()
+
+    def handle_endtag(self, tag):
+        if tag in SKIP_TAGS:
+            self._skip_depth = max(self._skip_depth - 1, 0)
+        elif tag == "pre":
+            self._flush()
+            self._pre_depth = max(self._pre_depth - 1, 0)
+        elif tag in BLOCK_TAGS:
+            self._flush()
+        elif tag in CELL_TAGS:
+            # Cells of one row stay on one line ("Item 7." | "Management's Discussion...")
+            self._block.append(" ")
+
+    def handle_data(self, data):
+        if not self._skip_depth:
+            self._block.append(data)
+
+    def _flush(self):
+        if not self._block:
+            return
+        text = "".join(self._block)
+        self._block = []
+        if self._pre_depth or not self._has_blocks:
+            # Preformatted text: line breaks are the only structure there is
+            for line in text.splitlines():
+                self._add_line(" ".join(line.split()))
+        else:
+            self._add_line(" ".join(text.split()))
+
+    def _add_line(self, line: str):
+        if not line:
+            return
+        if len(line) <= MAX_HEADING_CHARS:
+            match = HEADING_PATTERN.match(line)
+            if match and match.group(1).upper() in ITEM_RANK:
+                self.headings.append({
+                    "item": match.group(1).upper(),
+                    "title": match.group(2).strip(" .:"),
+                    "start": self.text_length,
+                })
+        self.lines.append(line)
+        self.text_length += len(line) + 1
+
+    def close(self):
+        super().close()
+        self._flush()
+
+def _drop_table_of_contents(headings: List[Dict], text_length: int) -> List[Dict]:
+    """
+    Remove the cover page and table of contents by position: the body starts at the
+    first "Item 1" followed by MIN_BODY_CHARS+ of text before the next heading, or,
+    if no Item 1 qualifies, where the Item sequence starts over for the second time.
+    Short body sections (e.g. Part III items "incorporated by reference") are kept.
+    """
+    ends = [following["start"] for following in headings[1:]] + [text_length]
+    for i, (heading, end) in enumerate(zip(headings, ends)):
+        if heading["item"] == "1" and end - heading["start"] >= MIN_BODY_CHARS:
+            return headings[i:]
+    for i in range(1, len(headings)):
+        if ITEM_RANK[headings[i]["item"]] < ITEM_RANK[headings[i - 1]["item"]]:
+            return headings[i:]
+    return headings
+
+def _section_boundaries(headings: List[Dict], text_length: int) -> List[Dict]:
+    """Items in filing order (stray or repeated headings skipped), each ending where the next begins."""
+    items = []
+    for heading in _drop_table_of_contents(headings, text_length):
+        if items and ITEM_RANK[heading["item"]] <= ITEM_RANK[items[-1]["item"]]:
+            continue
+        items.append(dict(heading))
+    for current, following in zip(items, items[1:] + [None]):
+        current["end"] = following["start"] if following else text_length
+    return items
+
+class TenKSections:
+    """Extracted 10-K text plus Item boundaries; sections are sliced on demand."""
+
+    def __init__(self, text: str, items: List[Dict]):
+        self.text = text
+        self.items = items
+        self._by_item = {entry["item"]: entry for entry in items}
+
+    def section(self, item: str, include_heading: bool = False) -> Optional[str]:
+        """Text of one Item ("1A", "7", ...), or None if the filing has no such Item."""
+        entry = self._by_item.get(item.upper())
+        if entry is None:
+            return None
+        start = entry["start"]
+        if not include_heading:
+            start = self.text.find("\n", start, entry["end"]) + 1 or entry["end"]
+        return self.text[start:entry["end"]].strip()
+
+    def named_sections(self) -> Dict[str, str]:
+        """Sections keyed by NAMED_SECTIONS name (only those present)."""
+        sections = {}
+        for name, item in NAMED_SECTIONS.items():
+            content = self.section(item)
+            if content:
+                sections[name] = content
+        return sections
+
+    def iter_sections(self) -> Iterator[Dict]:
+        """{"item", "title", "start", "end", "text"} per Item, in filing order."""
+        for entry in self.items:
+            yield {**entry, "text": self.section(entry["item"])}
+
+    def to_documents(self, metadata: Optional[Dict] = None) -> list:
+        """One Document per Item with item/title metadata, ready for the ingestion splitter."""
+        from langchain_core.documents import Document
+        documents = []
+        for section in self.iter_sections():
+            if not section["text"]:
+                continue
+            documents.append(Document(
+                page_content=section["text"],
+                metadata={**(metadata or {}), "item": section["item"], "section_title": section["title"],
+                          "start_offset": section["start"]},
+            ))
+        return documents
+
+def tokenize_10k(filing: Union[str, Iterable[str]]) -> TenKSections:
+    """Parse filing HTML (a string, or an iterable of chunks streamed from disk) in one pass."""
+    tokenizer = _SectionTokenizer()
+    if isinstance(filing, str):
+        chunks = (filing[i:i + FEED_CHUNK_CHARS] for i in range(0, len(filing), FEED_CHUNK_CHARS))
+    else:
+        chunks = filing
+    for chunk in chunks:
+        tokenizer.feed(chunk)
+    tokenizer.close()
+
+    text = "\n".join(tokenizer.lines)
+    return TenKSections(text, _section_boundaries(tokenizer.headings, len(text)))
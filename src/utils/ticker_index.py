@@ -0,0 +1,164 @@
+"""
+Local SEC ticker/CIK/company-name index.
+company_tickers.json is downloaded once, persisted to disk and loaded into dicts,
+so ticker resolution is a dict lookup with no network. The copy is revalidated
+with an ETag once it is older than TICKER_INDEX_TTL_SECONDS; a failed refresh
+keeps serving the stale copy.
+"""
+import os
+import re
+import json
+import time
+import difflib
+import threading
+from typing import Dict, Iterable, List, Optional
+from src.utils.edgar_client import get_edgar_client
+
+# Configuration
+SEC_CACHE_DIRECTORY = "./chroma_db/sec"
+TICKER_INDEX_PATH = os.path.join(SEC_CACHE_DIRECTORY, "company_tickers.json")
+TICKER_INDEX_TTL_SECONDS = 24 * 60 * 60
+REFRESH_RETRY_SECONDS = 60 * 60  # After a failed refresh, keep the stale copy this long before retrying
+FUZZY_CUTOFF = 0.8  # Minimum difflib ratio for a company-name match
+
+# Suffixes dropped before comparing company names ("Apple Inc." == "apple")
+NAME_SUFFIXES = {"INC", "INCORPORATED", "CORP", "CORPORATION", "CO", "COMPANY", "LTD", "LIMITED",
+                 "PLC", "LLC", "LP", "SA", "AG", "NV", "HOLDINGS", "HOLDING", "GROUP", "THE"}
+
+def normalize_name(name: str) -> str:
+    """Upper-case, strip punctuation and corporate suffixes."""
+    words = re.sub(r"[^A-Z0-9 ]", " ", name.upper().replace("&", " AND ")).split()
+    kept = [word for word in words if word not in NAME_SUFFIXES]
+    return " ".join(kept or words)
+
+class TickerIndex:
+    """In-memory ticker, CIK and normalized-name lookups over company_tickers.json."""
+
+    def __init__(self, path: str = TICKER_INDEX_PATH, ttl: float = TICKER_INDEX_TTL_SECONDS):
+        self.path = path
+        self.ttl = ttl
+        self.etag: Optional[str] = None
+        self.fetched_at = 0.0
+        self._lock = threading.Lock()
+        self._load_companies([])
+        self._load_from_disk()
+
+    # --- Loading ---
+
+    def _load_companies(self, companies: List[list]):
+        """Build the lookup dicts from [ticker, cik, title] rows."""
+        by_ticker: Dict[str, Dict] = {}
+        by_name: Dict[str, Dict] = {}
+        by_first_word: Dict[str, List[str]] = {}
+        for ticker, cik, title in companies:
+            entry = {"ticker": ticker, "cik": str(cik), "name": title}
+            by_ticker.setdefault(ticker.upper(), entry)
+            normalized = normalize_name(title)
+            if normalized and normalized not in by_name:
+                # The file lists a company's primary ticker first
+                by_name[normalized] = entry
+                by_first_word.setdefault(normalized.split()[0], []).append(normalized)
+        self.companies = companies
+        self.by_ticker = by_ticker
+        self.by_name = by_name
+        self.by_first_word = by_first_word
+        self.names = list(by_name)
+
+    def _load_from_disk(self):
+        if not os.path.exists(self.path):
+            return
+        try:
+            with open(self.path, "r") as f:
+                cached = json.load(f)
+            self._load_companies(cached["companies"])
+            self.etag = cached.get("etag")
+            self.fetched_at = cached.get("fetched_at", 0.0)
+        except Exception as e:
+            print(f"Ignoring unreadable ticker index {self.path}: {e}")
+
+    def _save_to_disk(self):
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        temp_path = f"{self.path}.tmp-{os.getpid()}"
+        with open(temp_path, "w") as f:
+            json.dump({"etag": self.etag, "fetched_at": self.fetched_at, "companies": self.companies}, f)
+        os.replace(temp_path, self.path)
+
+    def is_stale(self) -> bool:
+        return not self.by_ticker or time.time() - self.fetched_at > self.ttl
+
+    def refresh(self, force: bool = False) -> bool:
+        """
+        Revalidate against SEC (conditional GET with the stored ETag).
+        Returns True if the index is usable afterwards.
+        """
+        with self._lock:
+            if not force and not self.is_stale():
+                return True
+            try:
+                response = get_edgar_client().get_company_tickers(self.etag if self.by_ticker else None)
+                if response.status_code != 304:
+                    companies = [
+                        [company["ticker"], company["cik_str"], company["title"]]
+                        for company in response.json().values()
+                    ]
+                    self._load_companies(companies)
+                    self.etag = response.headers.get("ETag")
+                self.fetched_at = time.time()
+                self._save_to_disk()
+            except Exception as e:
+                # Keep serving the copy we have; retry after REFRESH_RETRY_SECONDS
+                print(f"Error refreshing SEC ticker index: {e}")
+                if self.by_ticker:
+                    self.fetched_at = time.time() - self.ttl + REFRESH_RETRY_SECONDS
+            return bool(self.by_ticker)
+
+    # --- Lookups ---
+
+    def lookup(self, ticker: str) -> Optional[Dict]:
+        """{"ticker", "cik", "name"} for a ticker symbol, or None."""
+        return self.by_ticker.get(ticker.strip().upper().replace(".", "-"))
+
+    def lookup_many(self, tickers: Iterable[str]) -> Dict[str, Optional[Dict]]:
+        return {ticker: self.lookup(ticker) for ticker in tickers}
+
+    def match_name(self, name: str, limit: int = 3, cutoff: float = FUZZY_CUTOFF) -> List[Dict]:
+        """Closest companies by name (difflib ratio), best first."""
+        normalized = normalize_name(name)
+        if not normalized:
+            return []
+        if normalized in self.by_name:
+            return [self.by_name[normalized]]
+        # Names sharing the first word are tried first; the full list only if none are close
+        candidates = self.by_first_word.get(normalized.split()[0], [])
+        matches = difflib.get_close_matches(normalized, candidates, n=limit, cutoff=cutoff)
+        if not matches:
+            matches = difflib.get_close_matches(normalized, self.names, n=limit, cutoff=cutoff)
+        return [self.by_name[match] for match in matches]
+
+    def resolve(self, query: str) -> Optional[Dict]:
+        """Resolve a ticker or company name (as typed into a competitor list)."""
+        query = query.strip()
+        if not query:
+            return None
+        entry = self.lookup(query)
+        if entry is not None:
+            return entry
+        matches = self.match_name(query, limit=1)
+        return matches[0] if matches else None
+
+    def resolve_many(self, queries: Iterable[str]) -> Dict[str, Optional[Dict]]:
+        return {query: self.resolve(query) for query in queries}
+
+_index: Optional[TickerIndex] = None
+_index_lock = threading.Lock()
+
+def get_ticker_index() -> TickerIndex:
+    """Return the process-wide ticker index, fetching or revalidating it when stale."""
+    global _index
+    if _index is None:
+        with _index_lock:
+            if _index is None:
+                _index = TickerIndex()
+    if _index.is_stale():
+        _index.refresh()
+    return _index
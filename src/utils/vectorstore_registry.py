@@ -0,0 +1,85 @@
+"""
+Process-wide registry for the vector store.
+Owns the Chroma persistent client, collection handles and the embeddings client,
+so they are created once per process instead of on every search or upload.
+"""
+import threading
+from typing import Dict, Optional
+import chromadb
+from langchain_community.vectorstores import Chroma
+from langchain_google_genai import GoogleGenerativeAIEmbeddings
+from src.utils.embedding_cache import CachedEmbeddings
+
+# Configuration
+PERSIST_DIRECTORY = "./chroma_db"
+EMBEDDING_MODEL = "models/text-embedding-004"
+DEFAULT_COLLECTION = "langchain"  # LangChain's default, used by existing stores
+
+class VectorStoreRegistry:
+    """
+    Thread-safe owner of the Chroma client, collections and embeddings.
+    Safe to share across concurrent Streamlit sessions.
+    """
+
+    def __init__(self, persist_directory: str = PERSIST_DIRECTORY, embedding_model: str = EMBEDDING_MODEL):
+        self.persist_directory = persist_directory
+        self.embedding_model = embedding_model
+        self._lock = threading.RLock()
+        self._client = None
+        self._embeddings = None
+        self._vectorstores: Dict[str, Chroma] = {}
+
+    def get_embeddings(self) -> CachedEmbeddings:
+        """Shared embeddings client (query embeddings are cached)."""
+        with self._lock:
+            if self._embeddings is None:
+                self._embeddings = CachedEmbeddings(
+                    GoogleGenerativeAIEmbeddings(model=self.embedding_model),
+                    model=self.embedding_model
+                )
+            return self._embeddings
+
+    def get_client(self):
+        """Shared Chroma persistent client (one SQLite connection pool per process)."""
+        with self._lock:
+            if self._client is None:
+                self._client = chromadb.PersistentClient(path=self.persist_directory)
+            return self._client
+
+    def get_vectorstore(self, collection_name: str = DEFAULT_COLLECTION) -> Chroma:
+        """Shared LangChain Chroma wrapper for a collection (created on first use)."""
+        with self._lock:
+            vectorstore = self._vectorstores.get(collection_name)
+            if vectorstore is None:
+                vectorstore = Chroma(
+                    client=self.get_client(),
+                    collection_name=collection_name,
+                    embedding_function=self.get_embeddings()
+                )
+                self._vectorstores[collection_name] = vectorstore
+            return vectorstore
+
+    def reset(self):
+        """
+        Drop all cached handles, e.g. after the knowledge base was cleared.
+        The next get_* call reopens them.
+        """
+        with self._lock:
+            if self._client is not None:
+                # Release Chroma's shared per-path system so the store is reopened cleanly
+                self._client.clear_system_cache()
+            self._client = None
+            self._embeddings = None
+            self._vectorstores.clear()
+
+_registry: Optional[VectorStoreRegistry] = None
+_registry_lock = threading.Lock()
+
+def get_registry() -> VectorStoreRegistry:
+    """Return the registry for this process."""
+    global _registry
+    if _registry is None:
+        with _registry_lock:
+            if _registry is None:
+                _registry = VectorStoreRegistry()
+    return _registry
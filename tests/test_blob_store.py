@@ -0,0 +1,66 @@
+"""Tests for the content-addressed upload store."""
+import os
+import stat
+from src.utils import blob_store
+from src.utils.blob_store import blob_path, put_blob, remove_unlinked_blobs, store_upload
+
+class FakeUpload:
+    def __init__(self, name, data):
+        self.name = name
+        self._data = data
+
+    def getbuffer(self):
+        return memoryview(self._data)
+
+def test_linked_knowledge_base_files_stay_writable(tmp_path):
+    digest, path = put_blob(memoryview(b"memo v1"), directory=str(tmp_path / "blobs"))
+    os.chmod(path, stat.S_IRUSR)  # As written by earlier versions
+    destination = tmp_path / "knowledge_base" / "memo.txt"
+
+    os.makedirs(destination.parent)
+    os.link(path, destination)
+    put_blob(memoryview(b"memo v1"), digest, directory=str(tmp_path / "blobs"))
+
+    assert os.stat(destination).st_mode & stat.S_IWUSR
+
+def test_edited_blob_is_rewritten_instead_of_reused(tmp_path):
+    directory = str(tmp_path / "blobs")
+    digest, path = put_blob(memoryview(b"memo v1"), directory=directory)
+    with open(path, "ab") as f:
+        f.write(b" edited through a link")
+
+    put_blob(memoryview(b"memo v1"), digest, directory=directory)
+
+    with open(blob_path(digest, directory), "rb") as f:
+        assert f.read() == b"memo v1"
+
+def test_blob_pruned_before_link_is_written_again(tmp_path, monkeypatch):
+    monkeypatch.setattr(blob_store, "BLOB_DIRECTORY", str(tmp_path / "blobs"))
+    original_put_blob = blob_store.put_blob
+    calls = []
+
+    def put_then_prune(data, digest=None, directory=None):
+        result = original_put_blob(data, digest, str(tmp_path / "blobs"))
+        calls.append(result)
+        if len(calls) == 1:
+            assert remove_unlinked_blobs(str(tmp_path / "blobs")) == 1
+        return result
+
+    monkeypatch.setattr(blob_store, "put_blob", put_then_prune)
+    digest, destination = store_upload(FakeUpload("memo.txt", b"memo"), str(tmp_path / "knowledge_base"))
+
+    with open(destination, "rb") as f:
+        assert f.read() == b"memo"
+    assert os.path.samefile(destination, blob_path(digest, str(tmp_path / "blobs")))
+    assert len(calls) == 2
+
+def test_same_size_edit_is_detected(tmp_path):
+    directory = str(tmp_path / "blobs")
+    digest, path = put_blob(memoryview(b"memo v1"), directory=directory)
+    with open(path, "r+b") as f:
+        f.write(b"MEMO")  # In place, size unchanged
+
+    put_blob(memoryview(b"memo v1"), digest, directory=directory)
+
+    with open(blob_path(digest, directory), "rb") as f:
+        assert f.read() == b"memo v1"
@@ -0,0 +1,44 @@
+"""Tests for citation extraction and citation-query parsing."""
+from langchain_core.documents import Document
+from src.utils.citation_index import extract_citations, parse_citation_query
+from src.utils.keyword_index import KeywordIndex
+from src.utils.retrievers import CitationRetriever, reciprocal_rank_fusion
+
+def test_beps_actions_joined_by_and_are_a_list():
+    assert set(extract_citations("BEPS Actions 8 and 13")) == {"beps:action:8", "beps:action:13"}
+    assert set(extract_citations("Actions 5, 6 & 13")) == {"beps:action:5", "beps:action:6", "beps:action:13"}
+
+def test_beps_action_ranges():
+    assert set(extract_citations("Actions 8-10")) == {"beps:action:8", "beps:action:9", "beps:action:10"}
+    assert set(extract_citations("Actions 8 to 10 and 13")) == {
+        "beps:action:8", "beps:action:9", "beps:action:10", "beps:action:13"
+    }
+
+def test_only_bare_citations_are_direct_lookups():
+    assert parse_citation_query("Treas. Reg. §1.482-9") == (["treas_reg:1.482-9"], True)
+    assert parse_citation_query("§1.482-9 services cost method") == (["treas_reg:1.482-9"], False)
+    assert parse_citation_query("comparable profits method") == ([], False)
+
+def test_citation_hits_fuse_as_another_ranked_list(tmp_path):
+    index = KeywordIndex(str(tmp_path / "keyword_index.sqlite3"))
+    index.add_documents([
+        Document(page_content="The services cost method of Treas. Reg. §1.482-9(b).", metadata={"source": "reg.pdf"}),
+        Document(page_content="Services cost method overview.", metadata={"source": "memo.pdf"}),
+    ], ["cited", "uncited"])
+    citation_docs, is_direct_lookup = index.lookup_citation_query("§1.482-9 services cost method")
+
+    assert CitationRetriever(documents=citation_docs).invoke("§1.482-9 services cost method") == citation_docs
+    cited, uncited = index.get_documents([1, 2])
+    fused = reciprocal_rank_fusion([(0, [uncited, cited]), (1, citation_docs)], [0.5, 0.5], 2)
+
+    assert not is_direct_lookup
+    assert [doc.id for doc in citation_docs] == ["cited"]
+    assert [doc.id for doc in fused] == ["cited", "uncited"]
+
+def test_bare_citation_query_is_answered_directly(tmp_path):
+    index = KeywordIndex(str(tmp_path / "keyword_index.sqlite3"))
+    index.add_documents([Document(page_content="See BEPS Action 13.", metadata={"source": "beps.pdf"})], ["beps"])
+
+    assert [doc.id for doc in index.lookup_citation_query("BEPS Action 13")[0]] == ["beps"]
+    assert index.lookup_citation_query("BEPS Action 13")[1]
+    assert index.lookup_citation_query("country-by-country reporting") == ([], False)
@@ -0,0 +1,70 @@
+"""Tests for the EDGAR client against a local mock server."""
+import json
+import time
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import pytest
+from src.utils.edgar_client import EdgarClient, TokenBucket, RATE_LIMIT_PER_SECOND
+
+class MockEdgar(BaseHTTPRequestHandler):
+    """Answers each path with the next scripted (status, headers) response, then 200."""
+    scripts = {}
+    requests = []
+    lock = threading.Lock()
+
+    def do_GET(self):
+        with self.lock:
+            self.requests.append((self.path, time.monotonic()))
+            script = self.scripts.get(self.path, [])
+            status, headers = script.pop(0) if script else (200, {})
+        body = json.dumps({"path": self.path}).encode() if status == 200 else b"{}"
+        self.send_response(status)
+        for name, value in headers.items():
+            self.send_header(name, value)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+@pytest.fixture
+def edgar_server():
+    MockEdgar.scripts = {}
+    MockEdgar.requests = []
+    server = ThreadingHTTPServer(("127.0.0.1", 0), MockEdgar)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield f"http://127.0.0.1:{server.server_address[1]}"
+    server.shutdown()
+    server.server_close()
+
+def test_retries_429_with_retry_after_and_5xx(edgar_server):
+    MockEdgar.scripts["/submissions/CIK0000320193.json"] = [(429, {"Retry-After": "0.5"}), (503, {})]
+    client = EdgarClient(data_url=edgar_server, archives_url=edgar_server)
+
+    start = time.monotonic()
+    submissions = client.get_submissions("320193")
+
+    assert submissions == {"path": "/submissions/CIK0000320193.json"}
+    assert len(MockEdgar.requests) == 3
+    # Retry-After is honoured before the second attempt
+    assert MockEdgar.requests[1][1] - MockEdgar.requests[0][1] >= 0.5
+    assert time.monotonic() - start < 5
+
+def test_token_bucket_holds_concurrent_callers_to_the_rate_limit(edgar_server):
+    client = EdgarClient(data_url=edgar_server, archives_url=edgar_server, limiter=TokenBucket())
+    n_requests = 28
+
+    with ThreadPoolExecutor(max_workers=8) as pool:
+        list(pool.map(lambda n: client.get(f"{edgar_server}/files/{n}.json"), range(n_requests)))
+
+    times = sorted(sent for _, sent in MockEdgar.requests)
+    elapsed = times[-1] - times[0]
+    rate = (n_requests - 1) / elapsed
+    busiest_second = max(sum(1 for t in times if start <= t < start + 1) for start in times)
+    assert len(times) == n_requests
+    assert RATE_LIMIT_PER_SECOND * 0.85 <= rate <= RATE_LIMIT_PER_SECOND * 1.1
+    assert busiest_second <= 10
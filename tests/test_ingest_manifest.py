@@ -0,0 +1,49 @@
+"""Tests for the ingestion manifest keys."""
+import sqlite3
+from src.utils.ingest_manifest import IngestManifest, manifest_key
+
+def test_same_file_name_in_both_folders_does_not_collide(tmp_path):
+    manifest = IngestManifest(str(tmp_path / "manifest.sqlite3"))
+
+    manifest.record(manifest_key("data", "guidance.pdf"), "data", ["d1", "d2"], file_hash="aaa")
+    manifest.record(manifest_key("knowledge_base", "guidance.pdf"), "knowledge_base", ["k1"], file_hash="bbb")
+    manifest.remove(manifest_key("knowledge_base", "guidance.pdf"))
+
+    assert manifest.list_names() == ["data/guidance.pdf"]
+    assert manifest.get("data/guidance.pdf")["hash"] == "aaa"
+    assert manifest.chunk_ids("data/guidance.pdf") == ["d1", "d2"]
+
+def test_entries_keyed_by_bare_name_are_migrated(tmp_path):
+    path = str(tmp_path / "manifest.sqlite3")
+    IngestManifest(path).record("memo.pdf", "knowledge_base", ["c1"], file_hash="abc")
+    conn = sqlite3.connect(path)
+    conn.execute("INSERT INTO file_chunks (name, chunk_id) VALUES ('gone.pdf', 'c9')")
+    conn.commit()
+    conn.close()
+
+    manifest = IngestManifest(path)
+
+    assert manifest.list_names() == ["knowledge_base/memo.pdf"]
+    assert manifest.chunk_ids("knowledge_base/memo.pdf") == ["c1"]
+    assert manifest.chunk_ids("gone.pdf") == []
+
+def test_remove_origin_keeps_other_origins(tmp_path):
+    manifest = IngestManifest(str(tmp_path / "manifest.sqlite3"))
+    manifest.record(manifest_key("data", "irc_482.pdf"), "data", ["d1"], file_hash="aaa")
+    manifest.record(manifest_key("knowledge_base", "memo.pdf"), "knowledge_base", ["k1"], file_hash="bbb")
+
+    manifest.remove_origin("knowledge_base")
+
+    assert manifest.list_names() == ["data/irc_482.pdf"]
+    assert manifest.chunk_ids("data/irc_482.pdf") == ["d1"]
+    assert manifest.chunk_ids("knowledge_base/memo.pdf") == []
+
+def test_origin_chunk_ids_include_files_without_chunks(tmp_path):
+    manifest = IngestManifest(str(tmp_path / "manifest.sqlite3"))
+    manifest.record(manifest_key("data", "irc_482.pdf"), "data", ["d1"])
+    manifest.record(manifest_key("knowledge_base", "memo.pdf"), "knowledge_base", ["k1", "k2"])
+    manifest.record(manifest_key("knowledge_base", "legacy.pdf"), "knowledge_base", [])
+
+    assert manifest.origin_chunk_ids("knowledge_base") == {
+        "knowledge_base/legacy.pdf": [], "knowledge_base/memo.pdf": ["k1", "k2"]
+    }
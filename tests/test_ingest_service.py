@@ -0,0 +1,38 @@
+"""Tests for the watch-folder ingestion service's event handling."""
+import time
+import pytest
+from watchdog.observers import Observer
+from src.utils.ingest_service import IngestService, _EventHandler
+
+@pytest.fixture
+def watched(tmp_path):
+    service = IngestService(directories={str(tmp_path): "knowledge_base"})
+    observer = Observer()
+    observer.schedule(_EventHandler(service, "knowledge_base"), str(tmp_path), recursive=False)
+    observer.start()
+    yield tmp_path, service
+    observer.stop()
+    observer.join()
+
+def wait_for_events():
+    time.sleep(0.5)
+
+def test_reading_a_watched_file_queues_nothing(watched):
+    directory, service = watched
+    path = directory / "memo.txt"
+    path.write_text("transfer pricing memo")
+    wait_for_events()
+    service._pending.clear()
+
+    path.read_text()
+    wait_for_events()
+
+    assert service._pending == {}
+
+def test_writing_a_watched_file_queues_it(watched):
+    directory, service = watched
+
+    (directory / "memo.txt").write_text("transfer pricing memo")
+    wait_for_events()
+
+    assert [origin for origin, _ in service._pending.values()] == ["knowledge_base"]
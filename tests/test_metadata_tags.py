@@ -0,0 +1,60 @@
+"""Tests for chunk tagging and the in-place retag of chunks stored before tagging existed."""
+from src.utils.keyword_index import KeywordIndex
+from src.utils.metadata_tags import TAGGER_VERSION
+
+class FakeCollection:
+    def __init__(self, records):
+        self.records = records
+
+    def update(self, ids, metadatas):
+        for chunk_id, metadata in zip(ids, metadatas):
+            self.records[chunk_id]["metadata"] = metadata
+
+class FakeVectorStore:
+    """The slice of the Chroma vector store the retag migration uses."""
+
+    def __init__(self, records):
+        self._collection = FakeCollection(records)
+
+    def get(self, include=None):
+        records = self._collection.records
+        return {
+            "ids": list(records),
+            "documents": [record["text"] for record in records.values()],
+            "metadatas": [record["metadata"] for record in records.values()],
+        }
+
+UNTAGGED = {
+    "a": {"text": "Treas. Reg. §1.482-9 services cost method.", "metadata": {"source": "services.pdf", "page": 0}},
+    "b": {"text": "Eligible services are listed in Rev. Proc. 2007-13.", "metadata": {"source": "services.pdf", "page": 1}},
+}
+
+def test_retag_backfills_chunks_stored_without_tags(tmp_path):
+    vectorstore = FakeVectorStore({chunk_id: dict(record) for chunk_id, record in UNTAGGED.items()})
+    index = KeywordIndex(str(tmp_path / "keyword_index.sqlite3"))
+    index.sync_from_vectorstore(vectorstore)
+    generation = index.generation
+
+    index.retag_from_vectorstore(vectorstore)
+
+    stored = vectorstore._collection.records
+    assert stored["a"]["metadata"]["jurisdiction"] == "US"
+    assert stored["b"]["metadata"]["reg_area"] == "treas_reg:1.482-9"  # Carried forward from page 0
+    assert index.lookup_citations(["treas_reg:1.482-9"], filters={"jurisdiction": ["US"]})
+    assert [doc.id for doc in index.get_documents([1, 2])] == ["a", "b"]
+    assert all(doc.metadata["reg_area"] == "treas_reg:1.482-9" for doc in index.get_documents([1, 2]))
+    assert index.generation > generation
+
+def test_retag_runs_once_per_tagger_version(tmp_path):
+    vectorstore = FakeVectorStore({chunk_id: dict(record) for chunk_id, record in UNTAGGED.items()})
+    index = KeywordIndex(str(tmp_path / "keyword_index.sqlite3"))
+    index.sync_from_vectorstore(vectorstore)
+    index.retag_from_vectorstore(vectorstore)
+    generation = index.generation
+
+    vectorstore._collection.records["a"]["metadata"] = {"source": "services.pdf"}
+    index.retag_from_vectorstore(vectorstore)
+
+    assert "jurisdiction" not in vectorstore._collection.records["a"]["metadata"]
+    assert index.generation == generation
+    assert index._stat("tagger_version") == TAGGER_VERSION
@@ -0,0 +1,103 @@
+"""Tests for the sparse BM25 snapshots built from the keyword index."""
+import pytest
+from langchain_core.documents import Document
+from src.utils import sparse_bm25
+from src.utils.keyword_index import KeywordIndex
+from src.utils.sparse_bm25 import SparseBM25, get_sparse_bm25, wait_for_rebuild
+
+def make_docs(n, word="transfer"):
+    return [Document(page_content=f"{word} pricing chunk {i}", metadata={"source": f"doc_{i}.pdf"}) for i in range(n)]
+
+@pytest.fixture
+def index(tmp_path):
+    return KeywordIndex(str(tmp_path / "keyword_index.sqlite3"))
+
+@pytest.fixture
+def fresh_snapshots(tmp_path, monkeypatch):
+    monkeypatch.setattr(sparse_bm25, "SNAPSHOT_DIRECTORY", str(tmp_path / "bm25_snapshot"))
+    monkeypatch.setattr(sparse_bm25, "_snapshot", None)
+    monkeypatch.setattr(sparse_bm25, "_rebuild_thread", None)
+    yield
+    wait_for_rebuild()
+
+def test_search_skips_chunks_deleted_after_snapshot_build(index):
+    index.add_documents(make_docs(3), ["a", "b", "c"])
+    engine = SparseBM25.from_keyword_index(index)
+
+    index.delete_ids(["b"])
+    results = engine.search("transfer pricing", k=10)
+
+    assert sorted(doc.id for doc, _ in results) == ["a", "c"]
+    assert engine.search_batch(["pricing", "chunk"], k=10)[1][0][0].id in {"a", "c"}
+
+def test_snapshot_build_does_not_hold_index_lock(index, monkeypatch):
+    index.add_documents(make_docs(3), ["a", "b", "c"])
+
+    class FailingLock:
+        def __enter__(self):
+            raise AssertionError("snapshot build took the index lock")
+        def __exit__(self, *exc):
+            return False
+
+    monkeypatch.setattr(index, "_lock", FailingLock())
+    engine = SparseBM25.from_keyword_index(index)
+    assert engine.n_docs == 3
+
+def test_stale_snapshot_serves_while_rebuilding(index, fresh_snapshots):
+    index.add_documents(make_docs(2), ["a", "b"])
+    first = get_sparse_bm25(index)
+    assert first.generation == index.generation
+
+    index.add_documents([Document(page_content="intangibles royalty", metadata={})], ["c"])
+    served = get_sparse_bm25(index)
+    assert served is first  # returned immediately, not rebuilt inline
+
+    wait_for_rebuild(timeout=10)
+    current = get_sparse_bm25(index)
+    assert current.generation == index.generation
+    assert [doc.id for doc, _ in current.search("royalty")] == ["c"]
+
+def test_first_call_loads_persisted_snapshot_of_older_generation(index, fresh_snapshots, monkeypatch):
+    index.add_documents(make_docs(2), ["a", "b"])
+    get_sparse_bm25(index)
+    index.add_documents(make_docs(1, word="benchmark"), ["c"])
+
+    # New process: nothing in memory, only the older snapshot on disk
+    monkeypatch.setattr(sparse_bm25, "_snapshot", None)
+    monkeypatch.setattr(sparse_bm25, "_schedule_rebuild", lambda idx: None)
+    served = get_sparse_bm25(index)
+
+    assert served.generation < index.generation
+    assert served.n_docs == 2
+
+def test_stale_snapshot_never_maps_a_deleted_chunk_to_a_new_one(index):
+    index.add_documents([Document(page_content="alpha", metadata={"source": "A.pdf"}),
+                         Document(page_content="beta", metadata={"source": "B.pdf"})], ["a", "b"])
+    stale = SparseBM25.from_keyword_index(index)
+
+    index.delete_ids(["b"])
+    index.add_documents([Document(page_content="gamma", metadata={"source": "C.pdf"})], ["c"])
+
+    assert stale.search("beta", filters={"source": ["B.pdf"]}) == []
+
+def test_index_without_autoincrement_is_migrated(tmp_path, fresh_snapshots, monkeypatch):
+    path = str(tmp_path / "keyword_index.sqlite3")
+    old = KeywordIndex(path)
+    old.add_documents(make_docs(2), ["a", "b"])
+    get_sparse_bm25(old)
+    # Recreate the chunks table as indexes before AUTOINCREMENT had it
+    sql = old._conn.execute("SELECT sql FROM sqlite_master WHERE name = 'chunks'").fetchone()[0]
+    old._conn.executescript(
+        "PRAGMA writable_schema = ON;"
+        f"UPDATE sqlite_master SET sql = '{sql.replace('AUTOINCREMENT', '')}' WHERE name = 'chunks';"
+        "PRAGMA writable_schema = OFF;"
+    )
+    old._conn.close()
+
+    index = KeywordIndex(path)
+    monkeypatch.setattr(sparse_bm25, "_snapshot", None)
+    monkeypatch.setattr(sparse_bm25, "_schedule_rebuild", lambda idx: None)
+
+    assert "AUTOINCREMENT" in index._conn.execute("SELECT sql FROM sqlite_master WHERE name = 'chunks'").fetchone()[0]
+    assert [doc.id for doc in index.get_documents([1, 2])] == ["a", "b"]
+    assert get_sparse_bm25(index).generation == index.generation  # Pre-migration snapshot not loaded
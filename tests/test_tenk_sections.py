@@ -0,0 +1,59 @@
+"""Tests for the single-pass 10-K section tokenizer."""
+from src.utils.tenk_sections import tokenize_10k
+
+ITEMS = [("1", "Business"), ("1A", "Risk Factors"), ("2", "Properties"), ("7", "Management's Discussion"),
+         ("8", "Financial Statements"), ("9B", "Other Information"), ("9C", "Foreign Jurisdictions"), ("10", "Directors"), ("11", "Executive Compensation"),
+         ("12", "Security Ownership"), ("13", "Certain Relationships"), ("14", "Principal Accountant Fees"),
+         ("16", "Form 10-K Summary")]
+PART_III = {"10", "11", "12", "13", "14"}
+NONE = {"9B", "9C", "16"}
+PROSE = "The Company designs, manufactures and markets products worldwide. " * 10
+
+def body_text(item):
+    if item in PART_III:
+        return "Incorporated by reference to the Proxy Statement."
+    if item in NONE:
+        return "None."
+    return PROSE
+
+def html_filing():
+    toc = "".join(
+        f"<tr><td>Item {item}.</td><td>{title}</td><td>{page}</td></tr>"
+        for page, (item, title) in enumerate(ITEMS, start=3)
+    )
+    body = "".join(f"<p><b>Item {item}. {title}</b></p><p>{body_text(item)}</p>" for item, title in ITEMS)
+    return f"<html><head><style>p {{}}</style></head><body><p>FORM 10-K</p><table>{toc}</table>{body}</body></html>"
+
+def plain_text_filing():
+    toc = "\n".join(f"Item {item}.   {title}   {page}" for page, (item, title) in enumerate(ITEMS, start=3))
+    body = "\n\n".join(f"ITEM {item}.  {title.upper()}\n\n{body_text(item)}" for item, title in ITEMS)
+    return f"FORM 10-K\n\nTABLE OF CONTENTS\n\n{toc}\n\nPART I\n\n{body}\n"
+
+def test_short_part_iii_items_are_not_mistaken_for_the_table_of_contents():
+    sections = tokenize_10k(html_filing())
+
+    assert [entry["item"] for entry in sections.items] == [item for item, _ in ITEMS]
+    assert sections.section("1").startswith("The Company designs")
+    assert sections.section("11") == "Incorporated by reference to the Proxy Statement."
+    assert sections.section("14") == "Incorporated by reference to the Proxy Statement."
+    assert sections.section("16") == "None."
+
+def test_pre_formatted_filing():
+    sections = tokenize_10k(f"<html><body><pre>{plain_text_filing()}</pre></body></html>")
+
+    assert [entry["item"] for entry in sections.items] == [item for item, _ in ITEMS]
+    assert sections.named_sections()["Business"].startswith("The Company designs")
+
+def test_plain_text_filing():
+    sections = tokenize_10k("<DOCUMENT>\n<TYPE>10-K\n<TEXT>\n" + plain_text_filing() + "</TEXT>\n</DOCUMENT>")
+
+    assert [entry["item"] for entry in sections.items] == [item for item, _ in ITEMS]
+    assert sections.section("1A").startswith("The Company designs")
+    assert sections.section("13") == "Incorporated by reference to the Proxy Statement."
+
+def test_filing_without_table_of_contents():
+    body = "".join(f"<div>Item {item}. {title}</div><div>{body_text(item)}</div>" for item, title in ITEMS)
+
+    sections = tokenize_10k(body)
+
+    assert [entry["item"] for entry in sections.items] == [item for item, _ in ITEMS]